@@ -0,0 +1,38 @@
+"""readings composite indexes for role_summary / latest_per_terrarium
+
+Revision ID: 3f9a1c2d7e01
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a1c2d7e01'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY keeps Postgres ingest running while the indexes build; it
+    # cannot run inside a transaction, hence the autocommit block.
+    with op.get_context().autocommit_block():
+        op.create_index("ix_readings_terrarium_entity_ts", "readings", ["terrarium_id", "entity_id", "ts"],
+                        if_not_exists=True, postgresql_concurrently=True)
+        op.create_index("ix_readings_terrarium_sensor_type_ts", "readings", ["terrarium_id", "sensor_type", "ts"],
+                        if_not_exists=True, postgresql_concurrently=True)
+    # prefix of both composites
+    op.drop_index("ix_readings_terrarium_id", table_name="readings", if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index("ix_readings_terrarium_id", "readings", ["terrarium_id"], if_not_exists=True)
+    op.drop_index("ix_readings_terrarium_sensor_type_ts", table_name="readings", if_exists=True)
+    op.drop_index("ix_readings_terrarium_entity_ts", table_name="readings", if_exists=True)
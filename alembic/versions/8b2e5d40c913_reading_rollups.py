@@ -0,0 +1,47 @@
+"""reading_rollups: per-minute and per-hour aggregates
+
+Revision ID: 8b2e5d40c913
+Revises: 3f9a1c2d7e01
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e5d40c913'
+down_revision: Union[str, Sequence[str], None] = '3f9a1c2d7e01'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rollups start empty; build them from history with `python -m app.rollups backfill`.
+    op.create_table(
+        "reading_rollups",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("resolution", sa.String(length=4), nullable=False),
+        sa.Column("terrarium_id", sa.Integer(), sa.ForeignKey("terrariums.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("sensor_type", sa.String(length=16), nullable=False),
+        sa.Column("entity_id", sa.String(length=128), nullable=False, server_default=""),
+        sa.Column("bucket", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("unit", sa.String(length=16), nullable=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("sum", sa.Float(), nullable=False),
+        sa.Column("min", sa.Float(), nullable=False),
+        sa.Column("max", sa.Float(), nullable=False),
+        sa.UniqueConstraint("resolution", "terrarium_id", "sensor_type", "entity_id", "bucket", name="uq_rollup_bucket"),
+        if_not_exists=True,
+    )
+    op.create_index("ix_rollups_res_terrarium_bucket", "reading_rollups", ["resolution", "terrarium_id", "bucket"],
+                    if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_rollups_res_terrarium_bucket", table_name="reading_rollups", if_exists=True)
+    op.drop_table("reading_rollups")
@@ -0,0 +1,39 @@
+"""history import checkpoints
+
+Revision ID: b6e1c4f9a352
+Revises: a3d5e8f1b027
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e1c4f9a352'
+down_revision: Union[str, Sequence[str], None] = 'a3d5e8f1b027'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "import_checkpoints",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("source", sa.String(length=512), nullable=False),
+        sa.Column("stream", sa.String(length=160), nullable=False),
+        sa.Column("position", sa.BigInteger(), nullable=False, server_default=sa.text("0")),
+        sa.Column("cutoffs", sa.JSON(), nullable=False),
+        sa.Column("rows", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint("source", "stream", name="uq_import_checkpoint"),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("import_checkpoints")
@@ -0,0 +1,33 @@
+"""readings: ts_end and repeats for deadband storage
+
+Revision ID: c4d7a9e15b22
+Revises: 8b2e5d40c913
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d7a9e15b22'
+down_revision: Union[str, Sequence[str], None] = '8b2e5d40c913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows are single readings: no ts_end, nothing folded in.
+    with op.batch_alter_table("readings") as batch:
+        batch.add_column(sa.Column("ts_end", sa.DateTime(timezone=True), nullable=True))
+        batch.add_column(sa.Column("repeats", sa.Integer(), nullable=False, server_default=sa.text("0")))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("readings") as batch:
+        batch.drop_column("repeats")
+        batch.drop_column("ts_end")
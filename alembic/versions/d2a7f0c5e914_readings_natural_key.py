@@ -0,0 +1,51 @@
+"""readings natural key: (sensor_id, ts) unique, duplicates removed
+
+Revision ID: d2a7f0c5e914
+Revises: b6e1c4f9a352
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a7f0c5e914'
+down_revision: Union[str, Sequence[str], None] = 'b6e1c4f9a352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+log = logging.getLogger("alembic.runtime.migration")
+
+# readings rows checked per DELETE (each one commits on its own)
+CHUNK = 50_000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    max_id = bind.execute(sa.text("SELECT MAX(id) FROM readings")).scalar() or 0
+    removed = 0
+    # keep the first row stored for each (sensor_id, ts); the EXISTS is a seek on ix_readings_sensor_ts
+    with op.get_context().autocommit_block():
+        for lo in range(0, max_id, CHUNK):
+            removed += bind.execute(sa.text("""
+                DELETE FROM readings
+                 WHERE id > :lo AND id <= :hi
+                   AND EXISTS (SELECT 1 FROM readings d
+                                WHERE d.sensor_id = readings.sensor_id AND d.ts = readings.ts AND d.id < readings.id)
+            """), {"lo": lo, "hi": lo + CHUNK}).rowcount or 0
+    if removed:
+        log.info("removed %d duplicate readings; run `python -m app.rollups backfill` to recount the rollups", removed)
+
+    op.drop_index("ix_readings_sensor_ts", table_name="readings", if_exists=True)
+    op.create_index("ix_readings_sensor_ts", "readings", ["sensor_id", "ts"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_readings_sensor_ts", table_name="readings", if_exists=True)
+    op.create_index("ix_readings_sensor_ts", "readings", ["sensor_id", "ts"], if_not_exists=True)
@@ -0,0 +1,109 @@
+"""sensors registry: readings reference sensors.id instead of repeating strings
+
+Revision ID: e1f3b6c8d240
+Revises: c4d7a9e15b22
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1f3b6c8d240'
+down_revision: Union[str, Sequence[str], None] = 'c4d7a9e15b22'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# readings rows rewritten per UPDATE (each one commits on its own)
+CHUNK = 50_000
+
+
+def _chunked(sql: str) -> None:
+    """Run `sql` (with :lo / :hi id bounds) over readings in id ranges, one commit per range."""
+    bind = op.get_bind()
+    max_id = bind.execute(sa.text("SELECT MAX(id) FROM readings")).scalar() or 0
+    with op.get_context().autocommit_block():
+        for lo in range(0, max_id, CHUNK):
+            bind.execute(sa.text(sql), {"lo": lo, "hi": lo + CHUNK})
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "sensors",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("terrarium_id", sa.Integer(), sa.ForeignKey("terrariums.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("sensor_type", sa.String(length=16), nullable=False),
+        sa.Column("entity_id", sa.String(length=128), nullable=False, server_default=""),
+        sa.Column("unit", sa.String(length=16), nullable=True),
+        sa.Column("first_seen", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_seen", sa.DateTime(timezone=True), nullable=False),
+        sa.UniqueConstraint("terrarium_id", "entity_id", "sensor_type", name="uq_sensor"),
+        if_not_exists=True,
+    )
+    # one row per distinct series; the unit kept is the one of its newest reading
+    op.execute(sa.text("""
+        INSERT INTO sensors (terrarium_id, sensor_type, entity_id, unit, first_seen, last_seen)
+        SELECT g.terrarium_id, g.sensor_type, g.entity_id,
+               (SELECT r.unit FROM readings r
+                 WHERE r.terrarium_id = g.terrarium_id AND r.sensor_type = g.sensor_type
+                   AND COALESCE(r.entity_id, '') = g.entity_id
+                 ORDER BY r.ts DESC LIMIT 1),
+               g.first_seen, g.last_seen
+          FROM (SELECT terrarium_id, sensor_type, COALESCE(entity_id, '') AS entity_id,
+                       MIN(ts) AS first_seen, MAX(ts) AS last_seen
+                  FROM readings GROUP BY terrarium_id, sensor_type, COALESCE(entity_id, '')) g
+    """))
+
+    op.add_column("readings", sa.Column("sensor_id", sa.Integer(), nullable=True))
+    _chunked("""
+        UPDATE readings SET sensor_id = (
+            SELECT s.id FROM sensors s
+             WHERE s.terrarium_id = readings.terrarium_id AND s.sensor_type = readings.sensor_type
+               AND s.entity_id = COALESCE(readings.entity_id, ''))
+         WHERE id > :lo AND id <= :hi
+    """)
+
+    op.drop_index("ix_readings_terrarium_entity_ts", table_name="readings", if_exists=True)
+    op.drop_index("ix_readings_terrarium_sensor_type_ts", table_name="readings", if_exists=True)
+    # SQLite rebuilds the table here, which is also what reclaims the dropped columns' space.
+    # On Postgres the columns are only marked dropped; run VACUUM FULL readings to shrink it.
+    with op.batch_alter_table("readings") as batch:
+        batch.alter_column("sensor_id", existing_type=sa.Integer(), nullable=False)
+        batch.create_foreign_key("fk_readings_sensor_id", "sensors", ["sensor_id"], ["id"], ondelete="CASCADE")
+        batch.drop_column("entity_id")
+        batch.drop_column("unit")
+        batch.drop_column("sensor_type")
+        batch.drop_column("terrarium_id")
+    op.create_index("ix_readings_sensor_ts", "readings", ["sensor_id", "ts"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_readings_sensor_ts", table_name="readings", if_exists=True)
+    with op.batch_alter_table("readings") as batch:
+        batch.add_column(sa.Column("terrarium_id", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("sensor_type", sa.String(length=16), nullable=True))
+        batch.add_column(sa.Column("unit", sa.String(length=16), nullable=True))
+        batch.add_column(sa.Column("entity_id", sa.String(length=128), nullable=True))
+    _chunked("""
+        UPDATE readings SET
+            terrarium_id = (SELECT s.terrarium_id FROM sensors s WHERE s.id = readings.sensor_id),
+            sensor_type = (SELECT s.sensor_type FROM sensors s WHERE s.id = readings.sensor_id),
+            unit = (SELECT s.unit FROM sensors s WHERE s.id = readings.sensor_id),
+            entity_id = (SELECT NULLIF(s.entity_id, '') FROM sensors s WHERE s.id = readings.sensor_id)
+         WHERE id > :lo AND id <= :hi
+    """)
+    with op.batch_alter_table("readings") as batch:
+        batch.drop_constraint("fk_readings_sensor_id", type_="foreignkey")
+        batch.drop_column("sensor_id")
+        batch.alter_column("terrarium_id", existing_type=sa.Integer(), nullable=False)
+        batch.alter_column("sensor_type", existing_type=sa.String(length=16), nullable=False)
+        batch.create_foreign_key("fk_readings_terrarium_id", "terrariums", ["terrarium_id"], ["id"], ondelete="CASCADE")
+    op.create_index("ix_readings_terrarium_entity_ts", "readings", ["terrarium_id", "entity_id", "ts"], if_not_exists=True)
+    op.create_index("ix_readings_terrarium_sensor_type_ts", "readings", ["terrarium_id", "sensor_type", "ts"],
+                    if_not_exists=True)
+    op.drop_table("sensors")
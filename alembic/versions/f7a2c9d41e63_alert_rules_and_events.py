@@ -0,0 +1,63 @@
+"""alert rules and alert events
+
+Revision ID: f7a2c9d41e63
+Revises: e1f3b6c8d240
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7a2c9d41e63'
+down_revision: Union[str, Sequence[str], None] = 'e1f3b6c8d240'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ROLES = ("basking_temp", "env_temp", "humidity")
+# the enum type already exists on Postgres (sensor_roles.role)
+role_enum = sa.Enum(*ROLES, name="sensorrolename").with_variant(
+    postgresql.ENUM(*ROLES, name="sensorrolename", create_type=False), "postgresql"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "alert_rules",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("terrarium_id", sa.Integer(), sa.ForeignKey("terrariums.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("role", role_enum, nullable=False),
+        sa.Column("name", sa.String(length=100), nullable=True),
+        sa.Column("min_value", sa.Float(), nullable=True),
+        sa.Column("max_value", sa.Float(), nullable=True),
+        sa.Column("max_rate", sa.Float(), nullable=True),
+        sa.Column("hysteresis", sa.Float(), nullable=False, server_default=sa.text("0")),
+        sa.Column("min_duration_s", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("enabled", sa.Boolean(), nullable=False, server_default=sa.text("1")),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        if_not_exists=True,
+    )
+    op.create_index("ix_alert_rules_terrarium_id", "alert_rules", ["terrarium_id"], if_not_exists=True)
+    op.create_table(
+        "alert_events",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("rule_id", sa.Integer(), sa.ForeignKey("alert_rules.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("state", sa.String(length=8), nullable=False),
+        sa.Column("reason", sa.String(length=16), nullable=False),
+        sa.Column("value", sa.Float(), nullable=True),
+        sa.Column("ts", sa.DateTime(timezone=True), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_index("ix_alert_events_rule_ts", "alert_events", ["rule_id", "ts"], if_not_exists=True)
+    op.create_index("ix_alert_events_ts", "alert_events", ["ts"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("alert_events")
+    op.drop_table("alert_rules")
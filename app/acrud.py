@@ -0,0 +1,45 @@
+# app/acrud.py
+"""
+Async versions of the crud functions used from `async def` routes.
+
+Each call opens its own session and runs the sync crud function on
+database.db_executor (reads: database.read_executor), so a slow query or commit
+never stalls the event loop (and with it every open SSE stream on the worker).
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from .alerts import alert_engine, alert_event
+from .liveness import liveness, liveness_event
+from .database import run_db, run_db_read
+from .events import event_bus
+from .deadband import step_points
+from .schemas import IngestPayload
+from .state import hot_state, as_utc
+from . import columnar, crud
+
+
+async def ingest_batch(payloads: list[IngestPayload]) -> list[str]:
+    statuses = await run_db(crud.ingest_batch, payloads)
+    # alert state changes committed by this (or a concurrent) batch
+    if transitions := alert_engine.drain():
+        await event_bus.publish(alert_event(transitions))
+    if changes := liveness.drain():
+        await event_bus.publish(liveness_event(changes))
+    return statuses
+
+async def latest_per_terrarium() -> list[dict]:
+    items = hot_state.latest_per_terrarium()
+    return items if items is not None else await run_db_read(crud.latest_per_terrarium)
+
+async def role_summary() -> list[dict]:
+    items = hot_state.role_summary()
+    return items if items is not None else await run_db_read(crud.role_summary)
+
+async def raw_series_since(terrarium_slug: str, since: datetime) -> list[dict]:
+    """Columnar raw points of one terrarium newer than `since`."""
+    def fetch(db):
+        points = step_points(crud.readings_window(db, terrarium_slug, hours=24, since=since))
+        return columnar.raw_series((r, ts) for r, ts in points if as_utc(ts) > since)
+    return await run_db_read(fetch)
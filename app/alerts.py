@@ -0,0 +1,257 @@
+# app/alerts.py
+"""
+Threshold alerts evaluated on the ingest stream.
+
+Rules (alert_rules) watch one terrarium role: a min and/or max value, a max rate
+of change per minute, a hysteresis band for clearing, and a minimum duration a
+breach must last before the rule fires. crud.ingest_batch hands every reading of
+a role-mapped entity to AlertEngine.evaluate(), which keeps a few fields of
+state per rule (firing reason, pending breach and its start, previous value), so
+nothing is ever re-queried from `readings`. State changes are written to
+alert_events in the ingest transaction and published on the event bus once it
+has committed.
+
+Rules and role mappings are cached per process: loaded from the DB on first use
+and after rule edits (or when another worker announces some), and kept in step
+with role changes as they happen.
+"""
+from __future__ import annotations
+import threading
+from dataclasses import dataclass, replace
+from datetime import datetime
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from .models import Terrarium, SensorRole, AlertRule, AlertEvent
+from .state import as_utc
+
+
+@dataclass(frozen=True)
+class Rule:
+    id: int
+    slug: str
+    role: str
+    min_value: float | None
+    max_value: float | None
+    max_rate: float | None
+    hysteresis: float
+    min_duration_s: int
+
+
+@dataclass(frozen=True)
+class RuleState:
+    firing: str | None = None           # reason while firing
+    firing_since: datetime | None = None
+    pending: str | None = None          # breach not yet lasting min_duration_s
+    pending_since: datetime | None = None
+    last_value: float | None = None
+    last_ts: datetime | None = None
+
+
+@dataclass(frozen=True)
+class Transition:
+    rule: Rule
+    state: str                          # "firing" | "resolved"
+    reason: str
+    value: float | None
+    ts: datetime
+
+    def as_dict(self) -> dict:
+        return {"rule_id": self.rule.id, "terrarium": self.rule.slug, "role": self.rule.role,
+                "state": self.state, "reason": self.reason, "value": self.value, "ts": self.ts.isoformat()}
+
+
+def _breach(rule: Rule, st: RuleState, value: float, rate: float | None) -> str | None:
+    """Reason the reading breaches the rule; a firing min/max alert holds until past the hysteresis."""
+    lo, hi = rule.min_value, rule.max_value
+    if lo is not None and st.firing == "below_min":
+        lo += rule.hysteresis
+    if hi is not None and st.firing == "above_max":
+        hi -= rule.hysteresis
+    if lo is not None and value < lo:
+        return "below_min"
+    if hi is not None and value > hi:
+        return "above_max"
+    if rule.max_rate is not None and rate is not None and abs(rate) > rule.max_rate:
+        return "rate"
+    return None
+
+
+def _limit(rule: Rule, reason: str | None) -> bool:
+    """Whether the rule still has the limit a firing / pending reason refers to."""
+    return reason is None or {"below_min": rule.min_value, "above_max": rule.max_value,
+                              "rate": rule.max_rate}.get(reason) is not None
+
+
+def _fit(rule: Rule, st: RuleState) -> RuleState:
+    """`st` for an edited `rule`: a breach of a limit the rule no longer has is dropped."""
+    if not _limit(rule, st.firing):
+        st = replace(st, firing=None, firing_since=None)
+    if not _limit(rule, st.pending):
+        st = replace(st, pending=None, pending_since=None)
+    return st
+
+
+def step(rule: Rule, st: RuleState, value: float | None, ts: datetime) -> tuple[RuleState, list[Transition]]:
+    """Advance one rule by one reading."""
+    if value is None or (st.last_ts is not None and ts <= st.last_ts):
+        return st, []                   # unavailable, or late: the state already moved past it
+    rate = None
+    if st.last_value is not None:
+        rate = (value - st.last_value) / ((ts - st.last_ts).total_seconds() / 60)
+    reason = _breach(rule, st, value, rate)
+    out = []
+    firing, fired_at, pending, since = st.firing, st.firing_since, st.pending, st.pending_since
+    if firing and reason != firing:
+        out.append(Transition(rule, "resolved", firing, value, ts))
+        firing = fired_at = None
+    if not firing:
+        if reason is None:
+            pending = since = None
+        else:
+            if reason != pending:
+                pending, since = reason, ts
+            if (ts - since).total_seconds() >= rule.min_duration_s:
+                out.append(Transition(rule, "firing", reason, value, ts))
+                firing, fired_at, pending, since = reason, ts, None, None
+    return RuleState(firing, fired_at, pending, since, value, ts), out
+
+
+class AlertEngine:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._rules: dict[tuple[str, str], list[Rule]] = {}         # (slug, role) -> rules
+        self._role_entity: dict[tuple[str, str], str] = {}          # (slug, role) -> entity_id
+        self._watch: dict[tuple[str, str], list[str]] = {}          # (slug, entity_id) -> roles with rules
+        self._state: dict[int, RuleState] = {}
+        self._outbox: list[Transition] = []
+
+    # ---- rules and roles ----
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def invalidate(self) -> None:
+        """Reload rules from the DB before the next evaluation (rules were edited)."""
+        with self._lock:
+            self._loaded = False
+
+    def load(self, db: Session) -> None:
+        """Rules, role map and the firing state left by the latest alert event of each rule."""
+        slugs = dict(db.execute(select(Terrarium.id, Terrarium.slug)).all())
+        rules: dict[tuple[str, str], list[Rule]] = {}
+        for r in db.execute(select(AlertRule).where(AlertRule.enabled)).scalars():
+            rule = Rule(r.id, slugs[r.terrarium_id], r.role.value, r.min_value, r.max_value, r.max_rate,
+                        r.hysteresis or 0.0, r.min_duration_s or 0)
+            rules.setdefault((rule.slug, rule.role), []).append(rule)
+        role_entity = {(slugs[r.terrarium_id], r.role.value): r.entity_id for r in db.execute(select(SensorRole)).scalars()}
+        newest = select(AlertEvent.rule_id, func.max(AlertEvent.id).label("id")).group_by(AlertEvent.rule_id).subquery()
+        firing = {
+            rule_id: (reason, as_utc(ts))
+            for rule_id, state, reason, ts in db.execute(
+                select(AlertEvent.rule_id, AlertEvent.state, AlertEvent.reason, AlertEvent.ts)
+                .join(newest, newest.c.id == AlertEvent.id)
+            )
+            if state == "firing"
+        }
+        with self._lock:
+            self._rules = rules
+            self._role_entity = role_entity
+            # keep the live state of rules that survived the reload, minus breaches of removed limits
+            self._state = {
+                r.id: _fit(r, self._state.get(r.id) or RuleState(*firing.get(r.id, (None, None))))
+                for rs in rules.values() for r in rs
+            }
+            self._reindex()
+            self._loaded = True
+
+    def set_role(self, slug: str, role: str, entity_id: str) -> None:
+        with self._lock:
+            if self._role_entity.get((slug, role)) == entity_id:
+                return
+            self._role_entity[(slug, role)] = entity_id
+            self._reindex()
+
+    def _reindex(self) -> None:
+        watch: dict[tuple[str, str], list[str]] = {}
+        for (slug, role) in self._rules:
+            eid = self._role_entity.get((slug, role))
+            if eid:
+                watch.setdefault((slug, eid), []).append(role)
+        self._watch = watch
+
+    # ---- evaluation ----
+
+    def evaluate(self, db: Session, readings) -> tuple[dict[int, RuleState], list[Transition]]:
+        """
+        Run (slug, entity_id, value, ts) readings, in arrival order, through the
+        rules of the roles their entities are mapped to. Adds the resulting
+        alert_events to the session; pass the return value to commit() once the
+        transaction has.
+        """
+        if not self._loaded:
+            self.load(db)
+        staged: dict[int, RuleState] = {}
+        transitions: list[Transition] = []
+        with self._lock:
+            for slug, entity_id, value, ts in readings:
+                for role in self._watch.get((slug, entity_id), ()) if entity_id else ():
+                    for rule in self._rules[(slug, role)]:
+                        st = staged.get(rule.id) or self._state.get(rule.id) or RuleState()
+                        staged[rule.id], out = step(rule, st, value, as_utc(ts))
+                        transitions += out
+        if transitions:
+            db.add_all([AlertEvent(rule_id=t.rule.id, state=t.state, reason=t.reason, value=t.value, ts=t.ts)
+                        for t in transitions])
+        return staged, transitions
+
+    def commit(self, staged: dict[int, RuleState], transitions: list[Transition]) -> None:
+        with self._lock:
+            self._state.update(staged)
+            self._outbox += transitions
+
+    def drain(self) -> list[Transition]:
+        """State changes committed since the last call, for publishing."""
+        with self._lock:
+            out, self._outbox = self._outbox, []
+        return out
+
+    def apply_remote(self, alerts: list[dict]) -> None:
+        """Adopt another worker's state changes, so a rule does not fire twice."""
+        with self._lock:
+            for a in alerts:
+                st = self._state.get(a["rule_id"])
+                if st is not None:
+                    fired = a["state"] == "firing"
+                    self._state[a["rule_id"]] = replace(
+                        st, firing=a["reason"] if fired else None,
+                        firing_since=datetime.fromisoformat(a["ts"]) if fired else None,
+                        pending=None, pending_since=None,
+                    )
+
+    # ---- reads ----
+
+    def active(self) -> list[dict]:
+        """Firing rules, for the dashboard."""
+        with self._lock:
+            return [
+                {"rule_id": r.id, "terrarium": r.slug, "role": r.role, "reason": st.firing,
+                 "since": st.firing_since, "value": st.last_value, "ts": st.last_ts}
+                for rs in self._rules.values() for r in rs
+                if (st := self._state.get(r.id)) is not None and st.firing
+            ]
+
+
+alert_engine = AlertEngine()
+
+
+def alert_event(transitions: list[Transition]) -> dict:
+    """Bus message for committed alert state changes."""
+    return {
+        "kind": "alert",
+        "terrariums": sorted({t.rule.slug for t in transitions}),
+        "alerts": [t.as_dict() for t in transitions],
+    }
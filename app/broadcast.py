@@ -0,0 +1,192 @@
+# app/broadcast.py
+"""
+Render-once fan-out for /sse/summary.
+
+A single task per worker listens on event_bus, re-runs the role summary and
+renders summary_table.html once per change, and hands the finished SSE frame to
+every connected client. Bursts (HA often pushes temperature and humidity back
+to back) are coalesced: after a render the task waits SSE_DEBOUNCE_MS before it
+looks at the bus again, so there is at most one render per interval no matter
+how many events or subscribers there are.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+from contextlib import suppress
+
+from fastapi.templating import Jinja2Templates
+
+from .config import settings
+from .alerts import alert_engine
+from .events import event_bus, BusEvent
+from .models import SensorRoleName
+from .state import hot_state
+from .liveness import liveness
+from . import acrud
+
+log = logging.getLogger(__name__)
+templates = Jinja2Templates(directory="app/templates")
+
+
+def sse_frame(event: str, data: str, id: str | None = None) -> str:
+    """Format one SSE event from an HTML fragment."""
+    lines = [f"event: {event}"]
+    if id is not None:
+        lines.append(f"id: {id}")
+    lines += [f"data: {line}" for line in data.splitlines()]
+    return "\n".join(lines) + "\n\n"
+
+
+class SummaryBroadcaster:
+    def __init__(self, debounce_ms: int) -> None:
+        self.debounce_s = debounce_ms / 1000
+        self._subs: set[asyncio.Queue] = set()
+        self._frame: str | None = None          # None = stale, re-render before use
+        self._render_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self.stats = {"events": 0, "renders": 0, "frames_sent": 0, "frames_replaced": 0}
+
+    def snapshot(self) -> dict:
+        return {"subscribers": len(self._subs), "debounce_ms": int(self.debounce_s * 1000), **self.stats}
+
+    async def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._run(), name="summary-broadcaster")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def subscribe(self) -> asyncio.Queue:
+        """Queue that yields ready-made SSE frames, primed with the current summary."""
+        await self.start()
+        q: asyncio.Queue = asyncio.Queue(maxsize=1)
+        q.put_nowait(await self._current())
+        self._subs.add(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue) -> None:
+        self._subs.discard(q)
+
+    async def _current(self) -> str:
+        async with self._render_lock:
+            if self._frame is None:
+                await self._render()
+            return self._frame
+
+    async def _render(self) -> None:
+        items = liveness.annotate(await acrud.role_summary())
+        html = templates.get_template("components/summary_table.html").render({"items": items})
+        self._frame = sse_frame("summary", html)
+        self.stats["renders"] += 1
+
+    def _fan_out(self, frame: str) -> None:
+        for q in list(self._subs):
+            if q.full():
+                # a slow client only ever needs the newest table
+                q.get_nowait()
+                self.stats["frames_replaced"] += 1
+            q.put_nowait(frame)
+            self.stats["frames_sent"] += 1
+
+    async def _run(self) -> None:
+        bus_q = await event_bus.subscribe()
+        try:
+            while True:
+                await bus_q.get()
+                self.stats["events"] += 1
+                while not bus_q.empty():
+                    bus_q.get_nowait()
+                    self.stats["events"] += 1
+
+                if not self._subs:
+                    # nobody listening: render lazily for the next subscriber
+                    self._frame = None
+                    continue
+                try:
+                    async with self._render_lock:
+                        await self._render()
+                except Exception:
+                    log.exception("summary broadcaster: render failed")
+                else:
+                    self._fan_out(self._frame)
+                await asyncio.sleep(self.debounce_s)
+        finally:
+            await event_bus.unsubscribe(bus_q)
+
+
+summary_broadcaster = SummaryBroadcaster(debounce_ms=settings.sse_debounce_ms)
+
+
+# ---- per-role delta stream (/sse/summary/delta) ----
+
+ROLES = [r.value for r in SensorRoleName]
+
+
+def event_id(ev_id: int) -> str:
+    """SSE id: bus epoch + bus id, so ids from a previous process never match."""
+    return f"{event_bus.epoch}-{ev_id}"
+
+
+def parse_event_id(raw: str | None) -> int | None:
+    """Bus id from a Last-Event-ID header, or None if absent or from another process."""
+    if not raw:
+        return None
+    epoch, _, n = raw.rpartition("-")
+    if epoch != event_bus.epoch or not n.isdigit():
+        return None
+    return int(n)
+
+
+def _with_updated(item: dict) -> dict:
+    slug = item["terrarium_slug"]
+    entities = hot_state.role_entities(slug)
+    stale = {f"{r}_stale": bool(entities.get(r)) and liveness.is_stale((slug, entities[r])) for r in ROLES}
+    return {**item, **stale, "updated": max((item[f"{r}_ts"] for r in ROLES if item[f"{r}_ts"]), default=None)}
+
+
+async def role_table_frame(ev_id: int) -> tuple[str, set[str]]:
+    """Full role table as a "summary" event, plus the terrariums it shows."""
+    items = [_with_updated(i) for i in await acrud.role_summary()]
+    html = templates.get_template("components/role_summary_table.html").render({"items": items, "roles": ROLES})
+    return sse_frame("summary", html, id=event_id(ev_id)), {i["terrarium_slug"] for i in items}
+
+
+def alerts_frame(ev_id: int) -> str:
+    """Firing alerts as an "alerts" event (empty fragment when none)."""
+    html = templates.get_template("components/alert_banner.html").render({"alerts": alert_engine.active()})
+    return sse_frame("alerts", html or " ", id=event_id(ev_id))
+
+
+def role_delta_frame(ev: BusEvent, shown: set[str]) -> str | None:
+    """
+    Out-of-band cells for the (terrarium, role) pairs an event touched, rendered
+    from the hot-state cache. "" when nothing visible changed; None when the
+    client needs the full table (new terrarium, or the cache is cold).
+    """
+    data = ev.data if isinstance(ev.data, dict) else {}
+    touched: dict[str, set[str]] = {}
+    if data.get("kind") == "readings":
+        for r in data["latest"]:
+            roles = hot_state.roles_of(r["terrarium"], r["entity_id"])
+            if r["terrarium"] not in shown:
+                return None
+            if roles:
+                touched.setdefault(r["terrarium"], set()).update(roles)
+    elif data.get("kind") in ("role", "liveness"):
+        for slug in data["terrariums"]:
+            touched[slug] = set(ROLES)
+
+    deltas = []
+    for slug, roles in sorted(touched.items()):
+        item = hot_state.role_item(slug)
+        if item is None or slug not in shown:
+            return None
+        deltas.append({"item": _with_updated(item), "roles": [r for r in ROLES if r in roles]})
+    if not deltas:
+        return ""
+    html = templates.get_template("components/role_delta.html").render({"deltas": deltas})
+    return sse_frame("delta", html, id=event_id(ev.id))
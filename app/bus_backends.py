@@ -0,0 +1,267 @@
+# app/bus_backends.py
+"""
+Transports that carry event_bus messages between worker processes.
+
+EventBus always delivers to its own subscribers directly; a backend only has to
+get each message to the *other* workers, which hand it to EventBus.receive().
+Messages are JSON-serialisable dicts tagged with the sender's `origin`, so a
+worker can ignore its own echo.
+
+- PostgresBackend: LISTEN/NOTIFY on the app database (psycopg2 or psycopg 3).
+- UnixSocketBackend: the worker holding a flock on EVENT_BUS_SOCKET + ".lock"
+  serves EVENT_BUS_SOCKET and relays every line to all connected workers; if it
+  dies, another worker takes the lock over. Messages sent during a takeover are lost.
+"""
+from __future__ import annotations
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import select
+import threading
+from contextlib import suppress
+from typing import Awaitable, Callable
+
+from sqlalchemy import text
+
+log = logging.getLogger(__name__)
+
+Receiver = Callable[[dict], Awaitable[None]]
+
+# one JSON message per line; big ingest batches can produce long lines
+_LINE_LIMIT = 4 * 1024 * 1024
+
+
+class Backend:
+    name = "memory"
+
+    async def start(self, receive: Receiver) -> None:
+        pass
+
+    async def send(self, msg: dict) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def send_once(self, msg: dict) -> bool:
+        """Send one message from a process that is not a worker (a CLI job); False if no worker was reached."""
+        return False
+
+
+class PostgresBackend(Backend):
+    name = "postgres"
+    channel = "reptile_events"
+    # NOTIFY payloads are capped at 8000 bytes; stay well clear of it
+    max_payload = 7000
+
+    def __init__(self) -> None:
+        self._receive: Receiver | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    async def start(self, receive: Receiver) -> None:
+        self._receive = receive
+        self._loop = asyncio.get_running_loop()
+        self._thread = threading.Thread(target=self._listen, name="bus-listen", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            await asyncio.to_thread(self._thread.join, 5)
+
+    async def send(self, msg: dict) -> None:
+        from .database import run_db
+
+        payloads = list(_split(msg, self.max_payload))
+
+        def notify(db) -> None:
+            for p in payloads:
+                db.execute(text("SELECT pg_notify(:ch, :payload)"), {"ch": self.channel, "payload": p})
+            db.commit()
+
+        await run_db(notify)
+
+    async def send_once(self, msg: dict) -> bool:
+        await self.send(msg)
+        return True
+
+    def _listen(self) -> None:
+        """Blocking LISTEN loop on a dedicated connection; reconnects on failure."""
+        from .database import engine
+
+        while not self._stop.is_set():
+            raw = None
+            try:
+                raw = engine.raw_connection()
+                conn = raw.driver_connection
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {self.channel}")
+                if hasattr(conn, "poll"):                      # psycopg2
+                    while not self._stop.is_set():
+                        if select.select([conn], [], [], 1.0)[0]:
+                            conn.poll()
+                            while conn.notifies:
+                                self._dispatch(conn.notifies.pop(0).payload)
+                else:                                          # psycopg 3
+                    while not self._stop.is_set():
+                        for n in conn.notifies(timeout=1.0):
+                            self._dispatch(n.payload)
+            except Exception:
+                log.exception("event bus: LISTEN connection failed; retrying")
+                self._stop.wait(2.0)
+            finally:
+                if raw is not None:
+                    with suppress(Exception):
+                        raw.invalidate()
+
+    def _dispatch(self, payload: str) -> None:
+        with suppress(ValueError):
+            asyncio.run_coroutine_threadsafe(self._receive(json.loads(payload)), self._loop)
+
+
+def _split(msg: dict, limit: int):
+    """Yield JSON payloads under `limit` bytes, splitting a readings message's `latest` list if needed."""
+    raw = json.dumps(msg, separators=(",", ":"))
+    latest = msg.get("data", {}).get("latest") if isinstance(msg.get("data"), dict) else None
+    if len(raw.encode()) <= limit or not latest or len(latest) == 1:
+        yield raw
+        return
+    half = len(latest) // 2
+    for part in (latest[:half], latest[half:]):
+        yield from _split({**msg, "data": {**msg["data"], "latest": part}}, limit)
+
+
+class UnixSocketBackend(Backend):
+    name = "unix"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._receive: Receiver | None = None
+        self._server: asyncio.AbstractServer | None = None
+        self._peers: set[asyncio.StreamWriter] = set()
+        self._writer: asyncio.StreamWriter | None = None
+        self._task: asyncio.Task | None = None
+        self._lock_fd: int | None = None
+
+    @property
+    def is_broker(self) -> bool:
+        return self._server is not None
+
+    async def start(self, receive: Receiver) -> None:
+        self._receive = receive
+        self._task = asyncio.create_task(self._client_loop(), name="bus-unix-client")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+        if self._server:
+            self._server.close()
+            for w in list(self._peers):
+                w.close()
+            with suppress(FileNotFoundError):
+                os.unlink(self.path)
+            self._server = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    async def send(self, msg: dict) -> None:
+        w = self._writer
+        if w is None:
+            return                      # between brokers; message only reached local subscribers
+        try:
+            w.write(json.dumps(msg, separators=(",", ":")).encode() + b"\n")
+            await w.drain()
+        except (ConnectionError, RuntimeError):
+            log.warning("event bus: broker connection lost while sending")
+
+    async def send_once(self, msg: dict) -> bool:
+        # straight to the broker, without ever becoming one: no broker, no workers to tell
+        try:
+            reader, w = await asyncio.open_unix_connection(self.path, limit=_LINE_LIMIT)
+        except OSError:
+            return False
+        try:
+            w.write(json.dumps(msg, separators=(",", ":")).encode() + b"\n")
+            await w.drain()
+            # the broker relays to every peer, this one included: the echo means the workers have it
+            await asyncio.wait_for(reader.readline(), 5)
+        except (ConnectionError, asyncio.TimeoutError):
+            return False
+        finally:
+            w.close()
+            with suppress(ConnectionError):
+                await w.wait_closed()
+        return True
+
+    # ---- broker side ----
+
+    async def _try_become_broker(self) -> None:
+        # whoever holds the lock is the broker; the kernel drops it when that process dies
+        if self._lock_fd is None:
+            fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return
+            self._lock_fd = fd
+        with suppress(FileNotFoundError):
+            os.unlink(self.path)        # left behind by a broker that died
+        self._server = await asyncio.start_unix_server(self._serve_peer, path=self.path, limit=_LINE_LIMIT)
+        log.info("event bus: this worker is the broker on %s", self.path)
+
+    async def _serve_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._peers.add(writer)
+        try:
+            while line := await reader.readline():
+                for peer in list(self._peers):
+                    try:
+                        peer.write(line)
+                    except (ConnectionError, RuntimeError):
+                        self._peers.discard(peer)
+        except ConnectionError:
+            pass
+        finally:
+            self._peers.discard(writer)
+            writer.close()
+
+    # ---- client side (every worker, broker included) ----
+
+    async def _client_loop(self) -> None:
+        while True:
+            if not self.is_broker:
+                await self._try_become_broker()
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(self.path, limit=_LINE_LIMIT)
+            except OSError:
+                await asyncio.sleep(0.5)
+                continue
+            try:
+                while line := await reader.readline():
+                    with suppress(ValueError):
+                        await self._receive(json.loads(line))
+            except ConnectionError:
+                pass
+            finally:
+                self._writer.close()
+                self._writer = None
+            log.warning("event bus: lost broker on %s; reconnecting", self.path)
+            await asyncio.sleep(0.1)
+
+
+def make_backend(kind: str, database_url: str, socket_path: str) -> Backend:
+    """memory | shared (postgres when DATABASE_URL is Postgres, else unix) | postgres | unix"""
+    if kind == "shared":
+        kind = "postgres" if database_url.startswith("postgres") else "unix"
+    if kind == "postgres":
+        return PostgresBackend()
+    if kind == "unix":
+        return UnixSocketBackend(socket_path)
+    return Backend()
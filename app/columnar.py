@@ -0,0 +1,142 @@
+# app/columnar.py
+"""
+Columnar encodings of /api/v1/readings for chart clients, chosen via Accept.
+
+Every variant carries one entry per series (sensor type + entity) with its unit
+stated once and parallel arrays: `ts` in epoch milliseconds and `value`
+(rollups add `min`, `max` and `count`).
+
+- application/vnd.reptile.columns+json        plain arrays
+- application/vnd.reptile.columns-delta+json  `ts` as first value + successive differences
+- application/vnd.reptile.columns+msgpack     msgpack document whose arrays are packed little-endian
+                                              bytes: ts int64, value/min/max float32 (NaN = null),
+                                              count int32. Only offered when msgpack is installed.
+
+Built straight from query rows, without per-row Pydantic models.
+"""
+from __future__ import annotations
+import json
+import math
+import sys
+from array import array
+from datetime import datetime
+
+from fastapi import Response
+
+from .state import as_utc
+
+try:
+    import msgpack
+except ImportError:         # optional: the binary variant is simply not offered
+    msgpack = None
+
+JSON = "application/json"
+COLUMNS = "application/vnd.reptile.columns+json"
+COLUMNS_DELTA = "application/vnd.reptile.columns-delta+json"
+COLUMNS_MSGPACK = "application/vnd.reptile.columns+msgpack"
+
+SUPPORTED = (JSON, COLUMNS, COLUMNS_DELTA) + ((COLUMNS_MSGPACK,) if msgpack else ())
+
+
+def negotiate(accept: str | None) -> str:
+    """Best supported media type for an Accept header; row JSON when nothing else matches."""
+    if not accept:
+        return JSON
+    ranked = []
+    for i, part in enumerate(accept.split(",")):
+        media, *params = (p.strip() for p in part.split(";"))
+        q = 1.0
+        for p in params:
+            if p.startswith("q="):
+                try:
+                    q = float(p[2:])
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            ranked.append((-q, i, media.lower()))
+    for _q, _i, media in sorted(ranked):
+        if media in SUPPORTED:
+            return media
+    return JSON
+
+
+def _ms(ts: datetime) -> int:
+    return int(as_utc(ts).timestamp() * 1000)
+
+
+def raw_series(points) -> list[dict]:
+    """Series from deadband.step_points() output: (row, ts) pairs, oldest first."""
+    series: dict[tuple, dict] = {}
+    for r, ts in points:
+        key = (r.sensor_type, r.entity_id)
+        s = series.get(key)
+        if s is None:
+            s = series[key] = {"sensor_type": r.sensor_type, "entity_id": r.entity_id or None, "unit": r.unit,
+                               "ts": [], "value": []}
+        s["ts"].append(_ms(ts))
+        s["value"].append(r.value)
+    return list(series.values())
+
+
+def event_series(latest: list[dict]) -> list[dict]:
+    """Series from the `latest` entries of a readings bus event (iso ts strings)."""
+    series: dict[tuple, dict] = {}
+    for r in latest:
+        key = (r["sensor_type"], r["entity_id"])
+        s = series.get(key)
+        if s is None:
+            s = series[key] = {"sensor_type": r["sensor_type"], "entity_id": r["entity_id"] or None, "unit": r["unit"],
+                               "ts": [], "value": []}
+        s["ts"].append(_ms(datetime.fromisoformat(r["ts"])))
+        s["value"].append(r["value"])
+    return list(series.values())
+
+
+def rollup_series(buckets) -> list[dict]:
+    """Series from rollup rows; value is the bucket mean."""
+    series: dict[tuple, dict] = {}
+    for b in buckets:
+        key = (b.sensor_type, b.entity_id)
+        s = series.get(key)
+        if s is None:
+            s = series[key] = {"sensor_type": b.sensor_type, "entity_id": b.entity_id or None, "unit": b.unit,
+                               "ts": [], "value": [], "min": [], "max": [], "count": []}
+        s["ts"].append(_ms(b.bucket))
+        s["value"].append(b.sum / b.count)
+        s["min"].append(b.min)
+        s["max"].append(b.max)
+        s["count"].append(b.count)
+        s["unit"] = b.unit or s["unit"]
+    return list(series.values())
+
+
+def _delta(ts: list[int]) -> list[int]:
+    return ts[:1] + [b - a for a, b in zip(ts, ts[1:])]
+
+
+def _packed(typecode: str, values: list) -> bytes:
+    if typecode == "f":
+        values = [math.nan if v is None else v for v in values]
+    a = array(typecode, values)
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a.tobytes()
+
+
+_PACK = {"ts": "q", "value": "f", "min": "f", "max": "f", "count": "i"}
+
+
+def render(media: str, terrarium: str, resolution: str, series: list[dict], headers: dict | None = None) -> Response:
+    doc = {"terrarium": terrarium, "resolution": resolution, "series": series}
+    if media == COLUMNS_DELTA:
+        doc["ts_encoding"] = "delta"
+        for s in series:
+            s["ts"] = _delta(s["ts"])
+    elif media == COLUMNS_MSGPACK:
+        for s in series:
+            for k, code in _PACK.items():
+                if k in s:
+                    s[k] = _packed(code, s[k])
+        return Response(msgpack.packb(doc), media_type=media, headers=headers)
+    body = json.dumps(doc, separators=(",", ":"), ensure_ascii=False)
+    return Response(body, media_type=media, headers=headers)
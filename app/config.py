@@ -7,6 +7,63 @@ class Settings(BaseSettings):
     reptile_api_key: str = Field(..., alias="REPTILE_API_KEY")
     # SQLite by default; override with Postgres for production
     database_url: str = Field(default="sqlite:///./reptile.db", alias="DATABASE_URL")
+    # Threads for async routes' DB work (SQLite writes always get one: there is one writer connection)
+    db_executor_workers: int = Field(default=8, alias="DB_EXECUTOR_WORKERS")
+    # SQLite: wal = WAL journal, tuned pragmas, one writer connection and a pool of readers;
+    # shared = one connection for everything (the old behaviour)
+    sqlite_mode: str = Field(default="wal", alias="SQLITE_MODE")
+    sqlite_read_connections: int = Field(default=8, alias="SQLITE_READ_CONNECTIONS")
+    sqlite_mmap_size: int = Field(default=256 * 1024 * 1024, alias="SQLITE_MMAP_SIZE")
+    sqlite_cache_kib: int = Field(default=64 * 1024, alias="SQLITE_CACHE_KIB")
+    sqlite_busy_timeout_ms: int = Field(default=5_000, alias="SQLITE_BUSY_TIMEOUT_MS")
+    # SSE keep-alive comment interval
+    sse_heartbeat_s: float = Field(default=25.0, alias="SSE_HEARTBEAT_S")
+    # At most one summary re-render per this interval; bursts in between are coalesced
+    sse_debounce_ms: int = Field(default=500, alias="SSE_DEBOUNCE_MS")
+    # Serve summaries from the in-memory latest-state cache (warmed at startup)
+    hot_state_enabled: bool = Field(default=True, alias="HOT_STATE_ENABLED")
+    # Recent bus events kept for SSE Last-Event-ID replay
+    event_history_size: int = Field(default=1_000, alias="EVENT_HISTORY_SIZE")
+    # Cross-worker event delivery: memory (single process) | shared | postgres | unix.
+    # "shared" = Postgres LISTEN/NOTIFY when DATABASE_URL is Postgres, else a Unix-socket broker.
+    event_bus_backend: str = Field(default="memory", alias="EVENT_BUS_BACKEND")
+    event_bus_socket: str = Field(default="/tmp/reptile-events.sock", alias="EVENT_BUS_SOCKET")
+    # Write-behind ingest: /ingest enqueues and a background task flushes in batches
+    ingest_buffer_enabled: bool = Field(default=False, alias="INGEST_BUFFER_ENABLED")
+    ingest_buffer_max_rows: int = Field(default=500, alias="INGEST_BUFFER_MAX_ROWS")
+    ingest_buffer_flush_ms: int = Field(default=250, alias="INGEST_BUFFER_FLUSH_MS")
+    ingest_buffer_queue_size: int = Field(default=10_000, alias="INGEST_BUFFER_QUEUE_SIZE")
+    # how long /ingest waits for room in a full queue before answering 503
+    ingest_buffer_put_timeout_ms: int = Field(default=2_000, alias="INGEST_BUFFER_PUT_TIMEOUT_MS")
+    # readings that failed to store even on their own, kept for GET /health/ingest/dead-letters
+    ingest_buffer_dead_letter_size: int = Field(default=1_000, alias="INGEST_BUFFER_DEAD_LETTER_SIZE")
+    # WebSocket ingest (/api/v1/ingest/ws): frames queued per connection before the reader
+    # stops taking more, and the most readings written together in one batch
+    ws_ingest_queue_frames: int = Field(default=256, alias="WS_INGEST_QUEUE_FRAMES")
+    ws_ingest_max_rows: int = Field(default=1_000, alias="WS_INGEST_MAX_ROWS")
+    ws_ingest_auth_timeout_s: float = Field(default=10.0, alias="WS_INGEST_AUTH_TIMEOUT_S")
+    # Change-only storage: a reading within the deadband of the last stored value of its
+    # series extends that row (ts_end) instead of adding one; per sensor type, JSON in env
+    deadband_enabled: bool = Field(default=False, alias="DEADBAND_ENABLED")
+    deadband: dict[str, float] = Field(default_factory=lambda: {"temperature": 0.1, "humidity": 0.5}, alias="DEADBAND")
+    # a row is never extended past this age, so a flat series still gets a row every N seconds
+    deadband_max_silence_s: int = Field(default=900, alias="DEADBAND_MAX_SILENCE_S")
+    # Stats: target band per role ([low, high], JSON in env) for time-in-range, and how long
+    # a value still counts after its last reading when the sensor goes quiet
+    target_bands: dict[str, list[float]] = Field(
+        default_factory=lambda: {"basking_temp": [32.0, 38.0], "env_temp": [24.0, 30.0], "humidity": [40.0, 70.0]},
+        alias="TARGET_BANDS",
+    )
+    stats_max_hold_s: int = Field(default=1800, alias="STATS_MAX_HOLD_S")
+    # Liveness: a sensor silent for this long is reported stale
+    liveness_stale_after_s: int = Field(default=900, alias="LIVENESS_STALE_AFTER_S")
+    # Retention: purge raw readings older than N days (rollups are kept forever)
+    retention_enabled: bool = Field(default=False, alias="RETENTION_ENABLED")
+    retention_raw_days: int = Field(default=90, alias="RETENTION_RAW_DAYS")
+    retention_interval_s: int = Field(default=3600, alias="RETENTION_INTERVAL_S")
+    retention_chunk_rows: int = Field(default=5_000, alias="RETENTION_CHUNK_ROWS")
+    # VACUUM/ANALYZE after a run that removed at least this many rows
+    retention_vacuum_min_rows: int = Field(default=100_000, alias="RETENTION_VACUUM_MIN_ROWS")
     # CORS
     cors_allow_origins: list[str] = Field(default_factory=lambda: ["*"])
 
@@ -1,8 +1,20 @@
 from __future__ import annotations
 from sqlalchemy.orm import Session
-from sqlalchemy import select, desc, func
+from sqlalchemy import select, desc, func, insert
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta, timezone
-from .models import Terrarium, Reading, SensorType, SensorRole, SensorRoleName
+from typing import Iterable
+from .database import dialect_insert
+from .models import Terrarium, Sensor, Reading, ReadingRollup, SensorType, SensorRole, SensorRoleName, AlertRule, AlertEvent
+from .schemas import IngestPayload, AlertRuleIn
+from .state import hot_state, as_utc
+from .versions import data_versions
+from . import rollups
+from .config import settings
+from .deadband import deadband, compression
+from .sensors import sensor_registry, sensor_key
+from .alerts import alert_engine
+from .liveness import liveness, record as record_liveness
 
 def get_or_create_terrarium(db, slug: str) -> Terrarium:
     """Return existing terrarium by slug or create it on first use."""
@@ -21,45 +33,152 @@ def get_or_create_terrarium(db, slug: str) -> Terrarium:
     db.refresh(terr)
     return terr
 
-def create_reading(db: Session, terrarium: Terrarium, sensor_type: SensorType, value: float, unit: str, entity_id: str | None, ts: datetime) -> Reading:
-    r = Reading(
-        terrarium=terrarium,
-        sensor_type=sensor_type,
-        value=value,
-        unit=unit,
-        entity_id=entity_id,
-        ts=ts,
-    )
-    db.add(r)
+def get_or_create_terrariums(db: Session, slugs: Iterable[str]) -> dict[str, Terrarium]:
+    """Resolve many slugs with one SELECT; missing terrariums are flushed, not committed."""
+    wanted = set(slugs)
+    if not wanted:
+        return {}
+    found = {t.slug: t for t in db.execute(select(Terrarium).where(Terrarium.slug.in_(wanted))).scalars()}
+    missing = [Terrarium(slug=s) for s in sorted(wanted - found.keys())]
+    if not missing:
+        return found
+    db.add_all(missing)
+    try:
+        db.flush()
+    except IntegrityError:
+        # created by a concurrent request; fall back to the one-by-one path
+        db.rollback()
+        return {s: get_or_create_terrarium(db, s) for s in wanted}
+    found.update({t.slug: t for t in missing})
+    return found
+
+def _upsert_role(db: Session, terrarium_id: int, role: SensorRoleName, entity_id: str) -> None:
+    existing = db.scalar(select(SensorRole).where(SensorRole.terrarium_id == terrarium_id, SensorRole.role == role))
+    if existing:
+        existing.entity_id = entity_id
+    else:
+        db.add(SensorRole(terrarium_id=terrarium_id, role=role, entity_id=entity_id))
+
+def insert_readings(db: Session, rows: list[dict]) -> set[tuple[int, datetime]]:
+    """
+    Bulk INSERT of readings rows (sensor_id, ts, ...), skipping any whose natural
+    key (sensor_id, ts) is already stored. Returns the keys actually inserted.
+    """
+    if not rows:
+        return set()
+    stmt = (dialect_insert(db, Reading).on_conflict_do_nothing(index_elements=["sensor_id", "ts"])
+            .returning(Reading.sensor_id, Reading.ts))
+    return {(sensor_id, as_utc(ts)) for sensor_id, ts in db.execute(stmt, rows)}
+
+def ingest_batch(db: Session, payloads: list[IngestPayload]) -> list[str]:
+    """
+    Store many readings with one terrarium lookup, one bulk INSERT and one commit.
+    Slugs must already be normalized. Returns a status per payload, in order:
+    "stored", or "duplicate" for a reading whose (sensor, ts) is already stored
+    or came earlier in the batch (a retried push); duplicates have no effect.
+    Readings are stored under their sensor's id (app/sensors.py).
+    """
+    if not payloads:
+        return []
+    terrs = get_or_create_terrariums(db, (p.terrarium_slug for p in payloads))
+    rows = [
+        {
+            "terrarium_id": terrs[p.terrarium_slug].id,
+            "sensor_type": SensorType(p.sensor_type).value,
+            "value": p.value,
+            "unit": p.unit,
+            "entity_id": p.entity_id,
+            "ts": as_utc(p.ts),
+            # unset: a reading without a value means the sensor reported itself unavailable
+            "available": p.available if p.available is not None else p.value is not None,
+        }
+        for p in payloads
+    ]
+    sensors = sensor_registry.resolve(db, rows)
+    seen: set[tuple[int, datetime]] = set()
+    for r in rows:
+        r["sensor_id"] = sensors[sensor_key(r["terrarium_id"], r["sensor_type"], r["entity_id"])].id
+        key = (r["sensor_id"], r["ts"])
+        r["duplicate"] = key in seen
+        seen.add(key)
+    fresh = [r for r in rows if not r["duplicate"]]
+    runs = None
+    if settings.deadband_enabled:
+        runs, inserts = deadband.store(db, fresh)
+    else:
+        inserts = [{"sensor_id": r["sensor_id"], "value": r["value"], "available": r["available"], "ts": r["ts"]}
+                   for r in fresh]
+        for r, row in zip(fresh, inserts):
+            r["row"] = row
+    inserted = insert_readings(db, inserts)
+    for r in fresh:
+        # rows folded into a run were never inserted; the others must have been
+        if r.get("row") is not None and (r["sensor_id"], r["ts"]) not in inserted:
+            r["duplicate"] = True
+    stored = [(p, r) for p, r in zip(payloads, rows) if not r["duplicate"]]
+
+    # keep the minute/hour rollups current in the same transaction
+    buckets: rollups.Buckets = {}
+    for _p, r in stored:
+        rollups.accumulate(buckets, r["terrarium_id"], r["sensor_type"], r["entity_id"], r["value"], r["unit"], r["ts"])
+    rollups.upsert(db, buckets)
+
+    # role hints: last one wins per (terrarium, role)
+    roles = {(p.terrarium_slug, p.role): p.entity_id for p, _r in stored if p.role and p.entity_id}
+    for (slug, role), entity_id in roles.items():
+        _upsert_role(db, terrs[slug].id, SensorRoleName(role), entity_id)
+        alert_engine.set_role(slug, role, entity_id)
+
+    alerts = alert_engine.evaluate(db, ((p.terrarium_slug, p.entity_id, p.value, p.ts) for p, _r in stored))
+
     db.commit()
-    db.refresh(r)
-    return r
+    sensor_registry.remember(sensors)
+    if runs is not None:
+        deadband.commit(runs)
+    alert_engine.commit(*alerts)
+
+    for p, _r in stored:
+        hot_state.record(p.terrarium_slug, p.sensor_type, p.entity_id, p.value, p.unit, p.ts)
+    for (slug, role), entity_id in roles.items():
+        hot_state.set_role(slug, role, entity_id)
+
+    changes = []
+    for p, r in stored:
+        changes += liveness.report(p.terrarium_slug, r["sensor_type"], p.entity_id, r["ts"], r["available"], r["sensor_id"])
+    if changes:
+        record_liveness(db, changes)
+        liveness.commit(changes)
+    if stored:
+        data_versions.bump({p.terrarium_slug for p, _r in stored})
+    return ["duplicate" if r["duplicate"] else "stored" for r in rows]
 
 def latest_per_terrarium(db: Session):
     # Grab latest temperature and humidity per terrarium
     # Subqueries for latest ts per (terrarium, sensor_type)
     latest_ts = (
-        select(Reading.terrarium_id, Reading.sensor_type, func.max(Reading.ts).label("max_ts"))
-        .group_by(Reading.terrarium_id, Reading.sensor_type)
+        select(Sensor.terrarium_id, Sensor.sensor_type, func.max(Reading.ts).label("max_ts"))
+        .join(Reading, Reading.sensor_id == Sensor.id)
+        .group_by(Sensor.terrarium_id, Sensor.sensor_type)
         .subquery()
     )
     latest_rows = db.execute(
-        select(Reading, Terrarium.slug)
-        .join(latest_ts, (Reading.terrarium_id == latest_ts.c.terrarium_id) & (Reading.sensor_type == latest_ts.c.sensor_type) & (Reading.ts == latest_ts.c.max_ts))
-        .join(Terrarium, Terrarium.id == Reading.terrarium_id)
+        select(Reading, Sensor, Terrarium.slug)
+        .join(Sensor, Sensor.id == Reading.sensor_id)
+        .join(latest_ts, (Sensor.terrarium_id == latest_ts.c.terrarium_id) & (Sensor.sensor_type == latest_ts.c.sensor_type) & (Reading.ts == latest_ts.c.max_ts))
+        .join(Terrarium, Terrarium.id == Sensor.terrarium_id)
     ).all()
 
     # organize
     by_slug: dict[str, dict] = {}
-    for r, slug in latest_rows:
+    for r, sensor, slug in latest_rows:
         d = by_slug.setdefault(slug, {})
-        if r.sensor_type == SensorType.temperature:
+        if sensor.sensor_type == SensorType.temperature:
             d["temperature"] = r.value
-            d["temperature_unit"] = r.unit
+            d["temperature_unit"] = sensor.unit
             d["ts_temperature"] = r.ts
-        elif r.sensor_type == SensorType.humidity:
+        elif sensor.sensor_type == SensorType.humidity:
             d["humidity"] = r.value
-            d["humidity_unit"] = r.unit
+            d["humidity_unit"] = sensor.unit
             d["ts_humidity"] = r.ts
     # merge into list
     out = []
@@ -70,38 +189,103 @@ def latest_per_terrarium(db: Session):
         })
     return out
 
-def readings_window(db: Session, terrarium_slug: str, hours: int = 24):
+def readings_window(db: Session, terrarium_slug: str, hours: int = 24, since: datetime | None = None):
+    """
+    Raw rows touching the last `hours`, oldest first, as column rows (sensor_id,
+    sensor_type, entity_id, unit, value, available, ts, ts_end) rather than ORM objects. A
+    deadband row may have started before the window and still hold its value
+    inside it, so look back one max-silence interval and keep rows whose ts or
+    ts_end falls in the window. With `since`, only rows that started or were
+    extended after it (an incremental refresh).
+    """
     row = db.execute(select(Terrarium).where(Terrarium.slug == terrarium_slug)).scalar_one_or_none()
     if not row:
         return []
 
-    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    start = datetime.now(timezone.utc) - timedelta(hours=hours)
+    if since is not None:
+        start = max(start, as_utc(since))
+    lookback = start - timedelta(seconds=settings.deadband_max_silence_s)
     rows = db.execute(
-        select(Reading).where(Reading.terrarium_id == row.id, Reading.ts >= since).order_by(Reading.ts.asc())
+        select(Reading.sensor_id, Sensor.sensor_type, Sensor.entity_id, Sensor.unit,
+               Reading.value, Reading.available, Reading.ts, Reading.ts_end)
+        .join(Sensor, Sensor.id == Reading.sensor_id)
+        .where(Sensor.terrarium_id == row.id, Reading.ts >= lookback)
+        .order_by(Reading.ts.asc())
+    ).all()
+
+    if since is None:
+        return [r for r in rows if as_utc(r.ts_end or r.ts) >= start]
+    return [r for r in rows if as_utc(r.ts_end or r.ts) > start]
+
+# chart budget per series for resolution=auto
+AUTO_MAX_POINTS = 2000
+
+def pick_resolution(db: Session, terrarium_slug: str, hours: int) -> str:
+    """
+    Finest of raw / 1m / 1h whose busiest series stays within AUTO_MAX_POINTS.
+    Raw points per series are counted from the hourly rollups (at most one row
+    per series and hour) rather than from readings.
+    """
+    t = db.scalar(select(Terrarium).where(Terrarium.slug == terrarium_slug))
+    if not t:
+        return "raw"
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    raw_points = db.execute(
+        select(func.sum(ReadingRollup.count))
+        .where(ReadingRollup.resolution == "1h", ReadingRollup.terrarium_id == t.id,
+               ReadingRollup.bucket >= rollups.bucket_start(since, "1h"))
+        .group_by(ReadingRollup.sensor_type, ReadingRollup.entity_id)
     ).scalars().all()
+    if max(raw_points, default=0) <= AUTO_MAX_POINTS:
+        return "raw"
+    if hours * 60 <= AUTO_MAX_POINTS:
+        return "1m"
+    return "1h"
+
+def rollup_window(db: Session, terrarium_slug: str, hours: int, resolution: str, since: datetime | None = None):
+    """Rollup buckets of the last `hours`; with `since`, from the bucket containing it (it may have grown)."""
+    t = db.scalar(select(Terrarium).where(Terrarium.slug == terrarium_slug))
+    if not t:
+        return []
+    start = datetime.now(timezone.utc) - timedelta(hours=hours)
+    if since is not None:
+        start = max(start, as_utc(since))
+    return rollups.window(db, t.id, resolution, start)
 
-    return rows
 def list_seen_sensors(db: Session, terrarium_slug: str):
-    """Distinct entity_ids seen for this terrarium."""
+    """Distinct entity_ids seen for this terrarium: a lookup in the sensor registry."""
     t = db.scalar(select(Terrarium).where(Terrarium.slug == terrarium_slug))
     if not t:
         return []
     rows = db.execute(
-        select(Reading.entity_id, Reading.sensor_type)
-        .where(Reading.terrarium_id == t.id, Reading.entity_id.is_not(None))
-        .group_by(Reading.entity_id, Reading.sensor_type)
+        select(Sensor.entity_id, Sensor.sensor_type)
+        .where(Sensor.terrarium_id == t.id, Sensor.entity_id != "")
+        .order_by(Sensor.entity_id, Sensor.sensor_type)
     ).all()
-    return [{"entity_id": e, "sensor_type": s.value if hasattr(s, "value") else s} for e, s in rows if e]
+    return [{"entity_id": e, "sensor_type": s} for e, s in rows]
+
+def compression_report(db: Session, terrarium_slug: str | None = None, hours: int = 24) -> list[dict]:
+    """Deadband compression per entity over the last `hours`: readings received vs. rows stored."""
+    terrs = {t.id: t.slug for t in db.execute(select(Terrarium)).scalars()}
+    wanted = None
+    if terrarium_slug is not None:
+        wanted = next((i for i, s in terrs.items() if s == terrarium_slug), None)
+        if wanted is None:
+            return []
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    out = []
+    for r in compression(db, terrarium_id=wanted, since=since):
+        out.append({"terrarium_slug": terrs[r.pop("terrarium_id")], **r})
+    return out
 
 def set_role(db: Session, terrarium_slug: str, role: SensorRoleName, entity_id: str):
     t = get_or_create_terrarium(db, terrarium_slug)
-    # upsert
-    existing = db.scalar(select(SensorRole).where(SensorRole.terrarium_id == t.id, SensorRole.role == role))
-    if existing:
-        existing.entity_id = entity_id
-    else:
-        db.add(SensorRole(terrarium_id=t.id, role=role, entity_id=entity_id))
+    _upsert_role(db, t.id, role, entity_id)
     db.commit()
+    hot_state.set_role(t.slug, role.value, entity_id)
+    alert_engine.set_role(t.slug, role.value, entity_id)
+    data_versions.bump([t.slug])
 
 def get_role_map(db: Session, terrarium_slug: str) -> dict[str, str]:
     t = db.scalar(select(Terrarium).where(Terrarium.slug == terrarium_slug))
@@ -113,50 +297,107 @@ def get_role_map(db: Session, terrarium_slug: str) -> dict[str, str]:
 def role_summary(db: Session):
     """
     For each terrarium, return latest reading for each canonical role (if mapped).
+
+    One statement: terrariums LEFT JOIN their role mappings LEFT JOIN the newest
+    reading of each mapped entity. The correlated "newest id" subquery is a
+    portable lateral join: uq_sensor finds the entity's sensors and
+    ix_readings_sensor_ts the newest row, one index seek per mapped role on
+    both SQLite and Postgres.
     """
-    # load all terrariums
-    terrs = db.execute(select(Terrarium)).scalars().all()
-    out = []
-    for t in terrs:
-        # role->entity map
-        roles = db.execute(select(SensorRole).where(SensorRole.terrarium_id == t.id)).scalars().all()
-        role_map = {r.role: r.entity_id for r in roles}
-
-        # helper to fetch latest by entity_id
-        def latest_by_entity(eid: str) -> Reading | None:
-            return db.execute(
-                select(Reading).where(Reading.terrarium_id == t.id, Reading.entity_id == eid)
-                .order_by(Reading.ts.desc())
-                .limit(1)
-            ).scalar_one_or_none()
-
-        item = {
-            "terrarium_slug": t.slug,
-            "basking_temp": None, "basking_temp_unit": None, "basking_temp_ts": None,
-            "env_temp": None, "env_temp_unit": None, "env_temp_ts": None,
-            "humidity": None, "humidity_unit": None, "humidity_ts": None,
-        }
+    latest_id = (
+        select(Reading.id)
+        .join(Sensor, Sensor.id == Reading.sensor_id)
+        .where(Sensor.terrarium_id == SensorRole.terrarium_id, Sensor.entity_id == SensorRole.entity_id)
+        .order_by(Reading.ts.desc())
+        .limit(1)
+        .correlate(SensorRole)
+        .scalar_subquery()
+    )
+    rows = db.execute(
+        select(Terrarium.slug, SensorRole.role, Reading.value, Sensor.unit, Reading.ts)
+        .select_from(Terrarium)
+        .outerjoin(SensorRole, SensorRole.terrarium_id == Terrarium.id)
+        .outerjoin(Reading, Reading.id == latest_id)
+        .outerjoin(Sensor, Sensor.id == Reading.sensor_id)
+        .order_by(Terrarium.id)
+    ).all()
+
+    by_slug: dict[str, dict] = {}
+    for slug, role, value, unit, ts in rows:
+        item = by_slug.get(slug)
+        if item is None:
+            item = by_slug[slug] = {"terrarium_slug": slug}
+            for r in SensorRoleName:
+                item.update({r.value: None, f"{r.value}_unit": None, f"{r.value}_ts": None})
+        if role is not None and ts is not None:
+            item[role.value] = value
+            item[f"{role.value}_unit"] = unit
+            item[f"{role.value}_ts"] = ts
+    return list(by_slug.values())
+
+# ---- alert rules ----
+
+def _alert_rule_out(r: AlertRule, slug: str) -> dict:
+    return {
+        "id": r.id, "terrarium_slug": slug, "role": r.role.value, "name": r.name,
+        "min_value": r.min_value, "max_value": r.max_value, "max_rate": r.max_rate,
+        "hysteresis": r.hysteresis, "min_duration_s": r.min_duration_s, "enabled": r.enabled,
+    }
+
+def list_alert_rules(db: Session, terrarium_slug: str | None = None) -> list[dict]:
+    q = select(AlertRule, Terrarium.slug).join(Terrarium, Terrarium.id == AlertRule.terrarium_id).order_by(AlertRule.id)
+    if terrarium_slug:
+        q = q.where(Terrarium.slug == terrarium_slug)
+    return [_alert_rule_out(r, slug) for r, slug in db.execute(q)]
+
+def save_alert_rule(db: Session, rule: AlertRuleIn, rule_id: int | None = None) -> dict | None:
+    """Create a rule, or replace rule `rule_id` (None if it does not exist)."""
+    t = get_or_create_terrarium(db, rule.terrarium_slug)
+    if rule_id is None:
+        r = AlertRule()
+        db.add(r)
+    else:
+        r = db.get(AlertRule, rule_id)
+        if r is None:
+            return None
+    fields = rule.model_dump(exclude={"terrarium_slug"})
+    fields["role"] = SensorRoleName(fields["role"])
+    for k, v in fields.items():
+        setattr(r, k, v)
+    r.terrarium_id = t.id
+    db.commit()
+    alert_engine.invalidate()
+    return _alert_rule_out(r, t.slug)
+
+def delete_alert_rule(db: Session, rule_id: int) -> bool:
+    r = db.get(AlertRule, rule_id)
+    if r is None:
+        return False
+    db.delete(r)
+    db.commit()
+    alert_engine.invalidate()
+    return True
+
+def alert_events(db: Session, terrarium_slug: str | None, hours: int, limit: int) -> list[dict]:
+    """Alert state changes of the last `hours`, newest first."""
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    q = (
+        select(AlertEvent, AlertRule.role, Terrarium.slug)
+        .join(AlertRule, AlertRule.id == AlertEvent.rule_id)
+        .join(Terrarium, Terrarium.id == AlertRule.terrarium_id)
+        .where(AlertEvent.ts >= since)
+        .order_by(AlertEvent.ts.desc(), AlertEvent.id.desc())
+        .limit(limit)
+    )
+    if terrarium_slug:
+        q = q.where(Terrarium.slug == terrarium_slug)
+    return [
+        {"id": e.id, "rule_id": e.rule_id, "terrarium_slug": slug, "role": role.value, "state": e.state,
+         "reason": e.reason, "value": e.value, "ts": as_utc(e.ts)}
+        for e, role, slug in db.execute(q)
+    ]
 
-        if SensorRoleName.basking_temp in role_map:
-            r = latest_by_entity(role_map[SensorRoleName.basking_temp])
-            if r:
-                item["basking_temp"] = r.value
-                item["basking_temp_unit"] = r.unit
-                item["basking_temp_ts"] = r.ts
-
-        if SensorRoleName.env_temp in role_map:
-            r = latest_by_entity(role_map[SensorRoleName.env_temp])
-            if r:
-                item["env_temp"] = r.value
-                item["env_temp_unit"] = r.unit
-                item["env_temp_ts"] = r.ts
-
-        if SensorRoleName.humidity in role_map:
-            r = latest_by_entity(role_map[SensorRoleName.humidity])
-            if r:
-                item["humidity"] = r.value
-                item["humidity_unit"] = r.unit
-                item["humidity_ts"] = r.ts
-
-        out.append(item)
-    return out
\ No newline at end of file
+def active_alerts(db: Session) -> list[dict]:
+    if not alert_engine.loaded:
+        alert_engine.load(db)
+    return alert_engine.active()
@@ -1,24 +1,143 @@
 from __future__ import annotations
-from sqlalchemy import create_engine
+import asyncio
+import contextvars
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, TypeVar
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, DeclarativeBase, Session
 from sqlalchemy.pool import StaticPool
 from .config import settings
+from . import metrics
 
 class Base(DeclarativeBase):
     pass
 
-# SQLite file by default; works fine in Lightsail too
-if settings.database_url.startswith("sqlite"):
+def _sqlite_pragmas(dbapi_conn, readonly: bool) -> None:
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")        # durable at checkpoints; WAL keeps the file consistent
+    cur.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cur.execute(f"PRAGMA cache_size={-int(settings.sqlite_cache_kib)}")
+    cur.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    if readonly:
+        cur.execute("PRAGMA query_only=ON")
+    cur.close()
+
+IS_SQLITE = settings.database_url.startswith("sqlite")
+# WAL needs a file: an in-memory database exists once per connection
+SQLITE_WAL = IS_SQLITE and settings.sqlite_mode == "wal" and ":memory:" not in settings.database_url \
+    and settings.database_url not in ("sqlite://", "sqlite:///")
+
+if SQLITE_WAL:
+    # one writer connection (the pool never opens a second), and a pool of read
+    # connections: WAL lets readers run next to the writer and each other
     engine = create_engine(
+        settings.database_url,
+        connect_args={"check_same_thread": False},
+        pool_size=1, max_overflow=0, pool_timeout=60,
+        future=True,
+    )
+    read_engine = create_engine(
+        settings.database_url,
+        connect_args={"check_same_thread": False},
+        pool_size=settings.sqlite_read_connections, max_overflow=settings.sqlite_read_connections * 4,
+        future=True,
+    )
+    event.listen(engine, "connect", lambda conn, _rec: _sqlite_pragmas(conn, readonly=False))
+    event.listen(read_engine, "connect", lambda conn, _rec: _sqlite_pragmas(conn, readonly=True))
+elif IS_SQLITE:
+    # SQLITE_MODE=shared: one connection for everything
+    engine = read_engine = create_engine(
         settings.database_url,
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
         future=True,
     )
 else:
-    engine = create_engine(settings.database_url, future=True, pool_pre_ping=True)
+    engine = read_engine = create_engine(settings.database_url, future=True, pool_pre_ping=True)
+
+# statement count and DB time, per request and in total (app/metrics.py)
+def _statement_start(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_t0 = time.perf_counter()
+
+def _statement_end(conn, cursor, statement, parameters, context, executemany):
+    metrics.record_statement(time.perf_counter() - context._metrics_t0)
+
+for _e in {engine, read_engine}:
+    event.listen(_e, "before_cursor_execute", _statement_start)
+    event.listen(_e, "after_cursor_execute", _statement_end)
 
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
+# read-only work; the same engine as SessionLocal unless SQLite runs in WAL mode
+ReadSessionLocal = sessionmaker(bind=read_engine, autocommit=False, autoflush=False, future=True)
+
+# Async routes hand their DB work to this pool instead of running it on the event loop.
+# SQLite gets exactly one DB thread: it owns the one (writer) connection.
+db_executor = ThreadPoolExecutor(
+    max_workers=1 if IS_SQLITE else settings.db_executor_workers,
+    thread_name_prefix="db",
+)
+# reads (run_db_read, stream_db) get their own threads when they have their own connections
+read_executor = ThreadPoolExecutor(max_workers=settings.db_executor_workers, thread_name_prefix="db-read") \
+    if SQLITE_WAL else db_executor
+
+T = TypeVar("T")
+
+async def run_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Call fn(db, *args, **kwargs) with a fresh session on the DB executor and await the result."""
+    def call() -> T:
+        with SessionLocal() as db:
+            return fn(db, *args, **kwargs)
+    ctx = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(db_executor, ctx.run, call)
+
+async def run_db_read(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """run_db for work that only reads: a read session on the read executor, off the writer's queue."""
+    def call() -> T:
+        with ReadSessionLocal() as db:
+            return fn(db, *args, **kwargs)
+    ctx = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(read_executor, ctx.run, call)
+
+async def stream_db(fn: Callable[..., Iterator[T]], *args: Any, **kwargs: Any) -> AsyncIterator[T]:
+    """
+    Async-iterate the generator fn(db, *args, **kwargs), running every step on the
+    read executor with one read session held open for the whole iteration. For
+    streaming responses: the event loop only forwards items. With SQLite in
+    shared mode the steps interleave with other DB work on its single thread
+    instead of racing it.
+    """
+    db = ReadSessionLocal()
+    it = fn(db, *args, **kwargs)
+    done = object()
+    ctx = contextvars.copy_context()
+
+    def close() -> None:
+        try:
+            it.close()
+        finally:
+            db.close()
+
+    step: Future | None = None
+    try:
+        while True:
+            step = read_executor.submit(ctx.run, next, it, done)
+            item = await asyncio.wrap_future(step)
+            if item is done:
+                break
+            yield item
+    finally:
+        # not awaited: on client disconnect we are being cancelled
+        if step is not None and not step.done():
+            # a step is still running: close after it, on the thread that ran it
+            step.add_done_callback(lambda _f: close())
+        else:
+            try:
+                read_executor.submit(close)
+            except RuntimeError:        # executor shut down
+                close()
 
 def get_db() -> Session:
     db = SessionLocal()
@@ -27,6 +146,22 @@ def get_db() -> Session:
     finally:
         db.close()
 
+def get_read_db() -> Session:
+    """get_db for routes that only read."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def dialect_insert(db: Session, model):
+    """INSERT into `model`'s table for the session's dialect; both SQLite and Postgres support ON CONFLICT."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
 def init_db() -> None:
     from . import models  # noqa: F401
     Base.metadata.create_all(bind=engine)
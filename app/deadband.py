@@ -0,0 +1,249 @@
+# app/deadband.py
+"""
+Change-only storage for repetitive sensor values (DEADBAND_ENABLED).
+
+Home Assistant pushes on every state change, attribute-only changes included,
+so long runs of the same value used to become one row each. With the deadband
+on, a reading is folded into its series' last stored row when
+
+- its value differs from that row's value by less than the sensor type's
+  deadband (DEADBAND, e.g. 0.1 °C / 0.5 %RH; exact repeats always count), and
+- it is newer than the row's ts_end and less than DEADBAND_MAX_SILENCE_S after
+  the row's ts.
+
+Folding moves the row's ts_end forward and bumps its `repeats` counter, so a
+row reads "value held from ts until ts_end". step_points() turns rows back into
+the step series the chart expects.
+
+The last stored row of each sensor is kept in memory and loaded from the DB the
+first time a sensor is seen by this process. With several workers another
+process may have extended that row, or stored a newer one, since: a row is
+only extended while it is still the sensor's newest and still ends where this
+process last saw it. Otherwise the readings are stored as rows of their own
+and the sensor's run is re-read from the DB on its next reading. The cache lock
+is never held across DB work, so batches of different sensors do not queue on it.
+"""
+from __future__ import annotations
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import select, update, bindparam, func, exists
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import Reading, Sensor
+from .state import as_utc
+
+
+@dataclass
+class Run:
+    value: float | None
+    ts: datetime                # start; with the sensor id it identifies the row
+    ts_end: datetime
+    available: bool = True
+    row: dict | None = None     # the pending insert, while it is not in the DB yet
+
+
+_readings = Reading.__table__
+
+_newer = _readings.alias("newer")
+
+# extends the run's row only if it is still as this process cached it: it ends at
+# b_prev_end, and no other process has stored a newer row of the sensor since
+_extend = (
+    update(_readings)
+    .where(_readings.c.sensor_id == bindparam("b_sensor_id"), _readings.c.ts == bindparam("b_ts", type_=_readings.c.ts.type),
+           func.coalesce(_readings.c.ts_end, _readings.c.ts) == bindparam("b_prev_end", type_=_readings.c.ts.type),
+           ~exists().where(_newer.c.sensor_id == _readings.c.sensor_id, _newer.c.ts > _readings.c.ts))
+    .values(ts_end=bindparam("b_ts_end", type_=_readings.c.ts_end.type), repeats=_readings.c.repeats + bindparam("b_n"))
+)
+
+
+class Deadband:
+    def __init__(self, bands: dict[str, float], max_silence_s: int) -> None:
+        self.bands = bands
+        self.max_silence_s = max_silence_s
+        self._runs: dict[int, Run | None] = {}
+        self._lock = threading.Lock()
+
+    def store(self, db: Session, rows: list[dict]) -> tuple[dict[int, Run | None], list[dict]]:
+        """
+        Sort `rows` (ingest_batch's row dicts with sensor_id set, in arrival order)
+        into rows to INSERT, which start a new run, and readings folded into a run,
+        which are written here. A reading within the span and band of its run, or
+        of an earlier row it is late for, is a repeated push of one already folded
+        in: it is marked "duplicate" and ignored. Each row to insert is also set as
+        its reading's "row". Returns the resulting runs, to hand to commit() once
+        the transaction has committed, and the rows to insert.
+
+        The lock only guards the cache: the DB work runs outside it, and the
+        conditional UPDATE keeps concurrent batches of a sensor from both
+        extending its row.
+        """
+        keys = list(dict.fromkeys(r["sensor_id"] for r in rows))
+        with self._lock:
+            cached = {k: self._runs[k] for k in keys if k in self._runs}
+        staged: dict[int, Run | None] = {}
+        for k in keys:
+            if k not in cached:
+                staged[k] = self._load(db, k)
+            elif (run := cached[k]) is not None:
+                staged[k] = Run(run.value, run.ts, run.ts_end, run.available)
+            else:
+                staged[k] = None
+        inserts: list[dict] = []
+        extended: dict[int, dict] = {}
+        for r in rows:
+            key = r["sensor_id"]
+            run = staged[key]
+            if run is not None and run.ts <= r["ts"] <= run.ts_end and self._matches(run, r):
+                r["duplicate"] = True
+                continue
+            if run is not None and r["ts"] < run.ts and self._covered(db, key, r):
+                r["duplicate"] = True
+                continue
+            if run is not None and self._absorbs(run, r):
+                if run.row is not None:
+                    run.row["ts_end"] = r["ts"]
+                    run.row["repeats"] += 1
+                else:
+                    ext = extended.setdefault(key, {"b_sensor_id": key, "b_ts": run.ts, "b_prev_end": run.ts_end,
+                                                    "b_n": 0, "run": run, "readings": []})
+                    ext["b_ts_end"] = r["ts"]
+                    ext["b_n"] += 1
+                    ext["readings"].append(r)
+                run.ts_end = r["ts"]
+                continue
+            row = {"sensor_id": key, "value": r["value"], "available": r["available"], "ts": r["ts"],
+                   "ts_end": None, "repeats": 0}
+            inserts.append(row)
+            r["row"] = row
+            # a late reading is stored as-is and leaves the current run alone
+            if run is None or r["ts"] >= run.ts_end:
+                staged[key] = Run(r["value"], r["ts"], r["ts"], r["available"], row)
+        # one UPDATE per extended row, to see which ones another process got to first
+        stale = []
+        for key, ext in extended.items():
+            params = {k: v for k, v in ext.items() if k.startswith("b_")}
+            if db.execute(_extend, params).rowcount:
+                continue
+            # stale run: store its readings as they are, and re-read the run next time
+            for r in ext["readings"]:
+                row = {"sensor_id": key, "value": r["value"], "available": r["available"], "ts": r["ts"],
+                       "ts_end": None, "repeats": 0}
+                inserts.append(row)
+                r["row"] = row
+            if staged.get(key) is ext["run"]:
+                del staged[key]
+            stale.append(key)
+        if stale:
+            with self._lock:
+                for key in stale:
+                    self._runs.pop(key, None)
+        return staged, inserts
+
+    def commit(self, staged: dict[int, Run | None]) -> None:
+        """Adopt the runs returned by store() once its transaction has committed."""
+        with self._lock:
+            for key, run in staged.items():
+                if run is not None:
+                    run.row = None
+                self._runs[key] = run
+
+    def _load(self, db: Session, sensor_id: int) -> Run | None:
+        last = db.execute(
+            select(Reading.value, Reading.ts, Reading.ts_end, Reading.available)
+            .where(Reading.sensor_id == sensor_id)
+            .order_by(Reading.ts.desc())
+            .limit(1)
+        ).first()
+        if last is None:
+            return None
+        value, ts, ts_end, available = last
+        return Run(value, as_utc(ts), as_utc(ts_end or ts), available)
+
+    def _covered(self, db: Session, sensor_id: int, r: dict) -> bool:
+        """Whether a late reading falls within the span and band of an earlier, closed row."""
+        prev = db.execute(
+            select(Reading.value, Reading.ts, Reading.ts_end, Reading.available)
+            .where(Reading.sensor_id == sensor_id, Reading.ts < r["ts"])
+            .order_by(Reading.ts.desc())
+            .limit(1)
+        ).first()
+        if prev is None or prev.ts_end is None or as_utc(prev.ts_end) < r["ts"]:
+            return False
+        return self._matches(Run(prev.value, as_utc(prev.ts), as_utc(prev.ts_end), prev.available), r)
+
+    def _absorbs(self, run: Run, r: dict) -> bool:
+        if r["ts"] < run.ts_end:
+            return False
+        if (r["ts"] - run.ts).total_seconds() >= self.max_silence_s:
+            return False
+        return self._matches(run, r)
+
+    def _matches(self, run: Run, r: dict) -> bool:
+        """Whether `r` reads the same as `run`: same availability, value within the band."""
+        band = self.bands.get(r["sensor_type"])
+        if band is None or r["available"] != run.available:
+            return False
+        if run.value is None or r["value"] is None:
+            return run.value is None and r["value"] is None
+        diff = abs(r["value"] - run.value)
+        return diff == 0 or diff < band
+
+
+def step_points(rows: Iterable) -> list[tuple]:
+    """
+    (row, ts) pairs for a step series, ordered by ts: each row at its ts, and again
+    at its ts_end if it was extended. A hold is cut short where a later-stored (late)
+    reading of the same series starts.
+    """
+    rows = list(rows)
+    following: dict[int, datetime] = {}
+    ends: list[datetime | None] = [None] * len(rows)
+    for i in range(len(rows) - 1, -1, -1):
+        r = rows[i]
+        end = r.ts_end
+        if end is not None and r.sensor_id in following:
+            end = min(end, following[r.sensor_id])
+        ends[i] = end
+        following[r.sensor_id] = r.ts
+    points = []
+    for r, end in zip(rows, ends):
+        points.append((r, r.ts))
+        if end is not None and end > r.ts:
+            points.append((r, end))
+    points.sort(key=lambda p: p[1])
+    return points
+
+
+def compression(db: Session, terrarium_id: int | None = None, since: datetime | None = None) -> list[dict]:
+    """Readings received vs. rows stored per sensor."""
+    q = (
+        select(Sensor.terrarium_id, Sensor.sensor_type, Sensor.entity_id,
+               func.count().label("stored"), func.coalesce(func.sum(Reading.repeats), 0).label("folded"))
+        .join(Reading, Reading.sensor_id == Sensor.id)
+        .group_by(Sensor.id, Sensor.terrarium_id, Sensor.sensor_type, Sensor.entity_id)
+        .order_by(Sensor.terrarium_id, Sensor.sensor_type, Sensor.entity_id)
+    )
+    if terrarium_id is not None:
+        q = q.where(Sensor.terrarium_id == terrarium_id)
+    if since is not None:
+        q = q.where(Reading.ts >= since)
+    out = []
+    for terrarium_id, sensor_type, entity_id, stored, folded in db.execute(q):
+        received = stored + folded
+        out.append({
+            "terrarium_id": terrarium_id,
+            "sensor_type": sensor_type,
+            "entity_id": entity_id or None,
+            "received": received,
+            "stored": stored,
+            "ratio": round(received / stored, 2) if stored else None,
+        })
+    return out
+
+
+deadband = Deadband(settings.deadband, settings.deadband_max_silence_s)
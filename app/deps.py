@@ -8,3 +8,7 @@ def verify_api_key(x_api_key: str | None = Header(None, alias="X-API-Key")) -> N
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing X-API-Key")
     if not hmac.compare_digest(x_api_key, settings.reptile_api_key):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Bad API Key")
+
+def api_key_valid(key: str | None) -> bool:
+    """The same check for callers outside a request, such as a WebSocket's auth frame."""
+    return bool(key) and hmac.compare_digest(key, settings.reptile_api_key)
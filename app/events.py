@@ -1,29 +1,215 @@
 # app/events.py
 import asyncio
-from typing import Any, Set
+import logging
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Iterable
+
+from .bus_backends import Backend, make_backend
+from .config import settings
+from .alerts import alert_engine
+from .liveness import liveness
+from .state import as_utc, hot_state
+from .versions import data_versions
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BusEvent:
+    id: int
+    data: Any
+
 
 class EventBus:
-    def __init__(self) -> None:
-        self._subs: Set[asyncio.Queue] = set()
+    """
+    In-process pub/sub. Every published item gets a monotonically increasing id
+    and is kept in a bounded ring buffer, so a reconnecting SSE client can ask for
+    what it missed (since()). `epoch` changes on every process start; ids from a
+    previous process are meaningless.
+
+    With a cross-process backend (EVENT_BUS_BACKEND), published items are also
+    sent to the other workers. Items arriving from another worker are applied to
+    the local hot-state cache and then delivered here like local ones, each
+    getting a local id.
+    """
+
+    def __init__(self, history: int = 1000, backend: Backend | None = None) -> None:
+        self._subs: dict[asyncio.Queue, int] = {}      # queue -> subscriber number
+        self._next_sub = 0
         self._lock = asyncio.Lock()
+        self._history: deque[BusEvent] = deque(maxlen=history)
+        self._last_id = 0
+        self.epoch = format(time.time_ns(), "x")
+        self.dropped = 0
+        self.origin = uuid.uuid4().hex
+        self.backend = backend or Backend()
+
+    async def start(self) -> None:
+        await self.backend.start(self.receive)
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
 
     async def subscribe(self) -> asyncio.Queue:
         q: asyncio.Queue = asyncio.Queue(maxsize=100)
         async with self._lock:
-            self._subs.add(q)
+            self._next_sub += 1
+            self._subs[q] = self._next_sub
         return q
 
     async def unsubscribe(self, q: asyncio.Queue) -> None:
         async with self._lock:
-            self._subs.discard(q)
+            self._subs.pop(q, None)
+
+    async def publish(self, item: Any) -> BusEvent:
+        ev = await self._deliver(item)
+        try:
+            await self.backend.send({"origin": self.origin, "data": item})
+        except Exception:
+            # other workers miss this one; never fail the write that triggered it
+            log.exception("event bus: %s backend send failed", self.backend.name)
+        return ev
+
+    async def receive(self, msg: dict) -> None:
+        """Entry point for messages from other workers."""
+        if msg.get("origin") == self.origin:
+            return
+        data = msg.get("data")
+        if isinstance(data, dict) and data.get("kind") == "history" and data.get("readings") and hot_state.warm:
+            from .database import run_db_read
+            await run_db_read(hot_state.warm_from_db)
+        apply_to_state(data)
+        await self._deliver(data)
 
-    async def publish(self, item: Any) -> None:
+    async def _deliver(self, item: Any) -> BusEvent:
         async with self._lock:
+            self._last_id += 1
+            ev = BusEvent(self._last_id, item)
+            self._history.append(ev)
             subs = list(self._subs)
         for q in subs:
             try:
-                q.put_nowait(item)
+                q.put_nowait(ev)
             except asyncio.QueueFull:
-                pass  # drop if a client is slow
+                # slow client: it will see a gap in ids and can resync
+                self.dropped += 1
+                log.debug("event bus: subscriber %s queue full, dropped event %d", self._subs.get(q), ev.id)
+        return ev
+
+    def queue_depths(self) -> dict[int, int]:
+        """Events waiting per subscriber number."""
+        return {n: q.qsize() for q, n in list(self._subs.items())}
+
+    def since(self, last_id: int) -> list[BusEvent] | None:
+        """Events after last_id, or None if some of them already left the ring buffer."""
+        if last_id > self._last_id:
+            return None
+        if last_id == self._last_id:
+            return []
+        if not self._history or self._history[0].id > last_id + 1:
+            return None
+        return [e for e in self._history if e.id > last_id]
+
+
+def readings_event(payloads: Iterable) -> dict:
+    """
+    Bus message for a set of stored readings: the terrariums touched, how many
+    readings, the newest reading per (terrarium, entity or sensor type) and any
+    role hints they carried.
+    """
+    latest: dict[tuple, dict] = {}
+    roles: dict[tuple, str] = {}
+    count = 0
+    for p in payloads:
+        count += 1
+        if p.role and p.entity_id:
+            roles[(p.terrarium_slug, p.role)] = p.entity_id
+        key = (p.terrarium_slug, p.entity_id or p.sensor_type)
+        ts = as_utc(p.ts)
+        cur = latest.get(key)
+        if cur is None or ts >= cur["_ts"]:
+            latest[key] = {
+                "terrarium": p.terrarium_slug,
+                "sensor_type": p.sensor_type,
+                "entity_id": p.entity_id,
+                "value": p.value,
+                "unit": p.unit,
+                "available": p.available if p.available is not None else p.value is not None,
+                "ts": ts.isoformat(),
+                "_ts": ts,
+            }
+    for d in latest.values():
+        del d["_ts"]
+    return {
+        "kind": "readings",
+        "terrariums": sorted({k[0] for k in latest}),
+        "count": count,
+        "latest": list(latest.values()),
+        "roles": [{"terrarium": t, "role": r, "entity_id": e} for (t, r), e in roles.items()],
+    }
+
+
+def apply_to_state(data: Any) -> None:
+    """Mirror another worker's write into this worker's hot-state cache."""
+    if not isinstance(data, dict):
+        return
+    if data.get("kind") == "readings":
+        for r in data.get("latest", []):
+            ts = datetime.fromisoformat(r["ts"])
+            hot_state.record(r["terrarium"], r["sensor_type"], r["entity_id"], r["value"], r["unit"], ts)
+            liveness.report(r["terrarium"], r["sensor_type"], r["entity_id"], ts, r.get("available", True), local=False)
+    for r in data.get("roles", []):
+        hot_state.set_role(r["terrarium"], r["role"], r["entity_id"])
+        alert_engine.set_role(r["terrarium"], r["role"], r["entity_id"])
+    if data.get("kind") == "alert":
+        alert_engine.apply_remote(data["alerts"])
+    elif data.get("kind") == "alert_rules":
+        alert_engine.invalidate()
+    elif data.get("kind") == "liveness":
+        for c in data["changes"]:
+            if c["reason"] == "stale":
+                liveness.mark_stale((c["terrarium"], c["key"]), datetime.fromisoformat(c["ts"]).timestamp())
+    if data.get("kind") == "history":
+        data_versions.bump_all()
+    elif data.get("kind") in ("readings", "liveness"):
+        data_versions.bump(data["terrariums"])
+    elif data.get("roles"):
+        data_versions.bump(r["terrarium"] for r in data["roles"])
+
+
+def history_event(readings: bool) -> dict:
+    """
+    Bus message for a bulk write outside the app (importer, rollup backfill):
+    every ETag changes, and with `readings` the hot-state cache is reloaded.
+    """
+    return {"kind": "history", "readings": readings}
+
+
+async def announce(data: dict) -> bool:
+    """
+    Tell the app's workers about a write made by another process (a CLI job).
+    False when none could be reached, as with the in-process (memory) backend.
+    """
+    backend = make_backend(settings.event_bus_backend, settings.database_url, settings.event_bus_socket)
+    try:
+        if await backend.send_once({"origin": f"cli-{uuid.uuid4().hex}", "data": data}):
+            return True
+    except Exception:
+        log.exception("event bus: could not announce %s", data.get("kind"))
+    log.warning("event bus: no running app reached over EVENT_BUS_BACKEND=%s; restart it so clients "
+                "holding an ETag see the new data", settings.event_bus_backend)
+    return False
+
 
-event_bus = EventBus()
+event_bus = EventBus(
+    history=settings.event_history_size,
+    backend=make_backend(settings.event_bus_backend, settings.database_url, settings.event_bus_socket),
+)
@@ -0,0 +1,67 @@
+# app/export.py
+"""
+Streaming export of raw readings as NDJSON or CSV.
+
+Rows are pulled with yield_per (a server-side cursor on Postgres, incremental
+fetches on SQLite), only the exported columns are selected, and each batch is
+encoded and handed on before the next one is fetched, so memory stays flat
+whatever the range. Run it through database.stream_db.
+"""
+from __future__ import annotations
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .models import Terrarium, Sensor, Reading
+from .state import as_utc
+
+CHUNK_ROWS = 2_000
+
+COLUMNS = ("terrarium_slug", "sensor_type", "entity_id", "unit", "value", "ts", "ts_end")
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _rows(db: Session, slugs: list[str] | None, start: datetime, end: datetime) -> Iterator[list[tuple]]:
+    stmt = (
+        select(Terrarium.slug, Sensor.sensor_type, Sensor.entity_id, Sensor.unit, Reading.value, Reading.ts, Reading.ts_end)
+        .join(Sensor, Sensor.id == Reading.sensor_id)
+        .join(Terrarium, Terrarium.id == Sensor.terrarium_id)
+        .where(Reading.ts >= start, Reading.ts < end)
+        .order_by(Reading.ts)
+        .execution_options(yield_per=CHUNK_ROWS)
+    )
+    if slugs:
+        stmt = stmt.where(Terrarium.slug.in_(slugs))
+    yield from db.execute(stmt).partitions()
+
+
+def _iso(ts: datetime | None) -> str | None:
+    return as_utc(ts).isoformat() if ts is not None else None
+
+
+def chunks(db: Session, fmt: str, slugs: list[str] | None, start: datetime, end: datetime) -> Iterator[str]:
+    """Encoded export, one string per fetched batch (CSV starts with its header)."""
+    if fmt == "csv":
+        buf = io.StringIO()
+        w = csv.writer(buf, lineterminator="\n")
+        w.writerow(COLUMNS)
+        yield buf.getvalue()
+        for part in _rows(db, slugs, start, end):
+            buf.seek(0)
+            buf.truncate()
+            w.writerows((slug, st, eid or "", unit or "", "" if v is None else v, _iso(ts), _iso(te) or "")
+                        for slug, st, eid, unit, v, ts, te in part)
+            yield buf.getvalue()
+        return
+
+    for part in _rows(db, slugs, start, end):
+        yield "".join(
+            json.dumps(dict(zip(COLUMNS, (slug, st, eid or None, unit, v, _iso(ts), _iso(te)))), ensure_ascii=False) + "\n"
+            for slug, st, eid, unit, v, ts, te in part
+        )
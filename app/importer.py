@@ -0,0 +1,450 @@
+# app/importer.py
+"""
+Bulk history import from a Home Assistant recorder database or a CSV file.
+
+    python -m app.importer ha /config/home-assistant_v2.db [--source auto|states|statistics]
+    python -m app.importer csv history.csv
+
+Entities are mapped to a terrarium and sensor type through the role mapping
+(basking_temp / env_temp -> temperature, humidity -> humidity), then through
+the sensors already known from ingest, then through --map ENTITY=SLUG:TYPE.
+Rows of any other entity are skipped.
+
+The source is read in its own order, --chunk rows at a time. Each chunk is
+written with one executemany INSERT, together with its rollups and the
+position reached (import_checkpoints), in one transaction: memory stays flat,
+and an interrupted import carries on after its last committed chunk. Each
+sensor only receives history older than its oldest reading at the time the
+source was first imported, so re-running an import, or importing over a sensor
+that already pushes live, never stores a reading twice.
+
+Home Assistant: numeric `states` ("unavailable" / "unknown" become unavailable
+readings) and hourly means from `statistics`, which the recorder keeps long
+after it purges states. --source auto (the default) takes statistics only for
+the hours before an entity's first state. Both the current recorder schema
+(states_meta, *_ts columns) and older ones (entity_id and datetime columns on
+states) are read.
+
+CSV: a header with entity_id, a value column (value or state) and a time
+column (ts, time, last_changed or last_updated; ISO 8601 or epoch seconds).
+Optional unit, and terrarium_slug + sensor_type columns, which map a row
+directly.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import csv
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Iterator
+
+from sqlalchemy import select, insert, update, bindparam, case
+from sqlalchemy.orm import Session
+
+from .models import Reading, Sensor, SensorRole, SensorType, ImportCheckpoint
+from .sensors import sensor_registry, sensor_key, SensorKey
+from .state import as_utc
+from .stats import ROLE_SENSOR_TYPE
+from .slugs import normalize_slug
+from . import crud, rollups
+
+log = logging.getLogger("reptile.importer")
+
+UNAVAILABLE = {"unavailable", "unknown"}
+DEFAULT_UNIT = {"temperature": "°C", "humidity": "%"}
+SENSOR_TYPES = tuple(t.value for t in SensorType)
+TIME_COLUMNS = ("ts", "time", "last_changed", "last_updated")
+
+Target = tuple[int, str, str | None]        # (terrarium_id, sensor_type, unit)
+
+_sensors = Sensor.__table__
+
+# imported history is older than what ingest saw first
+_first_seen = (
+    update(_sensors)
+    .where(_sensors.c.id == bindparam("b_id"))
+    .values(first_seen=case((_sensors.c.first_seen > bindparam("b_first", type_=_sensors.c.first_seen.type),
+                             bindparam("b_first", type_=_sensors.c.first_seen.type)),
+                            else_=_sensors.c.first_seen))
+)
+
+
+def parse_ts(raw: str | float) -> datetime:
+    """Epoch seconds or ISO 8601; naive times are UTC, as the recorder stores them."""
+    if isinstance(raw, (int, float)):
+        return datetime.fromtimestamp(raw, timezone.utc)
+    try:
+        return datetime.fromtimestamp(float(raw), timezone.utc)
+    except ValueError:
+        ts = datetime.fromisoformat(raw.strip().replace(" ", "T", 1))
+        return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def parse_value(raw) -> tuple[float | None, bool] | None:
+    """(value, available), or None for a state that is not a number."""
+    if raw is None:
+        return None
+    if isinstance(raw, (int, float)):
+        return float(raw), True
+    raw = raw.strip()
+    if raw.lower() in UNAVAILABLE:
+        return None, False
+    try:
+        return float(raw), True
+    except ValueError:
+        return None
+
+
+def targets(db: Session, overrides: dict[str, tuple[str, str]]) -> dict[str, Target]:
+    """entity_id -> where its history goes. Roles win over known sensors; --map wins over both."""
+    out: dict[str, Target] = {}
+    for eid, tid, st, unit in db.execute(
+        select(Sensor.entity_id, Sensor.terrarium_id, Sensor.sensor_type, Sensor.unit).where(Sensor.entity_id != "")
+    ):
+        out.setdefault(eid, (tid, st, unit))
+    for tid, role, eid in db.execute(select(SensorRole.terrarium_id, SensorRole.role, SensorRole.entity_id)):
+        st = ROLE_SENSOR_TYPE[role]
+        known = out.get(eid)
+        out[eid] = (tid, st, known[2] if known and known[:2] == (tid, st) else None)
+    if overrides:
+        terrariums = crud.get_or_create_terrariums(db, {slug for slug, _st in overrides.values()})
+        db.commit()
+        for eid, (slug, st) in overrides.items():
+            out[eid] = (terrariums[slug].id, st, None)
+    return out
+
+
+def _key(k: SensorKey) -> str:
+    return "%d|%s|%s" % k
+
+
+def _cutoffs(db: Session) -> dict[str, str]:
+    """Oldest reading of every sensor that has any: one index seek each."""
+    oldest = select(Reading.ts).where(Reading.sensor_id == Sensor.id).order_by(Reading.ts.asc()).limit(1)
+    return {
+        _key(sensor_key(tid, st, eid)): as_utc(ts).isoformat()
+        for tid, st, eid, ts in db.execute(
+            select(Sensor.terrarium_id, Sensor.sensor_type, Sensor.entity_id, oldest.scalar_subquery())
+        )
+        if ts is not None
+    }
+
+
+def checkpoint(db: Session, source: str, stream: str) -> ImportCheckpoint:
+    """
+    The stream's checkpoint, created on first use. All streams of a source share
+    the cutoffs taken when its first stream started, so one stream's history
+    never hides another's.
+    """
+    cp = db.scalar(select(ImportCheckpoint).where(ImportCheckpoint.source == source, ImportCheckpoint.stream == stream))
+    if cp is None:
+        sibling = db.scalar(select(ImportCheckpoint).where(ImportCheckpoint.source == source).limit(1))
+        cp = ImportCheckpoint(source=source, stream=stream, position=0, rows=0,
+                              cutoffs=sibling.cutoffs if sibling else _cutoffs(db))
+        db.add(cp)
+        db.commit()
+    return cp
+
+
+class _Writer:
+    """Collects one chunk of rows and commits it with the stream's position."""
+
+    def __init__(self, db: Session, cp: ImportCheckpoint) -> None:
+        self.db, self.cp = db, cp
+        self.cutoffs = {k: datetime.fromisoformat(v) for k, v in cp.cutoffs.items()}
+        self.rows: list[dict] = []
+        self.stats = {"read": 0, "imported": 0, "duplicates": 0, "skipped_existing": 0, "skipped_unmapped": 0,
+                      "invalid": 0}
+
+    def add(self, target: Target, entity_id: str, raw_value, raw_ts, unit: str | None = None) -> None:
+        self.stats["read"] += 1
+        parsed = parse_value(raw_value)
+        try:
+            ts = parse_ts(raw_ts)
+        except (TypeError, ValueError):
+            parsed = None
+        if parsed is None:
+            self.stats["invalid"] += 1
+            return
+        tid, st, target_unit = target
+        cut = self.cutoffs.get(_key(sensor_key(tid, st, entity_id)))
+        if cut is not None and ts >= cut:
+            self.stats["skipped_existing"] += 1
+            return
+        value, available = parsed
+        self.rows.append({"terrarium_id": tid, "sensor_type": st, "entity_id": entity_id,
+                          "unit": unit or target_unit or DEFAULT_UNIT.get(st), "value": value,
+                          "available": available, "ts": ts})
+
+    def flush(self, position: int) -> None:
+        db, rows = self.db, self.rows
+        known = {}
+        stored = 0
+        if rows:
+            known = sensor_registry.resolve(db, rows)
+            for r in rows:
+                r["sensor_id"] = known[sensor_key(r["terrarium_id"], r["sensor_type"], r["entity_id"])].id
+            # the natural key catches what the cutoffs cannot: repeats within the source,
+            # or two sources holding the same history
+            inserted = crud.insert_readings(db, [
+                {"sensor_id": r["sensor_id"], "value": r["value"], "available": r["available"], "ts": r["ts"]}
+                for r in rows
+            ])
+            first: dict[int, datetime] = {}
+            buckets: rollups.Buckets = {}
+            for r in rows:
+                key = (r["sensor_id"], r["ts"])
+                if key not in inserted:
+                    continue
+                inserted.discard(key)       # a repeat later in the chunk is not counted again
+                stored += 1
+                first[r["sensor_id"]] = min(first.get(r["sensor_id"], r["ts"]), r["ts"])
+                rollups.accumulate(buckets, r["terrarium_id"], r["sensor_type"], r["entity_id"],
+                                   r["value"], r["unit"], r["ts"])
+            if first:
+                db.execute(_first_seen, [{"b_id": sid, "b_first": ts} for sid, ts in first.items()])
+            rollups.upsert(db, buckets)
+        self.cp.position = position
+        self.cp.rows += stored
+        self.cp.updated_at = datetime.now(timezone.utc)
+        db.commit()
+        sensor_registry.remember(known)
+        self.stats["imported"] += stored
+        self.stats["duplicates"] += len(rows) - stored
+        self.rows = []
+        log.info("import %s: %d rows read, %d imported (position %d)",
+                 self.cp.stream, self.stats["read"], self.stats["imported"], position)
+
+
+# --- Home Assistant recorder -------------------------------------------------
+
+def _columns(con: sqlite3.Connection, table: str) -> set[str]:
+    return {row[1] for row in con.execute(f"PRAGMA table_info({table})")}
+
+
+def _placeholders(n: int) -> str:
+    return ",".join("?" * n)
+
+
+def _ha_states(con: sqlite3.Connection, entities: list[str], after: int, chunk: int) -> Iterator[list[tuple]]:
+    """(state_id, entity_id, state, time) in state_id order, `chunk` rows per list."""
+    cols = _columns(con, "states")
+    ts_col = "last_updated_ts" if "last_updated_ts" in cols else "last_updated"
+    if "metadata_id" in cols and _columns(con, "states_meta"):
+        meta = dict(con.execute(
+            f"SELECT metadata_id, entity_id FROM states_meta WHERE entity_id IN ({_placeholders(len(entities))})",
+            entities,
+        ).fetchall())
+        if not meta:
+            return
+        cur = con.execute(
+            f"SELECT state_id, metadata_id, state, {ts_col} FROM states"
+            f" WHERE state_id > ? AND metadata_id IN ({_placeholders(len(meta))}) ORDER BY state_id",
+            [after, *meta],
+        )
+        while batch := cur.fetchmany(chunk):
+            yield [(sid, meta[mid], state, ts) for sid, mid, state, ts in batch]
+    else:
+        cur = con.execute(
+            f"SELECT state_id, entity_id, state, {ts_col} FROM states"
+            f" WHERE state_id > ? AND entity_id IN ({_placeholders(len(entities))}) ORDER BY state_id",
+            [after, *entities],
+        )
+        while batch := cur.fetchmany(chunk):
+            yield batch
+
+
+def _ha_first_states(con: sqlite3.Connection, entities: list[str]) -> dict[str, float]:
+    """Epoch seconds of every entity's oldest state still in the recorder."""
+    cols = _columns(con, "states")
+    if "metadata_id" in cols and "last_updated_ts" in cols and _columns(con, "states_meta"):
+        rows = con.execute(
+            "SELECT m.entity_id, MIN(s.last_updated_ts) FROM states s JOIN states_meta m ON m.metadata_id = s.metadata_id"
+            f" WHERE m.entity_id IN ({_placeholders(len(entities))}) GROUP BY m.entity_id", entities,
+        )
+        return {eid: ts for eid, ts in rows if ts is not None}
+    ts_col = "last_updated_ts" if "last_updated_ts" in cols else "last_updated"
+    rows = con.execute(
+        f"SELECT entity_id, MIN({ts_col}) FROM states"
+        f" WHERE entity_id IN ({_placeholders(len(entities))}) GROUP BY entity_id", entities,
+    )
+    return {eid: parse_ts(ts).timestamp() for eid, ts in rows if ts is not None}
+
+
+def import_ha(db: Session, path: str, entity_targets: dict[str, Target], source: str = "auto",
+              chunk: int = 50_000) -> dict:
+    t0 = time.perf_counter()
+    key = "ha:" + os.path.abspath(path)
+    con = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    totals: dict[str, int] = {}
+    try:
+        tables = {row[0] for row in con.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        present = set()
+        if "states_meta" in tables:
+            present |= {row[0] for row in con.execute("SELECT entity_id FROM states_meta")}
+        elif "states" in tables:
+            present |= {row[0] for row in con.execute("SELECT DISTINCT entity_id FROM states")}
+        if "statistics_meta" in tables:
+            present |= {row[0] for row in con.execute("SELECT statistic_id FROM statistics_meta")}
+        entities = sorted(present & entity_targets.keys())
+        if missing := sorted(entity_targets.keys() - present):
+            log.info("not in the recorder: %s", ", ".join(missing))
+        if not entities:
+            log.warning("no mapped entity in %s; map one with --map ENTITY=SLUG:TYPE", path)
+            return {"source": key, "rows": 0, "seconds": round(time.perf_counter() - t0, 2)}
+
+        units: dict[str, str | None] = {}
+        if source in ("auto", "statistics") and "statistics" in tables:
+            first_state = _ha_first_states(con, entities) if source == "auto" and "states" in tables else {}
+            stat_cols = _columns(con, "statistics")
+            ts_col = "start_ts" if "start_ts" in stat_cols else "start"
+            meta = con.execute(
+                "SELECT id, statistic_id, unit_of_measurement FROM statistics_meta"
+                f" WHERE statistic_id IN ({_placeholders(len(entities))})", entities,
+            ).fetchall()
+            for meta_id, eid, unit in meta:
+                units[eid] = unit
+                cp = checkpoint(db, key, f"statistics:{eid}")
+                w = _Writer(db, cp)
+                cur = con.execute(
+                    f"SELECT id, mean, {ts_col} FROM statistics"
+                    " WHERE metadata_id = ? AND id > ? AND mean IS NOT NULL ORDER BY id", (meta_id, cp.position),
+                )
+                before = first_state.get(eid)
+                while batch := cur.fetchmany(chunk):
+                    for _id, mean, ts in batch:
+                        # hours the states still cover come from the states
+                        if before is None or parse_ts(ts).timestamp() < before:
+                            w.add(entity_targets[eid], eid, mean, ts, unit)
+                    w.flush(batch[-1][0])
+                _add(totals, w.stats)
+
+        if source in ("auto", "states") and "states" in tables:
+            cp = checkpoint(db, key, "states")
+            w = _Writer(db, cp)
+            for batch in _ha_states(con, entities, cp.position, chunk):
+                for _sid, eid, state, ts in batch:
+                    w.add(entity_targets[eid], eid, state, ts, units.get(eid))
+                w.flush(batch[-1][0])
+            _add(totals, w.stats)
+    finally:
+        con.close()
+    return {"source": key, **totals, "seconds": round(time.perf_counter() - t0, 2)}
+
+
+# --- CSV ---------------------------------------------------------------------
+
+def import_csv(db: Session, path: str, entity_targets: dict[str, Target], chunk: int = 50_000) -> dict:
+    t0 = time.perf_counter()
+    key = "csv:" + os.path.abspath(path)
+    cp = checkpoint(db, key, "rows")
+    w = _Writer(db, cp)
+    slugs: dict[str, int] = {}
+    unmapped: set[str] = set()
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        fields = set(reader.fieldnames or ())
+        value_col = next((c for c in ("value", "state") if c in fields), None)
+        ts_col = next((c for c in TIME_COLUMNS if c in fields), None)
+        if "entity_id" not in fields or value_col is None or ts_col is None:
+            raise SystemExit(f"{path}: need entity_id, value (or state) and one of {', '.join(TIME_COLUMNS)} columns")
+        direct = {"terrarium_slug", "sensor_type"} <= fields
+
+        position = 0
+        pending: list[dict] = []
+        for row in reader:
+            position += 1
+            if position <= cp.position:
+                continue
+            pending.append(row)
+            if len(pending) >= chunk:
+                _csv_chunk(db, w, pending, entity_targets, slugs, unmapped, direct, value_col, ts_col)
+                w.flush(position)
+                pending = []
+        if pending:
+            _csv_chunk(db, w, pending, entity_targets, slugs, unmapped, direct, value_col, ts_col)
+            w.flush(position)
+    if unmapped:
+        log.info("unmapped entities (use --map ENTITY=SLUG:TYPE): %s", ", ".join(sorted(unmapped)))
+    return {"source": key, **w.stats, "seconds": round(time.perf_counter() - t0, 2)}
+
+
+def _csv_chunk(db: Session, w: _Writer, rows: list[dict], entity_targets: dict[str, Target],
+               slugs: dict[str, int], unmapped: set[str], direct: bool, value_col: str, ts_col: str) -> None:
+    if direct:
+        # the same slugs /ingest would have stored them under
+        for r in rows:
+            slug = (r["terrarium_slug"] or "").strip()
+            r["terrarium_slug"] = normalize_slug(slug) if slug else ""
+        new = {r["terrarium_slug"] for r in rows if r["terrarium_slug"] and r["terrarium_slug"] not in slugs}
+        if new:
+            slugs.update({s: t.id for s, t in crud.get_or_create_terrariums(db, new).items()})
+    for r in rows:
+        eid = (r["entity_id"] or "").strip()
+        unit = r.get("unit") or None
+        if direct and r["terrarium_slug"] and r["sensor_type"]:
+            if r["sensor_type"] not in SENSOR_TYPES:
+                w.stats["read"] += 1
+                w.stats["invalid"] += 1
+                continue
+            target: Target | None = (slugs[r["terrarium_slug"]], r["sensor_type"], None)
+        else:
+            target = entity_targets.get(eid)
+        if target is None:
+            w.stats["read"] += 1
+            w.stats["skipped_unmapped"] += 1
+            unmapped.add(eid)
+            continue
+        w.add(target, eid, r[value_col], r[ts_col], unit)
+
+
+def _add(totals: dict[str, int], stats: dict[str, int]) -> None:
+    for k, v in stats.items():
+        totals[k] = totals.get(k, 0) + v
+
+
+def _mapping(items: Iterable[str]) -> dict[str, tuple[str, str]]:
+    out = {}
+    for item in items:
+        eid, sep, rest = item.partition("=")
+        slug, sep2, st = rest.partition(":")
+        if not (sep and sep2 and eid and slug and st in SENSOR_TYPES):
+            raise SystemExit(f"--map {item!r}: expected ENTITY=SLUG:TYPE, TYPE one of {', '.join(SENSOR_TYPES)}")
+        out[eid] = (normalize_slug(slug), st)
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(prog="python -m app.importer")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ha = sub.add_parser("ha", help="import a Home Assistant recorder database (home-assistant_v2.db)")
+    ha.add_argument("path")
+    ha.add_argument("--source", choices=("auto", "states", "statistics"), default="auto")
+    cs = sub.add_parser("csv", help="import a CSV file")
+    cs.add_argument("path")
+    for p in (ha, cs):
+        p.add_argument("--chunk", type=int, default=50_000)
+        p.add_argument("--map", action="append", default=[], metavar="ENTITY=SLUG:TYPE",
+                       help="import an entity that has no role or sensor yet")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    from .database import SessionLocal, init_db
+    init_db()
+    with SessionLocal() as db:
+        entity_targets = targets(db, _mapping(args.map))
+        if args.cmd == "ha":
+            report = import_ha(db, args.path, entity_targets, source=args.source, chunk=args.chunk)
+        else:
+            report = import_csv(db, args.path, entity_targets, chunk=args.chunk)
+    print(report)
+    if report.get("imported"):
+        from .events import announce, history_event
+        asyncio.run(announce(history_event(readings=True)))
+
+
+if __name__ == "__main__":
+    main()
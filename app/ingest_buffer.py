@@ -0,0 +1,170 @@
+# app/ingest_buffer.py
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from .config import settings
+from .events import event_bus, readings_event
+from .schemas import IngestPayload
+from . import acrud
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class IngestBuffer:
+    """
+    Write-behind queue for /api/v1/ingest.
+
+    Payloads are queued in memory and a single background task writes them with
+    crud.ingest_batch, flushing every `max_rows` payloads or `flush_ms` after the
+    first queued one, whichever comes first. The queue is bounded: when it is full,
+    put() waits up to `put_timeout_ms` and then reports failure so the caller can
+    push back on the sender.
+
+    Queued readings were already answered 202, so a failed flush is retried in
+    halves, down to single readings: one bad reading costs only itself. A reading
+    that fails on its own is kept in a bounded dead-letter list (newest
+    `dead_letter_size`), in the /ingest/batch body format so it can be replayed.
+    """
+
+    def __init__(self, max_rows: int, flush_ms: int, queue_size: int, put_timeout_ms: int,
+                 dead_letter_size: int = 1_000) -> None:
+        self.max_rows = max_rows
+        self.dead_letters: deque[dict] = deque(maxlen=dead_letter_size)
+        self.flush_s = flush_ms / 1000
+        self.queue_size = queue_size
+        self.put_timeout_s = put_timeout_ms / 1000
+        self._q: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self.stats = {
+            "enqueued": 0,
+            "rejected": 0,
+            "flushes": 0,
+            "rows_flushed": 0,
+            "rows_failed": 0,
+            "rows_duplicate": 0,
+            "flush_retries": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    @property
+    def depth(self) -> int:
+        return self._q.qsize() if self._q else 0
+
+    def snapshot(self) -> dict:
+        flushes = self.stats["flushes"]
+        return {
+            "running": self.running,
+            "queue_depth": self.depth,
+            "queue_size": self.queue_size,
+            "dead_letters": len(self.dead_letters),
+            **self.stats,
+            "total_flush_ms": round(self.stats["total_flush_ms"], 3),
+            "avg_flush_ms": round(self.stats["total_flush_ms"] / flushes, 3) if flushes else 0.0,
+        }
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        self._q = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run(), name="ingest-buffer")
+
+    async def stop(self) -> None:
+        """Flush everything still queued, then stop the writer task."""
+        if not self._task:
+            return
+        await self._q.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def put(self, payload: IngestPayload) -> bool:
+        try:
+            await asyncio.wait_for(self._q.put(payload), timeout=self.put_timeout_s)
+        except asyncio.TimeoutError:
+            self.stats["rejected"] += 1
+            return False
+        self.stats["enqueued"] += 1
+        return True
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._q.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            stopping = False
+            deadline = loop.time() + self.flush_s
+            while len(batch) < self.max_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._q.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: list[IngestPayload]) -> None:
+        t0 = time.perf_counter()
+        await self._write(batch)
+        ms = (time.perf_counter() - t0) * 1000
+        self.stats["flushes"] += 1
+        self.stats["last_flush_ms"] = round(ms, 3)
+        self.stats["max_flush_ms"] = round(max(self.stats["max_flush_ms"], ms), 3)
+        self.stats["total_flush_ms"] += ms
+
+    async def _write(self, batch: list[IngestPayload]) -> None:
+        """Write `batch`; if that fails, write each half on its own."""
+        try:
+            statuses = await acrud.ingest_batch(batch)
+        except Exception as exc:
+            if len(batch) == 1:
+                self._dead_letter(batch[0], exc)
+                return
+            log.warning("ingest buffer: failed to flush %d readings, retrying in halves", len(batch))
+            self.stats["flush_retries"] += 1
+            mid = len(batch) // 2
+            await self._write(batch[:mid])
+            await self._write(batch[mid:])
+            return
+        self.stats["rows_flushed"] += len(batch)
+        self.stats["rows_duplicate"] += statuses.count("duplicate")
+
+        stored = [p for p, st in zip(batch, statuses) if st == "stored"]
+        if stored:
+            await event_bus.publish(readings_event(stored))
+
+    def _dead_letter(self, payload: IngestPayload, exc: Exception) -> None:
+        self.stats["rows_failed"] += 1
+        log.error("ingest buffer: reading dead-lettered: %r", payload, exc_info=exc)
+        self.dead_letters.append({
+            "payload": payload.model_dump(mode="json"),
+            "error": f"{type(exc).__name__}: {exc}",
+            "failed_at": datetime.now(timezone.utc).isoformat(),
+        })
+
+ingest_buffer = IngestBuffer(
+    max_rows=settings.ingest_buffer_max_rows,
+    flush_ms=settings.ingest_buffer_flush_ms,
+    queue_size=settings.ingest_buffer_queue_size,
+    put_timeout_ms=settings.ingest_buffer_put_timeout_ms,
+    dead_letter_size=settings.ingest_buffer_dead_letter_size,
+)
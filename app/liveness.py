@@ -0,0 +1,284 @@
+# app/liveness.py
+"""
+Sensor liveness: which sensors stopped reporting, and which report themselves
+unavailable.
+
+Every ingested reading moves its sensor's deadline to ts + LIVENESS_STALE_AFTER_S
+and pushes (deadline, key) onto a min-heap. A background task sleeps until the
+earliest deadline, pops the entries that are due and marks those sensors stale;
+entries made obsolete by a newer report are skipped when popped, so a report is
+O(log n) and a sweep only touches what is due. Stale and unavailable sensors
+are kept in their own dicts, so listing them costs O(number stale), never a scan
+of readings.
+
+Transitions (stale, resumed, reported unavailable / available) are written to
+sensor_availability and published on the event bus. Keys are (terrarium slug,
+entity_id or sensor type), like the hot-state cache.
+"""
+from __future__ import annotations
+import asyncio
+import heapq
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import Terrarium, Sensor, SensorAvailability
+from .state import as_utc
+from .versions import data_versions
+
+log = logging.getLogger(__name__)
+
+Key = tuple[str, str]       # (slug, entity_id or sensor_type)
+
+
+def liveness_key(slug: str, sensor_type: str, entity_id: str | None) -> Key:
+    return slug, entity_id or sensor_type
+
+
+@dataclass
+class Entry:
+    sensor_type: str
+    entity_id: str | None
+    sensor_id: int | None
+    last_seen: float                # epoch seconds
+    available: bool = True
+    stale_since: float | None = None
+    local: bool = True              # last report ingested by this worker (which then records its staleness)
+
+
+@dataclass(frozen=True)
+class Change:
+    key: Key
+    sensor_id: int | None
+    available: bool
+    reason: str                     # "stale" | "resumed" | "reported"
+    ts: float
+
+    def as_dict(self) -> dict:
+        return {"terrarium": self.key[0], "key": self.key[1], "available": self.available, "reason": self.reason,
+                "ts": datetime.fromtimestamp(self.ts, timezone.utc).isoformat()}
+
+
+class LivenessTracker:
+    def __init__(self, stale_after_s: int) -> None:
+        self.stale_after_s = stale_after_s
+        self._lock = threading.Lock()
+        self._entries: dict[Key, Entry] = {}
+        self._heap: list[tuple[float, Key]] = []
+        self._stale: dict[Key, Entry] = {}
+        self._unavailable: dict[Key, Entry] = {}
+        self._outbox: list[Change] = []
+        self._task: asyncio.Task | None = None
+
+    # ---- feeding ----
+
+    def warm(self, db: Session) -> None:
+        """Start from each sensor's last_seen; sensors silent for too long start out stale (not recorded again)."""
+        now = time.time()
+        rows = db.execute(
+            select(Terrarium.slug, Sensor.sensor_type, Sensor.entity_id, Sensor.id, Sensor.last_seen)
+            .join(Terrarium, Terrarium.id == Sensor.terrarium_id)
+        ).all()
+        with self._lock:
+            for slug, sensor_type, entity_id, sensor_id, last_seen in rows:
+                key = liveness_key(slug, sensor_type, entity_id)
+                seen = as_utc(last_seen).timestamp()
+                cur = self._entries.get(key)
+                if cur is not None and cur.last_seen >= seen:
+                    continue
+                e = self._entries[key] = Entry(sensor_type, entity_id or None, sensor_id, seen)
+                deadline = seen + self.stale_after_s
+                if deadline <= now:
+                    e.stale_since = deadline
+                    self._stale[key] = e
+                else:
+                    heapq.heappush(self._heap, (deadline, key))
+
+    def report(self, slug: str, sensor_type: str, entity_id: str | None, ts: datetime,
+               available: bool = True, sensor_id: int | None = None, local: bool = True) -> list[Change]:
+        """A reading arrived. Returns the availability changes it causes."""
+        key = liveness_key(slug, sensor_type, entity_id)
+        seen = as_utc(ts).timestamp()
+        changes = []
+        with self._lock:
+            e = self._entries.get(key)
+            if e is None:
+                e = self._entries[key] = Entry(sensor_type, entity_id, sensor_id, seen, available, local=local)
+                if not available:
+                    self._unavailable[key] = e
+                    changes.append(Change(key, sensor_id, False, "reported", seen))
+            else:
+                if seen < e.last_seen:
+                    return []                   # late: says nothing about now
+                e.sensor_id = e.sensor_id or sensor_id
+                e.last_seen, e.local = seen, local
+                if e.stale_since is not None:
+                    e.stale_since = None
+                    del self._stale[key]
+                    changes.append(Change(key, e.sensor_id, available, "resumed", seen))
+                elif available != e.available:
+                    changes.append(Change(key, e.sensor_id, available, "reported", seen))
+                e.available = available
+                if available:
+                    self._unavailable.pop(key, None)
+                else:
+                    self._unavailable[key] = e
+            heapq.heappush(self._heap, (seen + self.stale_after_s, key))
+        return changes
+
+    def mark_stale(self, key: Key, since: float) -> None:
+        """Another worker recorded the sensor as stale."""
+        with self._lock:
+            e = self._entries.get(key)
+            if e is not None and e.stale_since is None and e.last_seen + self.stale_after_s <= since + 1:
+                e.stale_since = since
+                self._stale[key] = e
+
+    def expire(self, now: float | None = None) -> list[Change]:
+        """Mark every sensor whose deadline has passed as stale."""
+        now = time.time() if now is None else now
+        changes = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, key = heapq.heappop(self._heap)
+                e = self._entries.get(key)
+                # superseded by a later report, or already stale
+                if e is None or e.last_seen + self.stale_after_s != deadline or e.stale_since is not None:
+                    continue
+                e.stale_since = deadline
+                self._stale[key] = e
+                if e.local:
+                    changes.append(Change(key, e.sensor_id, False, "stale", deadline))
+        return changes
+
+    def next_deadline(self) -> float | None:
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def commit(self, changes: list[Change]) -> None:
+        """Queue recorded changes for publishing (see drain())."""
+        with self._lock:
+            self._outbox += changes
+
+    def drain(self) -> list[Change]:
+        with self._lock:
+            out, self._outbox = self._outbox, []
+        return out
+
+    # ---- reads ----
+
+    def is_stale(self, key: Key) -> bool:
+        return key in self._stale
+
+    def is_available(self, key: Key) -> bool:
+        return key not in self._unavailable
+
+    def annotate(self, items: list[dict]) -> list[dict]:
+        """Summary items with a "stale" list: the terrarium's stale sensors (entity ids / sensor types)."""
+        by_slug: dict[str, list[str]] = {}
+        with self._lock:
+            for slug, k in self._stale:
+                by_slug.setdefault(slug, []).append(k)
+        return [{**i, "stale": sorted(by_slug.get(i["terrarium_slug"], ()))} for i in items]
+
+    def _item(self, key: Key, e: Entry, now: float) -> dict:
+        return {
+            "terrarium_slug": key[0],
+            "sensor_type": e.sensor_type,
+            "entity_id": e.entity_id,
+            "last_seen": datetime.fromtimestamp(e.last_seen, timezone.utc),
+            "silent_s": round(now - e.last_seen, 1),
+            "available": e.available,
+            "stale": e.stale_since is not None,
+            "stale_since": datetime.fromtimestamp(e.stale_since, timezone.utc) if e.stale_since else None,
+        }
+
+    def report_health(self, everything: bool = False) -> dict:
+        """Stale and unavailable sensors (every tracked one with `everything`)."""
+        now = time.time()
+        with self._lock:
+            if everything:
+                items = [self._item(k, e, now) for k, e in self._entries.items()]
+            else:
+                keys = self._stale.keys() | self._unavailable.keys()
+                items = [self._item(k, self._entries[k], now) for k in keys]
+            return {
+                "stale_after_s": self.stale_after_s,
+                "tracked": len(self._entries),
+                "stale": len(self._stale),
+                "unavailable": len(self._unavailable),
+                "sensors": sorted(items, key=lambda i: (i["terrarium_slug"], i["sensor_type"], i["entity_id"] or "")),
+            }
+
+    # ---- sweeper ----
+
+    async def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._run(), name="liveness")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        from .database import run_db
+        from .events import event_bus
+        while True:
+            nxt = self.next_deadline()
+            # new sensors may add an earlier deadline while we sleep; never sleep long
+            delay = 5.0 if nxt is None else min(max(nxt - time.time(), 0.0), 5.0)
+            await asyncio.sleep(delay)
+            changes = self.expire()
+            if not changes:
+                continue
+            try:
+                await run_db(record, changes)
+            except Exception:
+                log.exception("liveness: could not record %d changes", len(changes))
+            event = liveness_event(changes)
+            data_versions.bump(event["terrariums"])
+            await event_bus.publish(event)
+
+
+def record(db: Session, changes: list[Change]) -> None:
+    """Write availability changes; sensors this process has no id for are looked up."""
+    missing = {c.key for c in changes if c.sensor_id is None}
+    ids: dict[Key, int] = {}
+    if missing:
+        slugs = {k[0] for k in missing}
+        for slug, sensor_type, entity_id, sensor_id in db.execute(
+            select(Terrarium.slug, Sensor.sensor_type, Sensor.entity_id, Sensor.id)
+            .join(Terrarium, Terrarium.id == Sensor.terrarium_id)
+            .where(Terrarium.slug.in_(slugs))
+        ):
+            ids[liveness_key(slug, sensor_type, entity_id)] = sensor_id
+    rows = [
+        SensorAvailability(sensor_id=c.sensor_id or ids[c.key], available=c.available, reason=c.reason,
+                           ts=datetime.fromtimestamp(c.ts, timezone.utc))
+        for c in changes if c.sensor_id or c.key in ids
+    ]
+    db.add_all(rows)
+    db.commit()
+
+
+def liveness_event(changes: list[Change]) -> dict:
+    """Bus message for sensor availability changes."""
+    return {
+        "kind": "liveness",
+        "terrariums": sorted({c.key[0] for c in changes}),
+        "changes": [c.as_dict() for c in changes],
+    }
+
+
+liveness = LivenessTracker(settings.liveness_stale_after_s)
@@ -1,13 +1,64 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from .routers import sse 
 from .config import settings
-from .database import init_db
-from .routers import ingest, terrariums, health,ui,admin
+from .database import init_db, run_db
+from .routers import ingest, terrariums, health,ui,admin, alerts
+from .ingest_buffer import ingest_buffer
+from .state import hot_state
+from . import retention
+from .broadcast import summary_broadcaster
+from .events import event_bus
+from .alerts import alert_engine
+from .liveness import liveness
+from .metrics import MetricsMiddleware
+
+log = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.hot_state_enabled:
+        try:
+            await run_db(hot_state.warm_from_db)
+        except Exception:
+            # stays cold: summaries fall back to the DB
+            log.exception("could not warm the hot-state cache")
+    try:
+        await run_db(alert_engine.load)
+    except Exception:
+        # retried on the first ingest
+        log.exception("could not load alert rules")
+    try:
+        await run_db(liveness.warm)
+    except Exception:
+        # sensors are tracked from their next reading on
+        log.exception("could not warm sensor liveness")
+    await liveness.start()
+    if settings.ingest_buffer_enabled:
+        await ingest_buffer.start()
+    await event_bus.start()
+    await summary_broadcaster.start()
+    retention_task = asyncio.create_task(retention.run_forever()) if settings.retention_enabled else None
+    try:
+        yield
+    finally:
+        if retention_task:
+            retention_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await retention_task
+        await summary_broadcaster.stop()
+        await liveness.stop()
+        # flush queued readings before the worker exits
+        await ingest_buffer.stop()
+        await event_bus.stop()
 
 def create_app() -> FastAPI:
-    app = FastAPI(title=settings.app_name)
+    app = FastAPI(title=settings.app_name, lifespan=lifespan)
+    app.add_middleware(MetricsMiddleware)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=settings.cors_allow_origins,
@@ -21,6 +72,7 @@ def create_app() -> FastAPI:
     app.include_router(ui.router)
     app.include_router(sse.router)
     app.include_router(admin.router)
+    app.include_router(alerts.router)
 
     app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
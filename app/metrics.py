@@ -0,0 +1,204 @@
+# app/metrics.py
+"""
+Prometheus metrics, without a client library: a few counters and histograms
+rendered in the text exposition format by GET /metrics.
+
+MetricsMiddleware times every HTTP request and labels it with its route
+template. It also opens a per-request RequestStats in a context variable, which
+the SQLAlchemy hooks in app/database.py fill with the statement count and the
+time spent in the database. The variable follows the request into the
+threadpool and the DB executor (both copy the context), so an N+1 loop shows
+up as a high statement count on its route. Server-sent event streams are
+counted, but kept out of the latency and per-request DB histograms: they last
+as long as the client stays.
+"""
+from __future__ import annotations
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _quote(v: str) -> str:
+    return '"' + v + '"'
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name, self.help, self.labels = name, help, labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), by: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + by
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"] + [
+            f"{self.name}{_labels(self.labels, k)} {_num(v)}" for k, v in items
+        ]
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...], labels: tuple[str, ...] = ()) -> None:
+        self.name, self.help, self.buckets, self.labels = name, help, buckets, labels
+        self._series: dict[tuple, list] = {}        # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float) -> None:
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, le in enumerate(self.buckets):
+                if value <= le:
+                    s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for k, s in items:
+            for le, n in zip(self.buckets, s):
+                out.append(f"{self.name}_bucket{_labels(self.labels, k, 'le=%s' % _quote(_num(le)))} {n}")
+            out.append(f"{self.name}_bucket{_labels(self.labels, k, 'le=%s' % _quote('+Inf'))} {s[-1]}")
+            out.append(f"{self.name}_sum{_labels(self.labels, k)} {_num(s[-2])}")
+            out.append(f"{self.name}_count{_labels(self.labels, k)} {s[-1]}")
+        return out
+
+
+def gauge(name: str, help: str, values: dict[tuple, float] | float, labels: tuple[str, ...] = ()) -> list[str]:
+    """A gauge read at scrape time."""
+    if not isinstance(values, dict):
+        values = {(): values}
+    return [f"# HELP {name} {help}", f"# TYPE {name} gauge"] + [
+        f"{name}{_labels(labels, k)} {_num(v)}" for k, v in sorted(values.items())
+    ]
+
+
+requests_total = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+request_seconds = Histogram("http_request_duration_seconds", "HTTP request latency (SSE streams excluded).",
+                            LATENCY_BUCKETS, ("method", "route"))
+request_statements = Histogram("http_request_db_statements", "SQL statements executed per HTTP request.",
+                               STATEMENT_BUCKETS, ("method", "route"))
+request_db_seconds = Histogram("http_request_db_seconds", "Time spent executing SQL per HTTP request.",
+                               LATENCY_BUCKETS, ("method", "route"))
+db_statements = Counter("db_statements_total", "SQL statements executed, in or out of requests.")
+db_seconds = Counter("db_seconds_total", "Time spent executing SQL, in or out of requests.")
+ws_ingest_frames = Counter("ws_ingest_frames_total", "WebSocket ingest frames by reply (ack or error).", ("result",))
+
+REGISTRY = (requests_total, request_seconds, request_statements, request_db_seconds, db_statements, db_seconds,
+            ws_ingest_frames)
+
+
+@dataclass
+class RequestStats:
+    statements: int = 0
+    db_s: float = 0.0
+
+
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+
+def record_statement(seconds: float) -> None:
+    """Called by the engine hooks after every statement."""
+    db_statements.inc()
+    db_seconds.inc(by=seconds)
+    stats = current_request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_s += seconds
+
+
+def _route(scope: dict) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # mounts (static files) set root_path; anything else did not match a route
+    return scope.get("root_path") or "unmatched"
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware, so streaming responses pass straight through."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status, stream = 500, False
+
+        async def send_wrapper(message) -> None:
+            nonlocal status, stream
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                stream = any(k == b"content-type" and v.startswith(b"text/event-stream") for k, v in message["headers"])
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            labels = (scope["method"], _route(scope))
+            requests_total.inc((*labels, str(status)))
+            if not stream:
+                request_seconds.observe(labels, time.perf_counter() - t0)
+                request_statements.observe(labels, stats.statements)
+                request_db_seconds.observe(labels, stats.db_s)
+
+
+def render() -> str:
+    """Every metric in the Prometheus text format."""
+    from .broadcast import summary_broadcaster
+    from .events import event_bus
+    from .ingest_buffer import ingest_buffer
+    from .liveness import liveness
+    from .alerts import alert_engine
+
+    lines: list[str] = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    depths = event_bus.queue_depths()
+    lines += gauge("event_bus_subscribers", "Event bus subscriber queues.", len(depths))
+    lines += gauge("event_bus_subscriber_queue_depth", "Events waiting in each subscriber queue.",
+                   {(sub,): d for sub, d in depths.items()}, ("subscriber",))
+    lines += [
+        "# HELP event_bus_dropped_events_total Events not delivered because a subscriber queue was full.",
+        "# TYPE event_bus_dropped_events_total counter",
+        f"event_bus_dropped_events_total {event_bus.dropped}",
+    ]
+    lines += gauge("event_bus_last_id", "Id of the newest event bus event.", event_bus.last_id)
+    lines += gauge("sse_summary_subscribers", "Clients of the shared summary renderer.", summary_broadcaster.snapshot()["subscribers"])
+    lines += gauge("ingest_buffer_queue_depth", "Readings waiting in the write-behind buffer.", ingest_buffer.depth)
+    health = liveness.report_health()
+    lines += gauge("sensors_stale", "Sensors past LIVENESS_STALE_AFTER_S.", health["stale"])
+    lines += gauge("sensors_unavailable", "Sensors reporting themselves unavailable.", health["unavailable"])
+    lines += gauge("alerts_firing", "Alert rules firing now.", len(alert_engine.active()))
+    return "\n".join(lines) + "\n"
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Boolean, String, Float, DateTime, ForeignKey, Enum, func, Index,UniqueConstraint, text
+from sqlalchemy import BigInteger, Boolean, JSON, String, Float, Integer, DateTime, ForeignKey, Enum, func, Index,UniqueConstraint, text
 from datetime import datetime, timezone
 import enum
 from .database import Base
@@ -16,24 +16,76 @@ class Terrarium(Base):
     name: Mapped[str | None] = mapped_column(String(100), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
-    readings: Mapped[list["Reading"]] = relationship(back_populates="terrarium", cascade="all, delete-orphan")
+    sensors: Mapped[list["Sensor"]] = relationship(back_populates="terrarium", cascade="all, delete-orphan")
+
+class Sensor(Base):
+    """
+    One (terrarium, entity, sensor type) series. Registered on first ingest
+    (app/sensors.py); readings point here instead of repeating these strings.
+    """
+    __tablename__ = "sensors"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    terrarium_id: Mapped[int] = mapped_column(ForeignKey("terrariums.id", ondelete="CASCADE"))
+    sensor_type: Mapped[str] = mapped_column(String(16), nullable=False)
+    # "" when the push had no entity_id, so the unique key never contains NULL
+    entity_id: Mapped[str] = mapped_column(String(128), nullable=False, server_default="")
+    unit: Mapped[str | None] = mapped_column(String(16), nullable=True)     # latest unit pushed
+    first_seen: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    last_seen: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    terrarium: Mapped["Terrarium"] = relationship(back_populates="sensors")
+    readings: Mapped[list["Reading"]] = relationship(back_populates="sensor", cascade="all, delete-orphan",
+                                                     passive_deletes=True)
+
+    # leads with terrarium_id, so it also serves "all sensors of a terrarium"
+    __table_args__ = (UniqueConstraint("terrarium_id", "entity_id", "sensor_type", name="uq_sensor"),)
 
 class Reading(Base):
     __tablename__ = "readings"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    terrarium_id: Mapped[int] = mapped_column(ForeignKey("terrariums.id", ondelete="CASCADE"), index=True)
-    sensor_type: Mapped[str] = mapped_column(String(16), nullable=False)
+    sensor_id: Mapped[int] = mapped_column(ForeignKey("sensors.id", ondelete="CASCADE"), nullable=False)
 
     value: Mapped[float | None] = mapped_column(Float, nullable=True)
 
-    unit: Mapped[str | None] = mapped_column(String(16), nullable=True)
-    entity_id: Mapped[str | None] = mapped_column(String(128), nullable=True)
     ts: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
 
     available: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=text("1"))
 
-    terrarium: Mapped["Terrarium"] = relationship(back_populates="readings")
+    # Deadband storage (app/deadband.py): the value held from ts until ts_end, and how many
+    # further readings were folded into this row. NULL / 0 for rows stored as-is.
+    ts_end: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    repeats: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+
+    sensor: Mapped["Sensor"] = relationship(back_populates="readings")
+
+    # newest reading of a sensor / a sensor's window; per-terrarium queries go through sensors.
+    # Unique: (sensor_id, ts) is a reading's natural key, so a retried push is not stored twice
+    __table_args__ = (Index("ix_readings_sensor_ts", "sensor_id", "ts", unique=True),)
+
+class ReadingRollup(Base):
+    """Per-minute / per-hour aggregates of readings, maintained at ingest (see app/rollups.py)."""
+    __tablename__ = "reading_rollups"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    resolution: Mapped[str] = mapped_column(String(4), nullable=False)   # "1m" | "1h"
+    terrarium_id: Mapped[int] = mapped_column(ForeignKey("terrariums.id", ondelete="CASCADE"))
+    sensor_type: Mapped[str] = mapped_column(String(16), nullable=False)
+    # "" when the push had no entity_id, so the unique key never contains NULL
+    entity_id: Mapped[str] = mapped_column(String(128), nullable=False, server_default="")
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    unit: Mapped[str | None] = mapped_column(String(16), nullable=True)
+
+    count: Mapped[int] = mapped_column(Integer, nullable=False)
+    sum: Mapped[float] = mapped_column(Float, nullable=False)
+    min: Mapped[float] = mapped_column(Float, nullable=False)
+    max: Mapped[float] = mapped_column(Float, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("resolution", "terrarium_id", "sensor_type", "entity_id", "bucket", name="uq_rollup_bucket"),
+        Index("ix_rollups_res_terrarium_bucket", "resolution", "terrarium_id", "bucket"),
+    )
 
 class SensorRoleName(str, enum.Enum):
     basking_temp = "basking_temp"
@@ -49,4 +101,67 @@ class SensorRole(Base):
     entity_id: Mapped[str] = mapped_column(String(128))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
-    __table_args__ = (UniqueConstraint("terrarium_id", "role", name="uq_role_per_terrarium"),)
\ No newline at end of file
+    __table_args__ = (UniqueConstraint("terrarium_id", "role", name="uq_role_per_terrarium"),)
+class AlertRule(Base):
+    """
+    Threshold rule on one terrarium role, evaluated on every ingested reading
+    (app/alerts.py). Unset limits are not checked.
+    """
+    __tablename__ = "alert_rules"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    terrarium_id: Mapped[int] = mapped_column(ForeignKey("terrariums.id", ondelete="CASCADE"), index=True)
+    role: Mapped[SensorRoleName] = mapped_column(Enum(SensorRoleName))
+    name: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    min_value: Mapped[float | None] = mapped_column(Float, nullable=True)
+    max_value: Mapped[float | None] = mapped_column(Float, nullable=True)
+    max_rate: Mapped[float | None] = mapped_column(Float, nullable=True)       # |change| per minute
+    # a min/max alert clears only once the value is back this far inside the limit
+    hysteresis: Mapped[float] = mapped_column(Float, nullable=False, server_default=text("0"))
+    # the breach must last this long before the alert fires
+    min_duration_s: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    enabled: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=text("1"))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+class AlertEvent(Base):
+    """A rule starting or stopping to fire."""
+    __tablename__ = "alert_events"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    rule_id: Mapped[int] = mapped_column(ForeignKey("alert_rules.id", ondelete="CASCADE"))
+    state: Mapped[str] = mapped_column(String(8), nullable=False)      # "firing" | "resolved"
+    reason: Mapped[str] = mapped_column(String(16), nullable=False)    # "below_min" | "above_max" | "rate"
+    value: Mapped[float | None] = mapped_column(Float, nullable=True)
+    ts: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)   # of the reading
+
+    __table_args__ = (Index("ix_alert_events_rule_ts", "rule_id", "ts"), Index("ix_alert_events_ts", "ts"))
+
+class SensorAvailability(Base):
+    """A sensor going stale or coming back, or reporting itself (un)available (app/liveness.py)."""
+    __tablename__ = "sensor_availability"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    sensor_id: Mapped[int] = mapped_column(ForeignKey("sensors.id", ondelete="CASCADE"))
+    available: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    reason: Mapped[str] = mapped_column(String(16), nullable=False)    # "stale" | "resumed" | "reported"
+    ts: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (Index("ix_sensor_availability_sensor_ts", "sensor_id", "ts"),)
+
+class ImportCheckpoint(Base):
+    """
+    Progress of one stream of a history import (app/importer.py): the position
+    reached in the source, committed with the rows read up to it.
+    """
+    __tablename__ = "import_checkpoints"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    source: Mapped[str] = mapped_column(String(512), nullable=False)    # "ha:<path>" | "csv:<path>"
+    stream: Mapped[str] = mapped_column(String(160), nullable=False)    # "states" | "statistics:<entity>" | "rows"
+    position: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default=text("0"))
+    # sensor key -> ts of its oldest reading when the stream started; history from there on is left out
+    cutoffs: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    rows: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (UniqueConstraint("source", "stream", name="uq_import_checkpoint"),)
@@ -0,0 +1,141 @@
+# app/retention.py
+"""
+Retention for raw readings.
+
+Raw rows older than RETENTION_RAW_DAYS are deleted in chunks of
+RETENTION_CHUNK_ROWS, each in its own short transaction, so ingest is never
+locked out for long. The minute/hour rollups are left alone, so long-range
+charts keep working after the raw rows are gone. Run
+`python -m app.rollups backfill` once before enabling retention on a database
+whose history predates the rollups.
+
+After a large purge the space is reclaimed and planner stats refreshed
+(VACUUM + ANALYZE on SQLite, VACUUM (ANALYZE) on Postgres).
+
+    python -m app.retention [--days N] [--dry-run]
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, delete, func, text
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import engine, run_db, db_executor, SessionLocal
+from .models import Reading
+from .versions import data_versions
+
+log = logging.getLogger(__name__)
+
+# report of the most recent run, for /health/retention
+last_report: dict | None = None
+
+
+def purge_chunk(db: Session, cutoff: datetime, limit: int) -> int:
+    """Delete up to `limit` of the oldest raw readings before `cutoff`; one commit."""
+    ids = select(Reading.id).where(Reading.ts < cutoff).order_by(Reading.id).limit(limit)
+    n = db.execute(delete(Reading).where(Reading.id.in_(ids.scalar_subquery()))).rowcount
+    db.commit()
+    return n
+
+
+def count_expired(db: Session, cutoff: datetime) -> int:
+    return db.scalar(select(func.count()).select_from(Reading).where(Reading.ts < cutoff)) or 0
+
+
+def compact() -> None:
+    """Reclaim space and refresh statistics. Needs a connection outside any transaction."""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("VACUUM (ANALYZE) readings"))
+        else:
+            conn.execute(text("VACUUM"))
+            conn.execute(text("ANALYZE"))
+
+
+def _report(cutoff: datetime, deleted: int, chunks: int, vacuumed: bool, t0: float) -> dict:
+    global last_report
+    last_report = {
+        "cutoff": cutoff.isoformat(),
+        "rows_deleted": deleted,
+        "chunks": chunks,
+        "vacuumed": vacuumed,
+        "seconds": round(time.perf_counter() - t0, 3),
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+    }
+    log.info("retention: removed %d raw readings older than %s in %.1fs (vacuum=%s)",
+             deleted, last_report["cutoff"], last_report["seconds"], vacuumed)
+    return last_report
+
+
+def _cutoff(days: int) -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+
+async def run_once(days: int | None = None) -> dict:
+    """
+    One retention pass from the running app. Every chunk is a separate DB-executor
+    job, so ingest writes queued on the executor interleave with the purge.
+    """
+    t0 = time.perf_counter()
+    cutoff = _cutoff(days or settings.retention_raw_days)
+    deleted = chunks = 0
+    while True:
+        n = await run_db(purge_chunk, cutoff, settings.retention_chunk_rows)
+        deleted += n
+        chunks += 1
+        if n < settings.retention_chunk_rows:
+            break
+        await asyncio.sleep(0)
+    if deleted:
+        data_versions.bump_all()
+    vacuumed = deleted >= settings.retention_vacuum_min_rows
+    if vacuumed:
+        # on the DB executor too, so nothing else writes while VACUUM runs
+        await asyncio.get_running_loop().run_in_executor(db_executor, compact)
+    return _report(cutoff, deleted, chunks, vacuumed, t0)
+
+
+async def run_forever() -> None:
+    while True:
+        try:
+            await run_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("retention run failed")
+        await asyncio.sleep(settings.retention_interval_s)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(prog="python -m app.retention")
+    ap.add_argument("--days", type=int, default=settings.retention_raw_days, help="keep this many days of raw readings")
+    ap.add_argument("--dry-run", action="store_true", help="only count what would be removed")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    cutoff = _cutoff(args.days)
+    with SessionLocal() as db:
+        if args.dry_run:
+            print({"cutoff": cutoff.isoformat(), "rows_expired": count_expired(db, cutoff)})
+            return
+        t0 = time.perf_counter()
+        deleted = chunks = 0
+        while True:
+            n = purge_chunk(db, cutoff, settings.retention_chunk_rows)
+            deleted += n
+            chunks += 1
+            if n < settings.retention_chunk_rows:
+                break
+    vacuumed = deleted >= settings.retention_vacuum_min_rows
+    if vacuumed:
+        compact()
+    print(_report(cutoff, deleted, chunks, vacuumed, t0))
+
+
+if __name__ == "__main__":
+    main()
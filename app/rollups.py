@@ -0,0 +1,187 @@
+# app/rollups.py
+"""
+Time-bucketed rollups of readings (min/max/sum/count per minute and per hour).
+
+Ingest folds each batch into the buckets it touches with one upsert per
+resolution, so the tables stay current without periodic jobs. For history that
+predates them, run the backfill:
+
+    python -m app.rollups backfill
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete, func, case
+from sqlalchemy.orm import Session
+
+from .database import dialect_insert
+from .models import Reading, ReadingRollup, Sensor
+from .state import as_utc
+
+log = logging.getLogger(__name__)
+
+RESOLUTIONS = ("1m", "1h")
+BUCKET_SECONDS = {"1m": 60, "1h": 3600}
+
+# (resolution, terrarium_id, sensor_type, entity_id, bucket) -> [count, sum, min, max, unit]
+Buckets = dict[tuple[str, int, str, str, datetime], list]
+
+
+def bucket_start(ts: datetime, resolution: str) -> datetime:
+    ts = as_utc(ts)
+    if resolution == "1h":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(second=0, microsecond=0)
+
+
+def accumulate(buckets: Buckets, terrarium_id: int, sensor_type: str, entity_id: str | None,
+               value: float | None, unit: str | None, ts: datetime) -> None:
+    """Fold one reading into every resolution's bucket. Null values are skipped."""
+    if value is None:
+        return
+    for res in RESOLUTIONS:
+        key = (res, terrarium_id, sensor_type, entity_id or "", bucket_start(ts, res))
+        agg = buckets.get(key)
+        if agg is None:
+            buckets[key] = [1, value, value, value, unit]
+        else:
+            agg[0] += 1
+            agg[1] += value
+            agg[2] = min(agg[2], value)
+            agg[3] = max(agg[3], value)
+            agg[4] = unit or agg[4]
+
+
+def upsert(db: Session, buckets: Buckets) -> None:
+    """Merge accumulated buckets into reading_rollups. Does not commit."""
+    if not buckets:
+        return
+    t = ReadingRollup.__table__.c
+    stmt = dialect_insert(db, ReadingRollup)
+    ex = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["resolution", "terrarium_id", "sensor_type", "entity_id", "bucket"],
+        set_={
+            "count": t["count"] + ex["count"],
+            "sum": t["sum"] + ex["sum"],
+            "min": case((ex["min"] < t["min"], ex["min"]), else_=t["min"]),
+            "max": case((ex["max"] > t["max"], ex["max"]), else_=t["max"]),
+            "unit": func.coalesce(ex["unit"], t["unit"]),
+        },
+    )
+    db.execute(stmt, [
+        {"resolution": res, "terrarium_id": tid, "sensor_type": st, "entity_id": eid, "bucket": bucket,
+         "count": c, "sum": s, "min": lo, "max": hi, "unit": unit}
+        for (res, tid, st, eid, bucket), (c, s, lo, hi, unit) in buckets.items()
+    ])
+
+
+def window(db: Session, terrarium_id: int, resolution: str, since: datetime):
+    """Rollup rows for one terrarium from `since`, oldest first."""
+    return db.execute(
+        select(ReadingRollup)
+        .where(ReadingRollup.resolution == resolution,
+               ReadingRollup.terrarium_id == terrarium_id,
+               ReadingRollup.bucket >= bucket_start(since, resolution))
+        .order_by(ReadingRollup.bucket.asc())
+    ).scalars().all()
+
+
+def _cutoffs(db: Session) -> dict[tuple[str, int, str, str], datetime]:
+    """
+    (resolution, terrarium_id, sensor_type, entity_id) -> first bucket of that
+    series the raw readings still cover in full. Rollups older than a series'
+    oldest reading outlive retention and are kept: the bucket holding that
+    reading is only rebuilt when it starts with it or no older rollups exist
+    (nothing was purged before it). Series without readings are not listed.
+    """
+    oldest = db.execute(
+        select(Sensor.terrarium_id, Sensor.sensor_type, Sensor.entity_id, func.min(Reading.ts))
+        .join(Reading, Reading.sensor_id == Sensor.id)
+        .group_by(Sensor.id, Sensor.terrarium_id, Sensor.sensor_type, Sensor.entity_id)
+    ).all()
+    out = {}
+    for tid, st, eid, ts in oldest:
+        for res in RESOLUTIONS:
+            first = bucket_start(ts, res)
+            older = db.scalar(
+                select(ReadingRollup.id)
+                .where(ReadingRollup.resolution == res, ReadingRollup.terrarium_id == tid,
+                       ReadingRollup.sensor_type == st, ReadingRollup.entity_id == (eid or ""),
+                       ReadingRollup.bucket < first)
+                .limit(1)
+            )
+            out[(res, tid, st, eid or "")] = first if older is None or first == as_utc(ts) \
+                else first + timedelta(seconds=BUCKET_SECONDS[res])
+    return out
+
+
+def backfill(db: Session, chunk: int = 50_000) -> dict:
+    """
+    Rebuild the rollups the raw readings table still covers.
+
+    Each series' buckets from its oldest remaining reading on are cleared and
+    re-aggregated from the readings present at that moment, in id order, `chunk`
+    rows at a time, so memory stays bounded. Older buckets are left alone:
+    retention has removed their readings. A deadband row counts once plus once per folded
+    reading (`repeats`), spread evenly up to its ts_end, as ingest counted them.
+    """
+    t0 = time.perf_counter()
+    max_id = db.scalar(select(func.max(Reading.id))) or 0
+    cutoffs = _cutoffs(db)
+    for (res, tid, st, eid), cutoff in cutoffs.items():
+        db.execute(delete(ReadingRollup).where(
+            ReadingRollup.resolution == res, ReadingRollup.terrarium_id == tid, ReadingRollup.sensor_type == st,
+            ReadingRollup.entity_id == eid, ReadingRollup.bucket >= cutoff))
+    db.commit()
+
+    last_id, rows = 0, 0
+    while last_id < max_id:
+        batch = db.execute(
+            select(Reading.id, Sensor.terrarium_id, Sensor.sensor_type, Sensor.entity_id,
+                   Reading.value, Sensor.unit, Reading.ts, Reading.ts_end, Reading.repeats)
+            .join(Sensor, Sensor.id == Reading.sensor_id)
+            .where(Reading.id > last_id, Reading.id <= max_id)
+            .order_by(Reading.id)
+            .limit(chunk)
+        ).all()
+        if not batch:
+            break
+        buckets: Buckets = {}
+        for _id, tid, st, eid, value, unit, ts, ts_end, repeats in batch:
+            accumulate(buckets, tid, st, eid, value, unit, ts)
+            for k in range(1, (repeats or 0) + 1):
+                accumulate(buckets, tid, st, eid, value, unit, ts + (ts_end - ts) * k / repeats)
+        upsert(db, {k: agg for k, agg in buckets.items() if k[:4] in cutoffs and k[4] >= cutoffs[k[:4]]})
+        db.commit()
+        last_id = batch[-1][0]
+        rows += len(batch)
+        log.info("rollup backfill: %d rows (up to id %d of %d)", rows, last_id, max_id)
+
+    return {"rows": rows, "seconds": round(time.perf_counter() - t0, 2)}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(prog="python -m app.rollups")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    bf = sub.add_parser("backfill", help="rebuild rollups from the readings still stored")
+    bf.add_argument("--chunk", type=int, default=50_000)
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    from .database import SessionLocal, init_db
+    init_db()
+    with SessionLocal() as db:
+        report = backfill(db, chunk=args.chunk)
+    print(report)
+    if report.get("rows"):
+        from .events import announce, history_event
+        asyncio.run(announce(history_event(readings=False)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,19 @@
 from __future__ import annotations
+from anyio import from_thread
 from fastapi import APIRouter, Depends, Request, Form
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
-from ..database import get_db
+from ..database import get_db, get_read_db
 from .. import crud
 from ..models import SensorRoleName
+from ..events import event_bus
 
 router = APIRouter(tags=["admin"])
 templates = Jinja2Templates(directory="app/templates")
 
 @router.get("/admin/terrarium/{slug}", response_class=HTMLResponse)
-def admin_map(slug: str, request: Request, db: Session = Depends(get_db)):
+def admin_map(slug: str, request: Request, db: Session = Depends(get_read_db)):
     seen = crud.list_seen_sensors(db, slug)
     role_map = crud.get_role_map(db, slug)
     return templates.TemplateResponse(
@@ -22,6 +24,11 @@ def admin_map(slug: str, request: Request, db: Session = Depends(get_db)):
 @router.post("/admin/terrarium/{slug}/map", response_class=HTMLResponse)
 def admin_set_map(slug: str, request: Request, role: str = Form(...), entity_id: str = Form(...), db: Session = Depends(get_db)):
     crud.set_role(db, terrarium_slug=slug, role=SensorRoleName(role), entity_id=entity_id)
+    # sync route (threadpool): hop back to the loop to notify SSE clients
+    from_thread.run(event_bus.publish, {
+        "kind": "role", "terrariums": [slug],
+        "roles": [{"terrarium": slug, "role": role, "entity_id": entity_id}],
+    })
     seen = crud.list_seen_sensors(db, slug)
     role_map = crud.get_role_map(db, slug)
     return templates.TemplateResponse(
@@ -0,0 +1,65 @@
+# app/routers/alerts.py
+from __future__ import annotations
+from anyio import from_thread
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from ..database import get_db, get_read_db
+from ..deps import verify_api_key
+from ..events import event_bus
+from ..schemas import AlertRuleIn, AlertRuleOut, AlertEventOut, ActiveAlert
+from .. import crud
+
+router = APIRouter(prefix="/api/v1/alerts", tags=["alerts"])
+
+
+def _check(rule: AlertRuleIn) -> None:
+    if rule.min_value is None and rule.max_value is None and rule.max_rate is None:
+        raise HTTPException(status_code=422, detail="Set at least one of min_value, max_value, max_rate")
+    if rule.min_value is not None and rule.max_value is not None and rule.min_value >= rule.max_value:
+        raise HTTPException(status_code=422, detail="min_value must be below max_value")
+
+
+def _rules_changed() -> None:
+    # sync route (threadpool): other workers reload their rules on this
+    from_thread.run(event_bus.publish, {"kind": "alert_rules", "terrariums": []})
+
+
+@router.get("/rules", response_model=list[AlertRuleOut])
+def list_rules(terrarium: str | None = Query(None), db: Session = Depends(get_read_db)):
+    return crud.list_alert_rules(db, terrarium)
+
+@router.post("/rules", response_model=AlertRuleOut, status_code=201, dependencies=[Depends(verify_api_key)])
+def create_rule(rule: AlertRuleIn, db: Session = Depends(get_db)):
+    _check(rule)
+    out = crud.save_alert_rule(db, rule)
+    _rules_changed()
+    return out
+
+@router.put("/rules/{rule_id}", response_model=AlertRuleOut, dependencies=[Depends(verify_api_key)])
+def update_rule(rule_id: int, rule: AlertRuleIn, db: Session = Depends(get_db)):
+    _check(rule)
+    out = crud.save_alert_rule(db, rule, rule_id)
+    if out is None:
+        raise HTTPException(status_code=404, detail="Unknown rule")
+    _rules_changed()
+    return out
+
+@router.delete("/rules/{rule_id}", status_code=204, dependencies=[Depends(verify_api_key)])
+def delete_rule(rule_id: int, db: Session = Depends(get_db)):
+    if not crud.delete_alert_rule(db, rule_id):
+        raise HTTPException(status_code=404, detail="Unknown rule")
+    _rules_changed()
+
+@router.get("/active", response_model=list[ActiveAlert])
+def active(db: Session = Depends(get_read_db)):
+    """Rules firing right now (from the in-process alert state, no query once loaded)."""
+    return crud.active_alerts(db)
+
+@router.get("/events", response_model=list[AlertEventOut])
+def events(terrarium: str | None = Query(None),
+           hours: int = Query(24, ge=1, le=24*90),
+           limit: int = Query(500, ge=1, le=5000),
+           db: Session = Depends(get_read_db)):
+    """Alert state changes, newest first."""
+    return crud.alert_events(db, terrarium, hours, limit)
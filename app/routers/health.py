@@ -1,7 +1,47 @@
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from ..ingest_buffer import ingest_buffer
+from ..state import hot_state
+from .. import retention
+from ..broadcast import summary_broadcaster
+from ..events import event_bus
+from .. import metrics
 
 router = APIRouter(tags=["health"])
 
 @router.get("/health")
 def health():
     return {"ok": True}
+
+@router.get("/health/ingest")
+def health_ingest():
+    """Write-behind buffer counters: queue depth and flush latency."""
+    return ingest_buffer.snapshot()
+
+@router.get("/health/ingest/dead-letters")
+def health_ingest_dead_letters():
+    """Buffered readings that could not be stored, oldest first; replay the payloads via /api/v1/ingest/batch."""
+    return list(ingest_buffer.dead_letters)
+
+@router.get("/health/cache")
+def health_cache():
+    """Hot-state cache hit/miss counters."""
+    return hot_state.stats()
+
+@router.get("/health/retention")
+def health_retention():
+    """Report of the last retention run (null until one has run)."""
+    return {"last_run": retention.last_report}
+
+@router.get("/health/sse")
+def health_sse():
+    """Summary broadcaster: renders vs. subscribers and frames delivered, plus the event bus transport."""
+    bus = {"backend": event_bus.backend.name, "last_id": event_bus.last_id, "dropped": event_bus.dropped}
+    if hasattr(event_bus.backend, "is_broker"):
+        bus["broker"] = event_bus.backend.is_broker
+    return {**summary_broadcaster.snapshot(), "bus": bus}
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus text format: per-route latency and SQL statement counts, event bus queues (app/metrics.py)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
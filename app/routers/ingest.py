@@ -1,52 +1,214 @@
 # app/routers/ingest.py
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-
-from ..schemas import IngestPayload, ReadingOut
-from ..database import get_db
-from ..deps import verify_api_key          
-from ..models import Reading, Terrarium,SensorType     
-import re
-from  app import crud
-from app.events import event_bus
+import asyncio
+import json
+import logging
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from pydantic import TypeAdapter, ValidationError
+
+from ..schemas import IngestPayload, IngestOut, IngestBatchResult, BatchItemStatus
+from ..deps import verify_api_key, api_key_valid
+from  app import acrud
+from app.config import settings
+from app.events import event_bus, readings_event
+from app.ingest_buffer import ingest_buffer
+from app.metrics import ws_ingest_frames
+from app.slugs import normalize_slug
 router = APIRouter(prefix="/api/v1", tags=["ingest"])
+log = logging.getLogger(__name__)
+
+@router.post("/ingest", status_code=202, response_model=IngestOut)
+async def ingest(payload: IngestPayload):
+    slug = normalize_slug(payload.terrarium_slug)
 
-_slug_re = re.compile(r"[^a-z0-9\-]+")
+    if ingest_buffer.running:
+        # write-behind: the buffer commits and publishes when it flushes
+        payload = payload.model_copy(update={"terrarium_slug": slug})
+        if not await ingest_buffer.put(payload):
+            raise HTTPException(status_code=503, detail="Ingest queue is full", headers={"Retry-After": "1"})
+        return IngestOut(
+            terrarium_slug=slug,
+            sensor_type=payload.sensor_type,
+            value=payload.value,
+            unit=payload.unit,
+            entity_id=payload.entity_id,
+            ts=payload.ts,
+            status="queued",
+        )
 
-def _normalize_slug(s: str) -> str:
-    s = s.strip().lower().replace(" ", "-")
-    return _slug_re.sub("-", s).strip("-") or "default"
+    # DB work runs on the DB executor so a slow commit doesn't stall SSE streams
+    payload = payload.model_copy(update={"terrarium_slug": slug})
+    [outcome] = await acrud.ingest_batch([payload])
 
-@router.post("/ingest", status_code=202, response_model=ReadingOut)
-async def ingest(payload: IngestPayload, db: Session = Depends(get_db)):
-    slug = _normalize_slug(payload.terrarium_slug)
-    terr = crud.get_or_create_terrarium(db, slug)
+    if outcome == "stored":
+        await event_bus.publish(readings_event([payload]))
 
-    sensor_type = SensorType(payload.sensor_type)  
-    reading = crud.create_reading(
-        db=db,
-        terrarium=terr,
-        sensor_type=sensor_type,
+    return IngestOut(
+        terrarium_slug=slug,
+        sensor_type=payload.sensor_type,
         value=payload.value,
         unit=payload.unit,
         entity_id=payload.entity_id,
         ts=payload.ts,
+        status=outcome,
     )
 
-    if getattr(payload, "role", None) and payload.entity_id:
-        from ..models import SensorRoleName
-        crud.set_role(db, terrarium_slug=terr.slug,
-                      role=SensorRoleName(payload.role), entity_id=payload.entity_id)
+@router.post("/ingest/batch", status_code=202, response_model=IngestBatchResult, dependencies=[Depends(verify_api_key)])
+async def ingest_batch(payloads: list[IngestPayload]):
+    """
+    Replay-friendly bulk ingest: one slug lookup, one INSERT, one commit, one event.
+    Readings already stored (same sensor and ts) come back as "duplicate".
+    """
+    payloads = [p.model_copy(update={"terrarium_slug": normalize_slug(p.terrarium_slug)}) for p in payloads]
+    statuses = await acrud.ingest_batch(payloads)
 
-    await event_bus.publish({"terrarium": terr.slug, "sensor_type": sensor_type.value})
+    stored = [p for p, st in zip(payloads, statuses) if st == "stored"]
+    if stored:
+        await event_bus.publish(readings_event(stored))
 
-    return ReadingOut(
-        terrarium_slug=terr.slug,
-        sensor_type=sensor_type.value,
-        value=reading.value,
-        unit=reading.unit,
-        entity_id=reading.entity_id,
-        ts=reading.ts,
+    return IngestBatchResult(
+        received=len(payloads),
+        stored=len(stored),
+        duplicates=statuses.count("duplicate"),
+        items=[BatchItemStatus(index=i, terrarium_slug=p.terrarium_slug, status=st)
+               for i, (p, st) in enumerate(zip(payloads, statuses))],
     )
+
+
+# --- WebSocket ingest ---------------------------------------------------------
+
+Frame = tuple[Any, list[IngestPayload] | None, Any]     # (seq, payloads, error detail)
+_CLOSED = object()
+_payload_list = TypeAdapter(list[IngestPayload])
+
+
+def _parse_frame(text: str) -> Frame:
+    try:
+        frame = json.loads(text)
+    except ValueError:
+        return None, None, "invalid JSON"
+    if not isinstance(frame, dict):
+        return None, None, "a frame is a JSON object"
+    seq = frame.get("seq")
+    try:
+        if "readings" in frame:
+            payloads = _payload_list.validate_python(frame["readings"])
+        else:
+            payloads = [IngestPayload.model_validate({k: v for k, v in frame.items() if k != "seq"})]
+    except ValidationError as e:
+        return seq, None, e.errors(include_url=False, include_context=False)
+    return seq, [p.model_copy(update={"terrarium_slug": normalize_slug(p.terrarium_slug)}) for p in payloads], None
+
+
+async def _ws_auth(ws: WebSocket) -> bool:
+    """Wait for {"type": "auth", "api_key": ...}; for clients that cannot set a handshake header."""
+    try:
+        frame = await asyncio.wait_for(ws.receive_json(), settings.ws_ingest_auth_timeout_s)
+    except WebSocketDisconnect:
+        return False
+    except (asyncio.TimeoutError, ValueError, KeyError):
+        frame = None
+    if isinstance(frame, dict) and frame.get("type") == "auth" and api_key_valid(frame.get("api_key")):
+        await ws.send_json({"type": "auth_ok"})
+        return True
+    await ws.close(code=status.WS_1008_POLICY_VIOLATION, reason="Bad API Key")
+    return False
+
+
+async def _ws_read(ws: WebSocket, frames: asyncio.Queue) -> None:
+    # a full queue stops the reads, and TCP pushes back on the sender
+    try:
+        while True:
+            message = await ws.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            text = message.get("text")
+            if text is None:
+                text = (message.get("bytes") or b"").decode("utf-8", "replace")
+            await frames.put(_parse_frame(text))
+    except Exception:
+        log.exception("websocket ingest: reading frames failed")
+    await frames.put(_CLOSED)
+
+
+async def _ws_write(ws: WebSocket, frames: asyncio.Queue) -> None:
+    closed = False
+    while not closed:
+        # everything queued since the last write goes into the next one
+        batch: list[Frame] = []
+        rows = 0
+        item = await frames.get()
+        while True:
+            if item is _CLOSED:
+                closed = True
+                break
+            batch.append(item)
+            rows += len(item[1] or ())
+            if rows >= settings.ws_ingest_max_rows or frames.empty():
+                break
+            item = frames.get_nowait()
+        if not batch:
+            break
+
+        payloads = [p for _seq, ps, _err in batch if ps for p in ps]
+        statuses: list[str] = []
+        failed = None
+        if payloads:
+            try:
+                statuses = await acrud.ingest_batch(payloads)
+            except Exception:
+                log.exception("websocket ingest: writing %d readings failed", len(payloads))
+                failed = "not stored, send again"
+            else:
+                stored = [p for p, st in zip(payloads, statuses) if st == "stored"]
+                if stored:
+                    await event_bus.publish(readings_event(stored))
+
+        at = 0
+        for seq, ps, err in batch:
+            err = err or (failed if ps else None)
+            frame_statuses = statuses[at:at + len(ps)] if ps and not err else []
+            at += len(ps) if ps else 0
+            ws_ingest_frames.inc(("error" if err else "ack",))
+            if closed:
+                continue        # stored, but there is no one left to tell
+            try:
+                await ws.send_json({"type": "error", "seq": seq, "detail": err} if err else
+                                   {"type": "ack", "seq": seq, "stored": frame_statuses.count("stored"),
+                                    "duplicates": frame_statuses.count("duplicate")})
+            except (WebSocketDisconnect, RuntimeError):
+                closed = True
+
+
+@router.websocket("/ingest/ws")
+async def ingest_ws(ws: WebSocket):
+    """
+    Ingest over one long-lived connection, for pushers sending many readings.
+
+    Authenticate once: X-API-Key on the handshake, or a first frame
+    {"type": "auth", "api_key": "..."} (answered with {"type": "auth_ok"}).
+    Then send frames, each one reading ({"seq": n, ...ingest payload}) or
+    several ({"seq": n, "readings": [...]}). Frames are answered in order with
+    {"type": "ack", "seq": n, "stored": k, "duplicates": d} once committed, or
+    {"type": "error", "seq": n, "detail": ...}. Frames are not waited on: those
+    that arrive while a write is in progress are stored together by the next
+    one, up to WS_INGEST_MAX_ROWS readings, through the same path as
+    /ingest/batch.
+    """
+    key = ws.headers.get("x-api-key")
+    if key is not None and not api_key_valid(key):
+        await ws.close(code=status.WS_1008_POLICY_VIOLATION, reason="Bad API Key")
+        return
+    await ws.accept()
+    if key is None and not await _ws_auth(ws):
+        return
+
+    frames: asyncio.Queue = asyncio.Queue(maxsize=settings.ws_ingest_queue_frames)
+    reader = asyncio.create_task(_ws_read(ws, frames))
+    try:
+        await _ws_write(ws, frames)
+    finally:
+        reader.cancel()
@@ -1,66 +1,109 @@
 # app/routers/sse.py
 from __future__ import annotations
 import asyncio
-from fastapi import APIRouter, Request
-from fastapi.templating import Jinja2Templates
+import json
+from datetime import datetime, timezone
+from fastapi import APIRouter, Header, Request
 from starlette.responses import StreamingResponse
 
+from .. import acrud, columnar
+from ..broadcast import (summary_broadcaster, role_table_frame, role_delta_frame, alerts_frame, parse_event_id,
+                         sse_frame)
+from ..config import settings
 from ..events import event_bus
-from ..database import SessionLocal
-from .. import crud
+from ..state import hot_state
 
 router = APIRouter(tags=["sse"])
-templates = Jinja2Templates(directory="app/templates")
-
-
-def _sse(event: str, data: str):
-    """Helper: format one SSE event from an HTML fragment."""
-    yield f"event: {event}\n"
-    for line in data.splitlines():
-        yield f"data: {line}\n"
-    yield "\n"
 
 
 @router.get("/sse/summary")
 async def sse_summary(request: Request):
-    q = await event_bus.subscribe()
+    # frames are rendered once per change by the broadcaster and shared by all clients
+    q = await summary_broadcaster.subscribe()
 
     async def gen():
         try:
-            # Initial render
-            with SessionLocal() as db:
-                # If you added role_summary, prefer it; otherwise use latest_per_terrarium
-                items = crud.role_summary(db) if hasattr(crud, "role_summary") else crud.latest_per_terrarium(db)
-            html = templates.get_template("components/summary_table.html").render(
-                {"request": request, "items": items}
-            )
-            for chunk in _sse("summary", html):
-                yield chunk
-
-            # Live loop
             while True:
                 if await request.is_disconnected():
                     break
 
                 try:
-                    # heartbeat every ~25s to keep proxies happy
-                    await asyncio.wait_for(q.get(), timeout=25)
+                    # heartbeat (default ~25s) to keep proxies happy
+                    frame = await asyncio.wait_for(q.get(), timeout=settings.sse_heartbeat_s)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                yield frame
+        finally:
+            summary_broadcaster.unsubscribe(q)
+
+    return _stream(gen())
+
+
+@router.get("/sse/terrarium/{slug}")
+async def sse_terrarium(slug: str, request: Request):
+    """
+    New chart points for one terrarium as they are ingested: "points" frames
+    holding {"series": [...]} in the columnar shape of /api/v1/readings. A single
+    ingest is pushed straight from the bus event. A batch carried more points than
+    the event lists, and a dropped event loses some, so those are re-read from the
+    DB since the newest point already pushed.
+    """
+    q = await event_bus.subscribe()
+
+    async def gen():
+        try:
+            cursor = event_bus.last_id
+            connected = datetime.now(timezone.utc)
+            pushed: int | None = None      # newest ts sent (epoch ms); the page fetches what came before
+            yield ": connected\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    ev = await asyncio.wait_for(q.get(), timeout=settings.sse_heartbeat_s)
                 except asyncio.TimeoutError:
                     yield ": keep-alive\n\n"
                     continue
 
-                with SessionLocal() as db:
-                    items = crud.role_summary(db) if hasattr(crud, "role_summary") else crud.latest_per_terrarium(db)
-                html = templates.get_template("components/summary_table.html").render(
-                    {"request": request, "items": items}
-                )
-                for chunk in _sse("summary", html):
-                    yield chunk
+                gap = ev.id > cursor + 1
+                cursor = ev.id
+                data = ev.data if isinstance(ev.data, dict) else {}
+                if not gap and (data.get("kind") != "readings" or slug not in data["terrariums"]):
+                    continue
+                if gap or data["count"] > len(data["latest"]):
+                    since = datetime.fromtimestamp(pushed / 1000, timezone.utc) if pushed else connected
+                    series = await acrud.raw_series_since(slug, since)
+                else:
+                    series = columnar.event_series([r for r in data["latest"] if r["terrarium"] == slug])
+                # a late reading would rewrite history the client already has; it shows up on reload
+                series = _after(series, pushed)
+                if not series:
+                    continue
+                pushed = max(s["ts"][-1] for s in series)
+                yield sse_frame("points", json.dumps({"series": series}, separators=(",", ":")))
         finally:
             await event_bus.unsubscribe(q)
 
+    return _stream(gen())
+
+
+def _after(series: list[dict], ms: int | None) -> list[dict]:
+    """Columnar series cut to the points newer than `ms`."""
+    if ms is None:
+        return series
+    out = []
+    for s in series:
+        keep = [i for i, t in enumerate(s["ts"]) if t > ms]
+        if keep:
+            out.append({**s, "ts": [s["ts"][i] for i in keep], "value": [s["value"][i] for i in keep]})
+    return out
+
+
+def _stream(gen):
     return StreamingResponse(
-        gen(),
+        gen,
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -68,3 +111,62 @@ async def sse_summary(request: Request):
             "Connection": "keep-alive",
         },
     )
+
+
+@router.get("/sse/summary/delta")
+async def sse_summary_delta(request: Request, last_event_id: str | None = Header(None, alias="Last-Event-ID")):
+    """
+    Role table once ("summary"), then only the changed (terrarium, role) cells as
+    out-of-band fragments ("delta"). Every frame carries an id; a client that
+    reconnects with Last-Event-ID gets the missed deltas replayed from the bus
+    ring buffer instead of a full re-render, when they are still there.
+    """
+    q = await event_bus.subscribe()
+
+    async def gen():
+        try:
+            cursor = event_bus.last_id
+            resume_from = parse_event_id(last_event_id)
+            missed = event_bus.since(resume_from) if resume_from is not None else None
+            if missed is None:
+                frame, shown = await role_table_frame(cursor)
+                yield frame
+                yield alerts_frame(cursor)
+            else:
+                # the client's table predates the missed events; assume it has every current terrarium
+                shown = {it["terrarium_slug"] for it in (hot_state.role_summary() or [])}
+                for ev in missed:
+                    frame = role_delta_frame(ev, shown)
+                    if frame is None:
+                        frame, shown = await role_table_frame(cursor)
+                        yield frame
+                        break
+                    if frame:
+                        yield frame
+                if any(isinstance(ev.data, dict) and ev.data.get("kind") == "alert" for ev in missed):
+                    yield alerts_frame(cursor)
+
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    ev = await asyncio.wait_for(q.get(), timeout=settings.sse_heartbeat_s)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if ev.id <= cursor:
+                    continue                    # already covered by the initial table / replay
+                gap = ev.id > cursor + 1        # our queue overflowed and events were dropped
+                cursor = ev.id
+                frame = None if gap else role_delta_frame(ev, shown)
+                if frame is None:
+                    frame, shown = await role_table_frame(cursor)
+                if frame:
+                    yield frame
+                if gap or (isinstance(ev.data, dict) and ev.data.get("kind") == "alert"):
+                    yield alerts_frame(cursor)
+        finally:
+            await event_bus.unsubscribe(q)
+
+    return _stream(gen())
@@ -1,34 +1,162 @@
 from __future__ import annotations
-from fastapi import APIRouter, Depends, Query
+from datetime import datetime, timedelta, timezone
+import hashlib
+import time
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from ..database import get_db
-from .. import crud
-from ..schemas import SummaryItem, ReadingOut,RoleSummaryItem
-from typing import List
+from ..database import get_read_db, stream_db
+from .. import columnar, crud, export, stats as stats_
+from ..state import hot_state, as_utc
+from ..liveness import liveness
+from ..versions import data_versions, not_modified
+from ..deadband import step_points
+from ..models import SensorRoleName
+from ..schemas import SummaryItem, ReadingOut,RoleSummaryItem, CompressionItem, StatsItem, SensorHealth, RoleName
+from typing import List, Literal
 
 router = APIRouter(prefix="/api/v1", tags=["query"])
 
 @router.get("/summary", response_model=list[SummaryItem])
-def summary(db: Session = Depends(get_db)):
-    return crud.latest_per_terrarium(db)
+def summary(request: Request, response: Response, db: Session = Depends(get_read_db)):
+    if (r304 := not_modified(request, response, *data_versions.etag())) is not None:
+        return r304
+    items = hot_state.latest_per_terrarium()
+    return liveness.annotate(items if items is not None else crud.latest_per_terrarium(db))
 
 @router.get("/readings", response_model=list[ReadingOut])
-def readings(terrarium: str = Query(..., description="Terrarium slug"),
+def readings(request: Request, response: Response,
+             terrarium: str = Query(..., description="Terrarium slug"),
              hours: int = Query(24, ge=1, le=24*30),
-             db: Session = Depends(get_db)):
-    rows = crud.readings_window(db, terrarium_slug=terrarium, hours=hours)
+             resolution: Literal["raw", "1m", "1h", "auto"] = Query("raw", description="raw rows or 1m/1h rollups; auto targets ~2k points per series"),
+             since: datetime | None = Query(None, description="Only points after this (raw) or from its bucket on (rollups)"),
+             accept: str | None = Header(None),
+             format: Literal["ndjson", "csv"] | None = Query(None, description="Stream raw rows instead, as /readings/export does"),
+             db: Session = Depends(get_read_db)):
+    """
+    Rows as JSON by default. Chart clients can ask for per-series parallel arrays
+    instead via Accept (see app/columnar.py), and downloads for a streamed
+    NDJSON/CSV file via `format` (raw only; see /readings/export).
+
+    `since` turns a refresh into an incremental one: pass the newest ts the client
+    holds and the resolution it got. Returned points replace any the client has at
+    or after the first returned ts of their series.
+    """
+    if format is not None:
+        if resolution != "raw":
+            raise HTTPException(status_code=422, detail="format streams raw readings only; use resolution=raw or /readings/export")
+        end = datetime.now(timezone.utc)
+        start = max(as_utc(since), end - timedelta(hours=hours)) if since else end - timedelta(hours=hours)
+        return _export(format, [terrarium], start, end)
+    media = columnar.negotiate(accept)
+    response.headers["Vary"] = "Accept"
+    # the window slides too, so a tag is only reused within the same minute
+    variant = f"{media}|{hours}|{resolution}|{since and as_utc(since).isoformat()}|{int(time.time() // 60)}"
+    etag, modified_at = data_versions.etag(terrarium, hashlib.blake2s(variant.encode(), digest_size=6).hexdigest())
+    if (r304 := not_modified(request, response, etag, modified_at)) is not None:
+        return r304
+    if resolution == "auto":
+        resolution = crud.pick_resolution(db, terrarium_slug=terrarium, hours=hours)
+    if resolution != "raw":
+        buckets = crud.rollup_window(db, terrarium_slug=terrarium, hours=hours, resolution=resolution, since=since)
+        if media != columnar.JSON:
+            return columnar.render(media, terrarium, resolution, columnar.rollup_series(buckets), response.headers)
+        return [
+            ReadingOut(
+                terrarium_slug=terrarium,
+                sensor_type=b.sensor_type,
+                value=b.sum / b.count,
+                unit=b.unit,
+                entity_id=b.entity_id or None,
+                ts=b.bucket,
+                value_min=b.min,
+                value_max=b.max,
+                count=b.count,
+            )
+            for b in buckets
+        ]
+
+    rows = crud.readings_window(db, terrarium_slug=terrarium, hours=hours, since=since)
+    # deadband rows come back as two points (start and ts_end) so the chart draws the hold
+    points = step_points(rows)
+    if since is not None:
+        since = as_utc(since)
+        points = [(r, ts) for r, ts in points if as_utc(ts) > since]
+    if media != columnar.JSON:
+        return columnar.render(media, terrarium, "raw", columnar.raw_series(points), response.headers)
     out: list[ReadingOut] = []
-    for r in rows:
+    for r, ts in points:
         out.append(ReadingOut(
-            terrarium_slug=r.terrarium.slug if r.terrarium else terrarium,
-            sensor_type = r.sensor_type.value if hasattr(r.sensor_type, "value") else r.sensor_type
-,
+            terrarium_slug=terrarium,
+            sensor_type=r.sensor_type,
             value=r.value,
             unit=r.unit,
-            ts=r.ts,
-            entity_id=r.entity_id
+            ts=ts,
+            entity_id=r.entity_id or None,
+            available=r.available,
         ))
     return out
+
+@router.get("/readings/export")
+async def readings_export(terrarium: list[str] = Query([], description="Terrarium slug; repeat for several, all when omitted"),
+                          start: datetime | None = Query(None, description="Inclusive; default end - 24h"),
+                          end: datetime | None = Query(None, description="Exclusive; default now"),
+                          format: Literal["ndjson", "csv"] = Query("ndjson")):
+    """Raw readings in [start, end), oldest first, streamed with flat memory."""
+    end = as_utc(end) if end else datetime.now(timezone.utc)
+    start = as_utc(start) if start else end - timedelta(hours=24)
+    if start >= end:
+        raise HTTPException(status_code=422, detail="start must be before end")
+    return _export(format, terrarium or None, start, end)
+
+def _export(format: str, terrariums: list[str] | None, start: datetime, end: datetime) -> StreamingResponse:
+    return StreamingResponse(
+        stream_db(export.chunks, format, terrariums, start, end),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="readings.{format}"'},
+    )
+
+@router.get("/readings/compression", response_model=list[CompressionItem])
+def readings_compression(terrarium: str | None = Query(None, description="Terrarium slug; all when omitted"),
+                         hours: int = Query(24, ge=1, le=24*365),
+                         db: Session = Depends(get_read_db)):
+    """Deadband compression per entity: readings received vs. rows stored over the last `hours`."""
+    return crud.compression_report(db, terrarium_slug=terrarium, hours=hours)
+
+@router.get("/sensors/health", response_model=SensorHealth)
+def sensors_health(all: bool = Query(False, description="List every tracked sensor, not just stale / unavailable ones")):
+    """Sensors that stopped reporting or report themselves unavailable (from the in-process liveness tracker)."""
+    return liveness.report_health(everything=all)
+
+@router.get("/stats", response_model=list[StatsItem])
+def stats(request: Request, response: Response,
+          terrarium: list[str] = Query([], description="Terrarium slug; repeat for several, all when omitted"),
+          role: list[RoleName] = Query([], description="Role; repeat for several, all when omitted"),
+          hours: int = Query(24, ge=1, le=24*30),
+          band_low: float | None = Query(None, description="Target band override, with band_high"),
+          band_high: float | None = Query(None),
+          db: Session = Depends(get_read_db)):
+    """
+    Min / max / time-weighted mean, std and percentiles, and the share of time
+    inside the target band, per terrarium role over the last `hours` (app/stats.py).
+    """
+    if (band_low is None) != (band_high is None) or (band_low is not None and band_low > band_high):
+        raise HTTPException(status_code=422, detail="band_low and band_high go together, low <= high")
+    variant = f"stats|{sorted(terrarium)}|{sorted(role)}|{hours}|{band_low}|{band_high}|{int(time.time() // 60)}"
+    etag, modified_at = data_versions.etag(variant=hashlib.blake2s(variant.encode(), digest_size=6).hexdigest())
+    if (r304 := not_modified(request, response, etag, modified_at)) is not None:
+        return r304
+    end = datetime.now(timezone.utc)
+    return stats_.window_stats(
+        db, end - timedelta(hours=hours), end,
+        slugs=terrarium or None,
+        roles=[SensorRoleName(r) for r in role] or None,
+        band=(band_low, band_high) if band_low is not None else None,
+    )
+
 @router.get("/summary/roles", response_model=list[RoleSummaryItem])
-def summary_roles(db: Session = Depends(get_db)):
-    return crud.role_summary(db)
+def summary_roles(request: Request, response: Response, db: Session = Depends(get_read_db)):
+    if (r304 := not_modified(request, response, *data_versions.etag(variant="roles"))) is not None:
+        return r304
+    items = hot_state.role_summary()
+    return liveness.annotate(items if items is not None else crud.role_summary(db))
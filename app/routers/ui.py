@@ -1,12 +1,15 @@
 # app/routers/ui.py
 from __future__ import annotations
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Request, Response
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 
-from ..database import get_db
+from ..database import get_read_db
 from .. import crud
+from ..state import hot_state
+from ..liveness import liveness
+from ..versions import data_versions, not_modified
 
 router = APIRouter(tags=["ui"])  # no prefix; "/" will be home
 
@@ -18,11 +21,16 @@ def home(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 @router.get("/ui/summary", response_class=HTMLResponse)
-def ui_summary(request: Request, db: Session = Depends(get_db)):
-    items = crud.latest_per_terrarium(db)
+def ui_summary(request: Request, response: Response, db: Session = Depends(get_read_db)):
+    if (r304 := not_modified(request, response, *data_versions.etag(variant="ui"))) is not None:
+        return r304
+    items = hot_state.latest_per_terrarium()
+    if items is None:
+        items = crud.latest_per_terrarium(db)
     return templates.TemplateResponse(
         "components/summary_table.html",
-        {"request": request, "items": items},
+        {"request": request, "items": liveness.annotate(items)},
+        headers=dict(response.headers),
     )
 
 @router.get("/terrarium/{slug}", response_class=HTMLResponse)
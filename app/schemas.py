@@ -15,6 +15,17 @@ class IngestPayload(BaseModel):
     ts: datetime
     available: bool | None = None   # optional flag
 
+class BatchItemStatus(BaseModel):
+    index: int
+    terrarium_slug: str
+    status: str                     # "stored" | "duplicate"
+
+class IngestBatchResult(BaseModel):
+    received: int
+    stored: int
+    duplicates: int = 0             # already stored: same sensor and ts (a retried push)
+    items: list[BatchItemStatus]
+
 class ReadingOut(BaseModel):
     terrarium_slug: str
     sensor_type: str
@@ -23,6 +34,88 @@ class ReadingOut(BaseModel):
     entity_id: str | None = None
     ts: datetime
     available: bool | None = None
+    # set when served from rollups: value is the bucket mean, ts the bucket start
+    value_min: float | None = None
+    value_max: float | None = None
+    count: int | None = None
+
+class IngestOut(ReadingOut):
+    status: str = "stored"          # "stored" | "duplicate" | "queued" (buffered ingest)
+
+class CompressionItem(BaseModel):
+    terrarium_slug: str
+    sensor_type: str
+    entity_id: str | None = None
+    received: int                   # readings pushed
+    stored: int                     # rows kept (deadband folds the rest into them)
+    ratio: float | None = None      # received / stored
+
+class SensorHealthItem(BaseModel):
+    terrarium_slug: str
+    sensor_type: str
+    entity_id: str | None = None
+    last_seen: datetime
+    silent_s: float                 # seconds since last_seen
+    available: bool                 # as last reported by the sensor
+    stale: bool
+    stale_since: datetime | None = None
+
+class SensorHealth(BaseModel):
+    stale_after_s: int
+    tracked: int
+    stale: int
+    unavailable: int
+    sensors: list[SensorHealthItem]
+
+class StatsItem(BaseModel):
+    terrarium_slug: str
+    role: RoleName
+    entity_id: str
+    unit: str | None = None
+    samples: int                    # readings stored in the window
+    covered_s: float                # seconds with a known value
+    min: float | None = None
+    max: float | None = None
+    mean: float | None = None       # mean, std and percentiles are time-weighted
+    std: float | None = None
+    percentiles: dict[str, float | None]
+    band: list[float] | None = None
+    in_band: float | None = None    # fractions of covered_s
+    below_band: float | None = None
+    above_band: float | None = None
+
+class AlertRuleIn(BaseModel):
+    terrarium_slug: str
+    role: RoleName
+    name: str | None = None
+    min_value: float | None = None
+    max_value: float | None = None
+    max_rate: float | None = Field(None, gt=0, description="max |change| per minute")
+    hysteresis: float = Field(0.0, ge=0)
+    min_duration_s: int = Field(0, ge=0)
+    enabled: bool = True
+
+class AlertRuleOut(AlertRuleIn):
+    id: int
+
+class AlertEventOut(BaseModel):
+    id: int
+    rule_id: int
+    terrarium_slug: str
+    role: RoleName
+    state: Literal["firing", "resolved"]
+    reason: str
+    value: float | None = None
+    ts: datetime
+
+class ActiveAlert(BaseModel):
+    rule_id: int
+    terrarium: str
+    role: RoleName
+    reason: str
+    since: datetime | None = None
+    value: float | None = None      # latest reading
+    ts: datetime | None = None
 
 
 class RoleMapRequest(BaseModel):
@@ -45,6 +138,7 @@ class SummaryItem(BaseModel):
     humidity_unit: str | None = None
     ts_temperature: datetime | None = None
     ts_humidity: datetime | None = None
+    stale: list[str] = []           # sensors past LIVENESS_STALE_AFTER_S (entity ids / sensor types)
 
 class RoleSummaryItem(BaseModel):
     terrarium_slug: str
@@ -56,4 +150,5 @@ class RoleSummaryItem(BaseModel):
     env_temp_ts: datetime | None = None
     humidity: float | None = None
     humidity_unit: str | None = None
-    humidity_ts: datetime | None = None
\ No newline at end of file
+    humidity_ts: datetime | None = None
+    stale: list[str] = []
\ No newline at end of file
@@ -0,0 +1,118 @@
+# app/sensors.py
+"""
+Sensor registry: maps (terrarium, sensor type, entity) to the small integer key
+readings are stored under, and keeps each sensor's unit and first/last seen.
+
+Ids are cached per process, so a known series costs no lookup at ingest. A new
+series costs one SELECT, plus one INSERT the first time it is ever pushed.
+last_seen and unit are written at most once per sensor per batch, and only
+when they moved.
+"""
+from __future__ import annotations
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import select, update, bindparam, case
+from sqlalchemy.orm import Session
+
+from .database import dialect_insert
+from .models import Sensor
+from .state import as_utc
+
+SensorKey = tuple[int, str, str]        # (terrarium_id, sensor_type, entity_id or "")
+
+
+@dataclass(frozen=True)
+class Known:
+    id: int
+    unit: str | None
+    last_seen: datetime
+
+
+def sensor_key(terrarium_id: int, sensor_type: str, entity_id: str | None) -> SensorKey:
+    return terrarium_id, sensor_type, entity_id or ""
+
+
+_sensors = Sensor.__table__
+
+_touch = (
+    update(_sensors)
+    .where(_sensors.c.id == bindparam("b_id"))
+    .values(
+        last_seen=case((_sensors.c.last_seen < bindparam("b_last", type_=_sensors.c.last_seen.type),
+                        bindparam("b_last", type_=_sensors.c.last_seen.type)),
+                       else_=_sensors.c.last_seen),
+        unit=bindparam("b_unit"),
+    )
+)
+
+
+class SensorRegistry:
+    def __init__(self) -> None:
+        self._known: dict[SensorKey, Known] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, db: Session, rows: list[dict]) -> dict[SensorKey, Known]:
+        """
+        Sensor for every key among ingest rows (terrarium_id, sensor_type, entity_id,
+        unit, ts), registering new ones and moving unit / last_seen forward. Does
+        not commit; pass the result to remember() once the transaction has.
+        """
+        seen: dict[SensorKey, list] = {}        # key -> [unit, first ts, last ts]
+        for r in rows:
+            key = sensor_key(r["terrarium_id"], r["sensor_type"], r["entity_id"])
+            agg = seen.get(key)
+            if agg is None:
+                seen[key] = [r["unit"], r["ts"], r["ts"]]
+            else:
+                agg[0] = r["unit"] or agg[0]
+                agg[1] = min(agg[1], r["ts"])
+                agg[2] = max(agg[2], r["ts"])
+
+        with self._lock:
+            known = {k: self._known[k] for k in seen if k in self._known}
+        missing = [k for k in seen if k not in known]
+        if missing:
+            known.update(self._load(db, missing, seen))
+
+        touched = []
+        for key, (unit, _first, last) in seen.items():
+            s = known[key]
+            unit = unit or s.unit
+            if last > s.last_seen or unit != s.unit:
+                touched.append({"b_id": s.id, "b_last": last, "b_unit": unit})
+                known[key] = Known(s.id, unit, max(last, s.last_seen))
+        if touched:
+            db.execute(_touch, touched)
+        return known
+
+    def remember(self, known: dict[SensorKey, Known]) -> None:
+        with self._lock:
+            self._known.update(known)
+
+    def _load(self, db: Session, keys: list[SensorKey], seen: dict[SensorKey, list]) -> dict[SensorKey, Known]:
+        """Look the keys up, registering the ones that do not exist yet."""
+        def lookup() -> dict[SensorKey, Known]:
+            found = db.execute(select(Sensor).where(Sensor.terrarium_id.in_({k[0] for k in keys}))).scalars()
+            return {
+                k: Known(s.id, s.unit, as_utc(s.last_seen))
+                for s in found
+                if (k := (s.terrarium_id, s.sensor_type, s.entity_id)) in seen
+            }
+
+        out = lookup()
+        new = [k for k in keys if k not in out]
+        if new:
+            # DO NOTHING: another worker may register the same sensor concurrently
+            stmt = dialect_insert(db, Sensor).on_conflict_do_nothing(index_elements=["terrarium_id", "entity_id", "sensor_type"])
+            db.execute(stmt, [
+                {"terrarium_id": k[0], "sensor_type": k[1], "entity_id": k[2], "unit": seen[k][0],
+                 "first_seen": seen[k][1], "last_seen": seen[k][1]}
+                for k in new
+            ])
+            out = lookup()
+        return out
+
+
+sensor_registry = SensorRegistry()
@@ -0,0 +1,12 @@
+# app/slugs.py
+"""Terrarium slugs as every write path stores them."""
+from __future__ import annotations
+import re
+
+_slug_re = re.compile(r"[^a-z0-9\-]+")
+
+
+def normalize_slug(s: str) -> str:
+    """Lower-case, dashes for spaces and other characters; "default" if nothing is left."""
+    s = s.strip().lower().replace(" ", "-")
+    return _slug_re.sub("-", s).strip("-") or "default"
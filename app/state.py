@@ -0,0 +1,178 @@
+# app/state.py
+"""
+Process-local "current state": the latest reading per terrarium/entity and per
+terrarium/sensor type, plus each terrarium's role map.
+
+crud updates it after every committed ingest or role change and the app warms it
+from the DB at startup, so the summary endpoints and the SSE stream are answered
+from memory instead of a GROUP BY over the whole readings table. Until it is warm
+(or if it is disabled) every lookup is a miss and callers fall back to crud.
+"""
+from __future__ import annotations
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from .models import Terrarium, Sensor, Reading, SensorRole, SensorType, SensorRoleName
+
+
+def as_utc(ts: datetime) -> datetime:
+    """Naive datetimes (SQLite) are UTC; aware ones are converted to UTC."""
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+
+@dataclass(frozen=True)
+class Latest:
+    sensor_type: str
+    value: float | None
+    unit: str | None
+    ts: datetime
+
+
+class HotState:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._warm = False
+        self._slugs: set[str] = set()
+        self._by_entity: dict[tuple[str, str], Latest] = {}
+        self._by_type: dict[tuple[str, str], Latest] = {}
+        self._roles: dict[str, dict[str, str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def warm(self) -> bool:
+        return self._warm
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "warm": self._warm,
+                "hits": self.hits,
+                "misses": self.misses,
+                "terrariums": len(self._slugs),
+                "entities": len(self._by_entity),
+            }
+
+    # ---- writes ----
+
+    def warm_from_db(self, db: Session) -> None:
+        """Load terrariums, role maps and the latest reading per entity and per sensor type."""
+        slugs = {t.id: t.slug for t in db.execute(select(Terrarium)).scalars()}
+        roles: dict[str, dict[str, str]] = {}
+        for r in db.execute(select(SensorRole)).scalars():
+            roles.setdefault(slugs[r.terrarium_id], {})[r.role.value] = r.entity_id
+
+        by_entity: dict[tuple[str, str], Latest] = {}
+        by_type: dict[tuple[str, str], Latest] = {}
+        # newest reading per sensor; the per-entity / per-type maps keep the newest of those
+        latest = (
+            select(Reading.sensor_id, func.max(Reading.ts).label("max_ts"))
+            .group_by(Reading.sensor_id)
+            .subquery()
+        )
+        rows = db.execute(
+            select(Sensor.terrarium_id, Sensor.entity_id, Sensor.sensor_type, Reading.value, Sensor.unit,
+                   func.coalesce(Reading.ts_end, Reading.ts))
+            .join(latest, (Reading.sensor_id == latest.c.sensor_id) & (Reading.ts == latest.c.max_ts))
+            .join(Sensor, Sensor.id == Reading.sensor_id)
+            .order_by(Reading.id)
+        ).all()
+        for terrarium_id, entity_id, sensor_type, value, unit, ts in rows:
+            latest_row = Latest(sensor_type, value, unit, as_utc(ts))
+            slug = slugs[terrarium_id]
+            self._put(by_type, (slug, sensor_type), latest_row)
+            if entity_id:
+                self._put(by_entity, (slug, entity_id), latest_row)
+
+        with self._lock:
+            self._slugs = set(slugs.values())
+            self._roles = roles
+            self._by_entity = by_entity
+            self._by_type = by_type
+            self._warm = True
+
+    def record(self, slug: str, sensor_type: str, entity_id: str | None, value: float | None,
+               unit: str | None, ts: datetime) -> None:
+        latest = Latest(sensor_type, value, unit, as_utc(ts))
+        with self._lock:
+            self._slugs.add(slug)
+            self._put(self._by_type, (slug, sensor_type), latest)
+            if entity_id:
+                self._put(self._by_entity, (slug, entity_id), latest)
+
+    def set_role(self, slug: str, role: str, entity_id: str) -> None:
+        with self._lock:
+            self._slugs.add(slug)
+            self._roles.setdefault(slug, {})[role] = entity_id
+
+    @staticmethod
+    def _put(d: dict, key: tuple[str, str], latest: Latest) -> None:
+        cur = d.get(key)
+        # replayed history must not overwrite a newer value
+        if cur is None or latest.ts >= cur.ts:
+            d[key] = latest
+
+    # ---- reads (None = miss, use crud) ----
+
+    def _hit(self) -> bool:
+        if self._warm:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def latest_per_terrarium(self) -> list[dict] | None:
+        """Same shape as crud.latest_per_terrarium."""
+        with self._lock:
+            if not self._hit():
+                return None
+            by_slug: dict[str, dict] = {}
+            for (slug, sensor_type), r in self._by_type.items():
+                d = by_slug.setdefault(slug, {"terrarium_slug": slug})
+                if sensor_type == SensorType.temperature.value:
+                    d.update(temperature=r.value, temperature_unit=r.unit, ts_temperature=r.ts)
+                elif sensor_type == SensorType.humidity.value:
+                    d.update(humidity=r.value, humidity_unit=r.unit, ts_humidity=r.ts)
+            return list(by_slug.values())
+
+    def role_summary(self) -> list[dict] | None:
+        """Same shape as crud.role_summary."""
+        with self._lock:
+            if not self._hit():
+                return None
+            return [self._role_item(slug) for slug in sorted(self._slugs)]
+
+    def role_item(self, slug: str) -> dict | None:
+        """One terrarium's role_summary entry (None when cold or unknown)."""
+        with self._lock:
+            if not self._hit() or slug not in self._slugs:
+                return None
+            return self._role_item(slug)
+
+    def roles_of(self, slug: str, entity_id: str | None) -> list[str]:
+        """Roles the entity is currently mapped to in this terrarium."""
+        with self._lock:
+            return [role for role, eid in self._roles.get(slug, {}).items() if entity_id and eid == entity_id]
+
+    def role_entities(self, slug: str) -> dict[str, str]:
+        """role -> entity_id of one terrarium."""
+        with self._lock:
+            return dict(self._roles.get(slug, {}))
+
+    def _role_item(self, slug: str) -> dict:
+        item = {"terrarium_slug": slug}
+        role_map = self._roles.get(slug, {})
+        for role in SensorRoleName:
+            eid = role_map.get(role.value)
+            r = self._by_entity.get((slug, eid)) if eid else None
+            item[role.value] = r.value if r else None
+            item[f"{role.value}_unit"] = r.unit if r else None
+            item[f"{role.value}_ts"] = r.ts if r else None
+        return item
+
+
+hot_state = HotState()
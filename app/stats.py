@@ -0,0 +1,160 @@
+# app/stats.py
+"""
+Window statistics per terrarium role (basking_temp / env_temp / humidity).
+
+The readings of every role-mapped sensor in the window are pulled with one
+query as plain numbers (sensor id, value, epoch seconds of ts and ts_end),
+loaded into one array per column and reduced with NumPy. Each value counts for
+as long as it held: until the next reading of its sensor, but no more than
+STATS_MAX_HOLD_S past its last confirmation (ts_end for a deadband row, else
+ts), so a sensor that went silent does not keep its last value forever. All
+figures (mean, std, percentiles, time in band) are weighted by that duration;
+min and max are over the values that held for any time in the window.
+"""
+from __future__ import annotations
+from datetime import datetime
+from operator import itemgetter
+
+import numpy as np
+from sqlalchemy import select, func, cast, Float, and_
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import Terrarium, Sensor, Reading, SensorRole, SensorRoleName
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+ROLE_SENSOR_TYPE = {
+    SensorRoleName.basking_temp: "temperature",
+    SensorRoleName.env_temp: "temperature",
+    SensorRoleName.humidity: "humidity",
+}
+
+
+def _epoch(db: Session, col):
+    """Seconds since the epoch computed in SQL, so rows are not parsed into datetimes."""
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(func.extract("epoch", col), Float)
+    # SQLite keeps naive UTC timestamps as text
+    return (func.julianday(col) - 2440587.5) * 86400.0
+
+
+def _mapped_sensors(db: Session, slugs: list[str] | None, roles: list[SensorRoleName] | None) -> list[tuple]:
+    """(sensor_id, terrarium slug, role, entity_id, unit) for every role mapping that has a sensor."""
+    q = (
+        select(Sensor.id, Terrarium.slug, SensorRole.role, SensorRole.entity_id, Sensor.unit, Sensor.sensor_type)
+        .join(Terrarium, Terrarium.id == SensorRole.terrarium_id)
+        .join(Sensor, and_(Sensor.terrarium_id == SensorRole.terrarium_id, Sensor.entity_id == SensorRole.entity_id))
+        .order_by(Terrarium.slug, SensorRole.role)
+    )
+    if slugs:
+        q = q.where(Terrarium.slug.in_(slugs))
+    if roles:
+        q = q.where(SensorRole.role.in_(roles))
+    return [
+        (sid, slug, role, eid, unit)
+        for sid, slug, role, eid, unit, sensor_type in db.execute(q)
+        if ROLE_SENSOR_TYPE[role] == sensor_type
+    ]
+
+
+def _series(db: Session, sensor_ids: list[int], start: datetime, end: datetime) -> tuple[np.ndarray, ...]:
+    """
+    Float arrays of sensor_id, value, ts and last confirmation, ordered by sensor
+    and ts. Includes each sensor's rows that may still hold at `start`.
+    """
+    lookback = start.timestamp() - settings.deadband_max_silence_s - settings.stats_max_hold_s
+    ts = _epoch(db, Reading.ts)
+    confirmed = _epoch(db, func.coalesce(Reading.ts_end, Reading.ts))
+    # Core execution: plain rows, no ORM entities
+    rows = db.connection().execute(
+        select(Reading.sensor_id, Reading.value, ts, confirmed)
+        .where(Reading.sensor_id.in_(sensor_ids),
+               Reading.ts >= datetime.fromtimestamp(lookback, start.tzinfo),
+               Reading.ts < end)
+        .order_by(Reading.sensor_id, Reading.ts)
+    ).all()
+    # one array per column rather than one tuple per row
+    n = len(rows)
+    return (
+        np.fromiter(map(itemgetter(0), rows), dtype=np.float64, count=n),
+        np.array(list(map(itemgetter(1), rows)), dtype=np.float64),     # None (unavailable) becomes NaN
+        np.fromiter(map(itemgetter(2), rows), dtype=np.float64, count=n),
+        np.fromiter(map(itemgetter(3), rows), dtype=np.float64, count=n),
+    )
+
+
+def _weighted_percentiles(values: np.ndarray, weights: np.ndarray, qs) -> np.ndarray:
+    order = np.argsort(values, kind="stable")
+    v, cw = values[order], np.cumsum(weights[order])
+    return v[np.searchsorted(cw, np.asarray(qs, dtype=np.float64) / 100.0 * cw[-1], side="left").clip(0, len(v) - 1)]
+
+
+def _reduce(value: np.ndarray, dur: np.ndarray, band: tuple[float, float] | None) -> dict:
+    held = (dur > 0) & ~np.isnan(value)
+    v, w = value[held], dur[held]
+    out = {"covered_s": float(w.sum()), "min": None, "max": None, "mean": None, "std": None,
+           "percentiles": {str(p): None for p in PERCENTILES}, "in_band": None, "below_band": None, "above_band": None}
+    if not len(v):
+        return out
+    total = w.sum()
+    mean = float(np.dot(v, w) / total)
+    out.update(
+        min=float(v.min()),
+        max=float(v.max()),
+        mean=mean,
+        std=float(np.sqrt(np.dot((v - mean) ** 2, w) / total)),
+        percentiles={str(p): float(x) for p, x in zip(PERCENTILES, _weighted_percentiles(v, w, PERCENTILES))},
+    )
+    if band is not None:
+        low, high = band
+        out.update(
+            in_band=float(w[(v >= low) & (v <= high)].sum() / total),
+            below_band=float(w[v < low].sum() / total),
+            above_band=float(w[v > high].sum() / total),
+        )
+    return out
+
+
+def window_stats(db: Session, start: datetime, end: datetime, slugs: list[str] | None = None,
+                 roles: list[SensorRoleName] | None = None,
+                 band: tuple[float, float] | None = None) -> list[dict]:
+    """
+    Stats of every mapped role in [start, end). `band` overrides the configured
+    target band (TARGET_BANDS) of every role in the result.
+    """
+    sensors = _mapped_sensors(db, slugs, roles)
+    if not sensors:
+        return []
+    sid, value, ts, confirmed = _series(db, [s[0] for s in sensors], start, end)
+    t0, t1 = start.timestamp(), end.timestamp()
+
+    # a value holds until the next reading of its sensor (or the window end), capped after its last confirmation
+    last = np.ones(len(sid), dtype=bool)
+    last[:-1] = sid[1:] != sid[:-1]
+    nxt = np.empty_like(ts)
+    nxt[:-1] = ts[1:]
+    nxt[last] = t1
+    until = np.minimum(nxt, confirmed + settings.stats_max_hold_s)
+    dur = np.clip(np.minimum(until, t1) - np.maximum(ts, t0), 0, None)
+
+    ids = np.unique(sid)
+    starts = np.searchsorted(sid, ids, side="left")
+    ends = np.searchsorted(sid, ids, side="right")
+    spans = {int(i): (a, b) for i, a, b in zip(ids, starts, ends)}
+
+    out = []
+    for sensor_id, slug, role, entity_id, unit in sensors:
+        a, b = spans.get(sensor_id, (0, 0))
+        role_band = band or settings.target_bands.get(role.value)
+        stats = _reduce(value[a:b], dur[a:b], tuple(role_band) if role_band else None)
+        out.append({
+            "terrarium_slug": slug,
+            "role": role.value,
+            "entity_id": entity_id,
+            "unit": unit,
+            "samples": int(np.count_nonzero(ts[a:b] >= t0)),
+            "band": list(role_band) if role_band else None,
+            **stats,
+        })
+    return out
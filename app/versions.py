@@ -0,0 +1,82 @@
+# app/versions.py
+"""
+Write versions for conditional GETs.
+
+A global counter and one per terrarium are bumped after every committed ingest
+or role change (and for writes other workers announce on the event bus). The
+read endpoints derive their ETag from the version(s) they depend on, so a
+request whose If-None-Match still matches gets a 304 before any SQL runs or
+any body is serialized.
+
+Versions are per process and start over at boot; the ETag carries a boot nonce
+so a tag issued by another worker, or before a restart, never matches.
+"""
+from __future__ import annotations
+import threading
+import time
+import uuid
+from email.utils import formatdate
+
+from fastapi import Request, Response
+
+
+class DataVersions:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._nonce = uuid.uuid4().hex[:8]
+        self._epoch = 0
+        self._global = 0
+        self._global_at = time.time()
+        self._by_slug: dict[str, tuple[int, float]] = {}
+
+    def bump(self, slugs) -> None:
+        now = time.time()
+        with self._lock:
+            self._global += 1
+            self._global_at = now
+            for slug in set(slugs):
+                v, _at = self._by_slug.get(slug, (0, now))
+                self._by_slug[slug] = (v + 1, now)
+
+    def bump_all(self) -> None:
+        """A write that may touch any terrarium (retention): every ETag changes."""
+        with self._lock:
+            self._epoch += 1
+            self._global += 1
+            self._global_at = time.time()
+
+    def get(self, slug: str | None = None) -> tuple[int, float]:
+        """(version, unix time of the last bump); the global one without a slug."""
+        with self._lock:
+            if slug is None:
+                return self._global, self._global_at
+            # an unknown terrarium keeps version 0 until its first write
+            return self._by_slug.get(slug, (0, self._global_at))
+
+    def etag(self, slug: str | None = None, variant: str = "") -> tuple[str, float]:
+        """Weak ETag for the data of one terrarium (or all); `variant` tells representations apart."""
+        v, at = self.get(slug)
+        return f'W/"{self._nonce}.{self._epoch}-{v}{"-" + variant if variant else ""}"', at
+
+
+data_versions = DataVersions()
+
+
+def not_modified(request: Request, response: Response, etag: str, modified_at: float) -> Response | None:
+    """
+    Set ETag / Last-Modified on `response`; return a 304 to send instead when the
+    request's If-None-Match lists that ETag.
+    """
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(modified_at, usegmt=True),
+        # cached copies must be revalidated, which is what makes the 304s pay off
+        "Cache-Control": "no-cache",
+    }
+    response.headers.update(headers)
+    inm = request.headers.get("if-none-match")
+    if inm and (inm.strip() == "*" or etag in (t.strip() for t in inm.split(","))):
+        if "vary" in response.headers:
+            headers["Vary"] = response.headers["vary"]
+        return Response(status_code=304, headers=headers)
+    return None
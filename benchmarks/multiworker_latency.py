@@ -0,0 +1,161 @@
+"""
+Ingest-to-dashboard latency with several uvicorn workers.
+
+Starts `uvicorn app.main:app --workers N` against a throw-away SQLite file,
+opens several /sse/summary/delta streams (the kernel spreads them over the
+workers), then POSTs basking temperatures with unique values to
+/api/v1/ingest one at a time. For every POST it records, per stream, how long
+it took until a delta carrying that value arrived, or that it never did.
+
+    EVENT_BUS_BACKEND=memory  -> only streams on the worker that took the POST update
+    EVENT_BUS_BACKEND=shared  -> every stream updates (Unix-socket broker on SQLite)
+
+    python -m benchmarks.multiworker_latency --backend memory
+    python -m benchmarks.multiworker_latency --backend shared
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _parse() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--backend", default="shared", help="EVENT_BUS_BACKEND for the workers")
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--streams", type=int, default=6, help="concurrent SSE delta clients")
+    ap.add_argument("--posts", type=int, default=50)
+    ap.add_argument("--wait", type=float, default=2.0, help="seconds to wait for each value before counting it missing")
+    return ap.parse_args()
+
+
+def _pct(xs: list[float], p: float) -> float:
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _measure(base: str, args: argparse.Namespace) -> dict:
+    import httpx
+
+    # value -> per-stream arrival time
+    seen: list[dict[str, float]] = [{} for _ in range(args.streams)]
+    ready = [asyncio.Event() for _ in range(args.streams)]
+
+    async def stream(i: int, client: httpx.AsyncClient) -> None:
+        async with client.stream("GET", f"{base}/sse/summary/delta") as r:
+            async for line in r.aiter_lines():
+                if line.startswith("event:"):
+                    ready[i].set()
+                if line.startswith("data:") and "°C" in line:
+                    seen[i][line.split("°C")[0].split()[-1]] = time.perf_counter()
+
+    latencies: list[float] = []
+    missing = 0
+    limits = httpx.Limits(max_connections=args.streams + 4)
+    # one connection per stream, so the kernel can hand them to different workers
+    clients = [httpx.AsyncClient(timeout=None, limits=limits) for _ in range(args.streams)]
+    tasks = [asyncio.create_task(stream(i, c)) for i, c in enumerate(clients)]
+    try:
+        await asyncio.wait_for(asyncio.gather(*(e.wait() for e in ready)), 10)
+        async with httpx.AsyncClient(timeout=30) as poster:
+            for n in range(args.posts):
+                value = 1000 + n
+                key = f"{value:.1f}"
+                t0 = time.perf_counter()
+                r = await poster.post(f"{base}/api/v1/ingest", json={
+                    "terrarium_slug": "bench", "sensor_type": "temperature", "value": value, "unit": "°C",
+                    "entity_id": "sensor.bask", "role": "basking_temp",
+                    "ts": datetime.now(timezone.utc).isoformat(),
+                })
+                r.raise_for_status()
+                deadline = t0 + args.wait
+                while time.perf_counter() < deadline and not all(key in s for s in seen):
+                    await asyncio.sleep(0.005)
+                for s in seen:
+                    if key in s:
+                        latencies.append(s[key] - t0)
+                    else:
+                        missing += 1
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for c in clients:
+            await c.aclose()
+
+    ms = [x * 1000 for x in latencies]
+    return {
+        "backend": args.backend,
+        "workers": args.workers,
+        "streams": args.streams,
+        "posts": args.posts,
+        "delivered": len(ms),
+        "missing": missing,
+        "p50_ms": round(_pct(ms, 50), 2),
+        "p99_ms": round(_pct(ms, 99), 2),
+        "max_ms": round(max(ms, default=0.0), 2),
+        "mean_ms": round(statistics.fmean(ms), 2) if ms else 0.0,
+    }
+
+
+def main() -> None:
+    args = _parse()
+    tmp = tempfile.mkdtemp(prefix="reptile-bench-")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+        EVENT_BUS_BACKEND=args.backend,
+        EVENT_BUS_SOCKET=os.path.join(tmp, "events.sock"),
+        SSE_DEBOUNCE_MS="0",
+    )
+    env.setdefault("REPTILE_API_KEY", "bench")
+    # create the schema once, before the workers race for it
+    subprocess.run([sys.executable, "-c", "from app.database import init_db; init_db()"], cwd=ROOT, env=env, check=True)
+
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        import httpx
+        deadline = time.time() + 30
+        while True:
+            try:
+                httpx.get(f"{base}/health", timeout=1)
+                break
+            except httpx.HTTPError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.2)
+        time.sleep(1.0)     # let every worker finish its startup
+        result = asyncio.run(_measure(base, args))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=15)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
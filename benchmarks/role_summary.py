@@ -0,0 +1,132 @@
+"""
+crud.role_summary: statement count and latency on a large seeded SQLite file.
+
+Seeds --rows readings spread over --terrariums terrariums (4 mapped entities
+each), then compares the set-based crud.role_summary against the old N+1
+version (one sensor_roles query per terrarium plus one ORDER BY ts DESC LIMIT 1
+per mapped role), with and without ix_readings_sensor_ts.
+
+    python -m benchmarks.role_summary --rows 2000000
+    python -m benchmarks.role_summary --rows 50000 --check   # exit 1 if role_summary issues >1 statement
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+ROLES = [("basking_temp", "temperature", "°C"), ("env_temp", "temperature", "°C"), ("humidity", "humidity", "%")]
+
+
+def _parse() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=2_000_000)
+    ap.add_argument("--terrariums", type=int, default=10)
+    ap.add_argument("--repeat", type=int, default=5, help="timed calls per variant (best is reported)")
+    ap.add_argument("--check", action="store_true", help="fail unless role_summary runs exactly one statement")
+    return ap.parse_args()
+
+
+def _seed(path: str, rows: int, terrariums: int) -> None:
+    con = sqlite3.connect(path)
+    con.executemany("INSERT INTO terrariums (id, slug) VALUES (?, ?)", [(t, f"terr-{t}") for t in range(1, terrariums + 1)])
+    con.executemany(
+        "INSERT INTO sensor_roles (terrarium_id, role, entity_id) VALUES (?, ?, ?)",
+        [(t, role, f"sensor.t{t}_{role}") for t in range(1, terrariums + 1) for role, _, _ in ROLES],
+    )
+    # 4 entities per terrarium: the three mapped roles plus one unmapped sensor
+    entities = [(t, f"sensor.t{t}_{role}", st, unit) for t in range(1, terrariums + 1) for role, st, unit in ROLES]
+    entities += [(t, f"sensor.t{t}_spare", "temperature", "°C") for t in range(1, terrariums + 1)]
+    start = datetime.now(timezone.utc) - timedelta(seconds=30 * rows // len(entities))
+    con.executemany(
+        "INSERT INTO sensors (id, terrarium_id, entity_id, sensor_type, unit, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(n, *e, start.strftime("%Y-%m-%d %H:%M:%S.%f"), start.strftime("%Y-%m-%d %H:%M:%S.%f"))
+         for n, e in enumerate(entities, 1)],
+    )
+    con.executemany(
+        "INSERT INTO readings (sensor_id, value, ts) VALUES (?, ?, ?)",
+        (
+            (i % len(entities) + 1, 20 + (i % 97) / 10,
+             (start + timedelta(seconds=30 * (i // len(entities)))).strftime("%Y-%m-%d %H:%M:%S.%f"))
+            for i in range(rows)
+        ),
+    )
+    con.commit()
+    con.execute("ANALYZE")
+    con.close()
+
+
+def legacy_role_summary(db):
+    """The pre-set-based implementation, kept here as the baseline."""
+    from sqlalchemy import select
+    from app.models import Terrarium, Sensor, Reading, SensorRole
+    out = []
+    for t in db.execute(select(Terrarium)).scalars().all():
+        role_map = {r.role: r.entity_id for r in db.execute(select(SensorRole).where(SensorRole.terrarium_id == t.id)).scalars().all()}
+        item = {"terrarium_slug": t.slug}
+        for role, eid in role_map.items():
+            r = db.execute(
+                select(Reading).join(Sensor, Sensor.id == Reading.sensor_id)
+                .where(Sensor.terrarium_id == t.id, Sensor.entity_id == eid)
+                .order_by(Reading.ts.desc()).limit(1)
+            ).scalar_one_or_none()
+            item[role.value] = r.value if r else None
+        out.append(item)
+    return out
+
+
+def main() -> None:
+    args = _parse()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, root)
+    path = os.path.join(tempfile.mkdtemp(prefix="reptile-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("REPTILE_API_KEY", "bench")
+
+    from sqlalchemy import event, text
+    from app.database import SessionLocal, engine, init_db
+    from app import crud
+
+    init_db()
+    t0 = time.perf_counter()
+    _seed(path, args.rows, args.terrariums)
+    seed_s = time.perf_counter() - t0
+
+    statements = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(*_a, **_kw):
+        nonlocal statements
+        statements += 1
+
+    def run(fn):
+        nonlocal statements
+        best = float("inf")
+        for _ in range(args.repeat):
+            with SessionLocal() as db:
+                statements = 0
+                t = time.perf_counter()
+                fn(db)
+                best = min(best, time.perf_counter() - t)
+        return {"statements": statements, "best_ms": round(best * 1000, 2)}
+
+    result = {"rows": args.rows, "terrariums": args.terrariums, "seed_s": round(seed_s, 1)}
+    result["set_based_indexed"] = run(crud.role_summary)
+    result["legacy_indexed"] = run(legacy_role_summary)
+    with engine.begin() as con:
+        con.execute(text("DROP INDEX ix_readings_sensor_ts"))
+        con.execute(text("CREATE INDEX ix_readings_sensor_id ON readings (sensor_id)"))
+    result["legacy_unindexed"] = run(legacy_role_summary)
+    print(json.dumps(result, indent=2))
+
+    if args.check and result["set_based_indexed"]["statements"] != 1:
+        sys.exit(f"role_summary issued {result['set_based_indexed']['statements']} statements, expected 1")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Read throughput while ingest is running: SQLITE_MODE=shared against SQLITE_MODE=wal.
+
+Seeds one SQLite file (benchmarks.suite's generator), then for each mode starts
+a local uvicorn on a copy of it and runs, for --seconds each:
+
+- reads alone: --readers clients looping over /api/v1/readings (720 h, hourly
+  rollups) and /api/v1/readings/compression (24 h) for random terrariums;
+  both spend their time in SQLite rather than in JSON encoding;
+- reads during ingest: the same readers while --writers clients POST
+  /api/v1/ingest/batch with --batch readings each, paced to --rate rows per
+  second in total (--rate 0: back to back).
+
+Reports requests per second and p50/p99 for both phases, ingested rows per
+second, and failed requests, as JSON.
+
+    python -m benchmarks.sqlite_concurrency --terrariums 20 --days 3
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from .suite import ROOT, ROLES, _free_port, _latency
+
+MODES = ("shared", "wal")
+
+
+def _parse() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--terrariums", type=int, default=20)
+    ap.add_argument("--sensors", type=int, default=4)
+    ap.add_argument("--days", type=float, default=3)
+    ap.add_argument("--interval", type=int, default=30)
+    ap.add_argument("--readers", type=int, default=8)
+    ap.add_argument("--writers", type=int, default=2)
+    ap.add_argument("--batch", type=int, default=50, help="readings per ingest POST")
+    ap.add_argument("--rate", type=float, default=200, help="target ingested rows per second (0: as fast as possible)")
+    ap.add_argument("--seconds", type=float, default=10, help="per phase")
+    return ap.parse_args()
+
+
+async def _phase(base: str, args: argparse.Namespace, ingest: bool) -> dict:
+    import httpx
+    stop = time.perf_counter() + args.seconds
+    reads: list[float] = []
+    rows = errors = 0
+
+    async def reader(client: httpx.AsyncClient) -> None:
+        nonlocal errors
+        while time.perf_counter() < stop:
+            t = random.randint(1, args.terrariums)
+            path = random.choice((f"/api/v1/readings?terrarium=terr-{t}&hours=720&resolution=1h",
+                                  f"/api/v1/readings/compression?terrarium=terr-{t}&hours=24"))
+            t0 = time.perf_counter()
+            try:
+                r = await client.get(base + path)
+            except httpx.HTTPError:
+                # shared mode: concurrent requests on its one connection can break it
+                errors += 1
+                continue
+            reads.append(time.perf_counter() - t0)
+            errors += r.status_code >= 400
+
+    async def writer(client: httpx.AsyncClient) -> None:
+        nonlocal rows, errors
+        # each writer sends its share of --rate
+        every = args.batch * args.writers / args.rate if args.rate else 0.0
+        nxt = time.perf_counter()
+        while time.perf_counter() < stop:
+            nxt += every
+            await asyncio.sleep(max(0.0, nxt - time.perf_counter()))
+            now = datetime.now(timezone.utc).isoformat()
+            batch = []
+            for _ in range(args.batch):
+                t = random.randint(1, args.terrariums)
+                role, st, unit, mid, _a = random.choice(ROLES)
+                batch.append({"terrarium_slug": f"terr-{t}", "sensor_type": st, "unit": unit, "ts": now,
+                              "entity_id": f"sensor.t{t}_{role}", "value": round(mid + random.uniform(-1, 1), 2)})
+            try:
+                r = await client.post(f"{base}/api/v1/ingest/batch", json=batch)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            if r.status_code < 400:
+                rows += len(batch)
+            else:
+                errors += 1
+
+    async with httpx.AsyncClient(timeout=60, headers={"X-API-Key": os.environ["REPTILE_API_KEY"]},
+                                 limits=httpx.Limits(max_connections=args.readers + args.writers + 2)) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(reader(client) for _ in range(args.readers)),
+                             *(writer(client) for _ in range(args.writers if ingest else 0)))
+        wall = time.perf_counter() - t0
+    out = {"reads_per_s": round(len(reads) / wall, 1), "errors": errors, **_latency(reads)}
+    if ingest:
+        out["ingested_rows_per_s"] = round(rows / wall, 1)
+    return out
+
+
+def _serve(path: str, mode: str, args: argparse.Namespace) -> dict:
+    import httpx
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", SQLITE_MODE=mode)
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 120
+        while True:
+            try:
+                httpx.get(f"{base}/health", timeout=1)
+                break
+            except httpx.HTTPError:
+                if time.time() > deadline or proc.poll() is not None:
+                    raise
+                time.sleep(0.2)
+        return {
+            "reads_only": asyncio.run(_phase(base, args, ingest=False)),
+            "reads_during_ingest": asyncio.run(_phase(base, args, ingest=True)),
+        }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=15)
+
+
+def main() -> None:
+    args = _parse()
+    sys.path.insert(0, ROOT)
+    tmp = tempfile.mkdtemp(prefix="reptile-bench-")
+    seed_path = os.path.join(tmp, "seed.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{seed_path}"
+    os.environ["SQLITE_MODE"] = "shared"        # keep the seed file in rollback-journal mode; each run sets its own
+    os.environ.setdefault("REPTILE_API_KEY", "bench")
+
+    from app.database import engine, init_db
+    from .suite import _seed
+    init_db()
+    seed = _seed(argparse.Namespace(terrariums=args.terrariums, sensors=args.sensors, days=args.days,
+                                    interval=args.interval), datetime.now(timezone.utc))
+    engine.dispose()
+
+    report = {"seed": seed, "params": vars(args), "cpus": os.cpu_count()}
+    for mode in MODES:
+        path = os.path.join(tmp, f"{mode}.db")
+        shutil.copy(seed_path, path)
+        report[mode] = _serve(path, mode, args)
+    during = {m: report[m]["reads_during_ingest"]["reads_per_s"] for m in MODES}
+    report["wal_read_speedup_during_ingest"] = round(during["wal"] / during["shared"], 2) if during["shared"] else None
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+SSE heartbeat jitter under concurrent ingest.
+
+Starts the app on a local uvicorn server against a throw-away SQLite file,
+keeps one /sse/summary stream open with a short heartbeat, hammers
+/api/v1/ingest from several concurrent clients and records:
+
+- the gaps between SSE frames seen by the stream (with a heartbeat of H
+  seconds, any gap much larger than H means the event loop was stalled)
+- the latency of GET /health, which does no DB work at all
+
+Run it twice to compare the blocking and executor-backed DB paths:
+
+    python -m benchmarks.sse_jitter --inline   # DB calls run on the event loop (old behaviour)
+    python -m benchmarks.sse_jitter            # DB calls run on database.db_executor
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+
+def _parse() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--seed-rows", type=int, default=200_000, help="history rows to seed before measuring")
+    ap.add_argument("--clients", type=int, default=8, help="concurrent ingest clients")
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    ap.add_argument("--heartbeat", type=float, default=0.1, help="SSE heartbeat interval (s)")
+    ap.add_argument("--inline", action="store_true", help="run DB calls on the event loop, as before the executor")
+    return ap.parse_args()
+
+
+def _pct(xs: list[float], p: float) -> float:
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))]
+
+
+def _summary(xs: list[float]) -> dict:
+    ms = [x * 1000 for x in xs]
+    return {
+        "n": len(ms),
+        "p50_ms": round(_pct(ms, 50), 2),
+        "p99_ms": round(_pct(ms, 99), 2),
+        "max_ms": round(max(ms, default=0.0), 2),
+        "mean_ms": round(statistics.fmean(ms), 2) if ms else 0.0,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _seed(db_path: str, rows: int) -> None:
+    import sqlite3
+    from app.database import init_db
+    init_db()
+    con = sqlite3.connect(db_path)
+    con.execute("INSERT INTO terrariums (slug) VALUES ('bench')")
+    con.executemany(
+        "INSERT INTO sensor_roles (terrarium_id, role, entity_id) VALUES (1, ?, ?)",
+        [("basking_temp", "sensor.bask"), ("env_temp", "sensor.env"), ("humidity", "sensor.hum")],
+    )
+    start = datetime.now(timezone.utc) - timedelta(seconds=30 * rows)
+    entities = [("temperature", "sensor.bask", "°C"), ("temperature", "sensor.env", "°C"), ("humidity", "sensor.hum", "%")]
+    con.executemany(
+        "INSERT INTO sensors (id, terrarium_id, sensor_type, entity_id, unit, first_seen, last_seen) VALUES (?, 1, ?, ?, ?, ?, ?)",
+        [(n, *e, start.isoformat(sep=" "), start.isoformat(sep=" ")) for n, e in enumerate(entities, 1)],
+    )
+    con.executemany(
+        "INSERT INTO readings (sensor_id, value, ts) VALUES (?, ?, ?)",
+        (
+            (i % 3 + 1, 20 + (i % 100) / 10, (start + timedelta(seconds=30 * i)).isoformat(sep=" "))
+            for i in range(rows)
+        ),
+    )
+    con.commit()
+    con.close()
+
+
+async def _measure(base: str, args: argparse.Namespace) -> dict:
+    import httpx
+
+    gaps: list[float] = []
+    health: list[float] = []
+    ingested = 0
+    stop = asyncio.Event()
+
+    async def sse_reader(client: httpx.AsyncClient) -> None:
+        last = None
+        async with client.stream("GET", f"{base}/sse/summary") as r:
+            async for line in r.aiter_lines():
+                if line == "":          # end of one SSE frame
+                    now = time.perf_counter()
+                    if last is not None and not stop.is_set():
+                        gaps.append(now - last)
+                    last = now
+                if stop.is_set():
+                    return
+
+    async def ingester(client: httpx.AsyncClient) -> None:
+        nonlocal ingested
+        i = 0
+        while not stop.is_set():
+            i += 1
+            await client.post(f"{base}/api/v1/ingest", json={
+                "terrarium_slug": "bench", "sensor_type": "temperature", "value": 20 + i % 10,
+                "unit": "°C", "entity_id": "sensor.bask", "ts": datetime.now(timezone.utc).isoformat(),
+            })
+            ingested += 1
+
+    async def prober(client: httpx.AsyncClient) -> None:
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            await client.get(f"{base}/health")
+            health.append(time.perf_counter() - t0)
+            await asyncio.sleep(0.05)
+
+    limits = httpx.Limits(max_connections=args.clients + 4)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        reader = asyncio.create_task(sse_reader(client))
+        await asyncio.sleep(1.0)          # let the initial render land
+        gaps.clear()
+        t0 = time.perf_counter()
+        tasks = [asyncio.create_task(ingester(client)) for _ in range(args.clients)]
+        tasks.append(asyncio.create_task(prober(client)))
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - t0
+        reader.cancel()
+        try:
+            await reader
+        except (asyncio.CancelledError, Exception):
+            pass
+
+    return {
+        "mode": "inline" if args.inline else "executor",
+        "heartbeat_s": args.heartbeat,
+        "seed_rows": args.seed_rows,
+        "clients": args.clients,
+        "ingest_per_s": round(ingested / elapsed, 1),
+        "sse_frame_gap": _summary(gaps),
+        "health_latency": _summary(health),
+    }
+
+
+def main() -> None:
+    args = _parse()
+    tmp = tempfile.mkdtemp(prefix="reptile-bench-")
+    db_path = os.path.join(tmp, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("REPTILE_API_KEY", "bench")
+    os.environ["SSE_HEARTBEAT_S"] = str(args.heartbeat)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    import uvicorn
+    # streams cut off at shutdown make asyncio log every failed send
+    logging.getLogger("asyncio").setLevel(logging.CRITICAL)
+    _seed(db_path, args.seed_rows)
+    from app.main import app
+    if args.inline:
+        from app import acrud, database
+
+        async def run_inline(fn, *a, **kw):
+            with database.SessionLocal() as db:
+                return fn(db, *a, **kw)
+        acrud.run_db = run_inline
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    th = threading.Thread(target=server.run, daemon=True)
+    th.start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        result = asyncio.run(_measure(f"http://127.0.0.1:{port}", args))
+    finally:
+        server.should_exit = True
+        th.join(timeout=10)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
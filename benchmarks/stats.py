@@ -0,0 +1,137 @@
+"""
+stats.window_stats over a 30-day window on a seeded SQLite file.
+
+Seeds --terrariums terrariums with the three mapped roles plus one unmapped
+sensor each, one reading per sensor every --interval seconds for --days days,
+then times the NumPy implementation against a straightforward baseline that
+loads ORM Reading objects and loops over them in Python.
+
+    python -m benchmarks.stats --days 30 --terrariums 10
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+ROLES = [("basking_temp", "temperature", "°C", 35.0, 4.0), ("env_temp", "temperature", "°C", 27.0, 3.0),
+         ("humidity", "humidity", "%", 55.0, 15.0)]
+
+
+def _parse() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--days", type=int, default=30)
+    ap.add_argument("--terrariums", type=int, default=10)
+    ap.add_argument("--interval", type=int, default=60, help="seconds between readings of a sensor")
+    ap.add_argument("--repeat", type=int, default=3, help="timed calls per variant (best is reported)")
+    return ap.parse_args()
+
+
+def _seed(path: str, days: int, terrariums: int, interval: int, end: datetime) -> int:
+    con = sqlite3.connect(path)
+    con.executemany("INSERT INTO terrariums (id, slug) VALUES (?, ?)", [(t, f"terr-{t}") for t in range(1, terrariums + 1)])
+    con.executemany(
+        "INSERT INTO sensor_roles (terrarium_id, role, entity_id) VALUES (?, ?, ?)",
+        [(t, role, f"sensor.t{t}_{role}") for t in range(1, terrariums + 1) for role, *_ in ROLES],
+    )
+    entities = [(t, f"sensor.t{t}_{role}", st, unit, mid, amp) for t in range(1, terrariums + 1)
+                for role, st, unit, mid, amp in ROLES]
+    entities += [(t, f"sensor.t{t}_spare", "temperature", "°C", 25.0, 1.0) for t in range(1, terrariums + 1)]
+    start = end - timedelta(days=days)
+    fmt = "%Y-%m-%d %H:%M:%S.%f"
+    con.executemany(
+        "INSERT INTO sensors (id, terrarium_id, entity_id, sensor_type, unit, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(n, t, eid, st, unit, start.strftime(fmt), end.strftime(fmt)) for n, (t, eid, st, unit, _m, _a) in enumerate(entities, 1)],
+    )
+    steps = days * 86400 // interval
+    # a daily cycle, so values cross the target bands
+    con.executemany(
+        "INSERT INTO readings (sensor_id, value, ts) VALUES (?, ?, ?)",
+        (
+            (n, round(mid + amp * math.sin(2 * math.pi * i * interval / 86400), 2),
+             (start + timedelta(seconds=i * interval)).strftime(fmt))
+            for i in range(steps)
+            for n, (_t, _e, _s, _u, mid, amp) in enumerate(entities, 1)
+        ),
+    )
+    con.commit()
+    con.execute("ANALYZE")
+    con.close()
+    return steps * len(entities)
+
+
+def orm_loop_stats(db, start: datetime, end: datetime) -> list[dict]:
+    """Baseline: ORM rows per role, durations and band time summed in a Python loop."""
+    from sqlalchemy import select
+    from app.config import settings
+    from app.models import Terrarium, Sensor, Reading, SensorRole
+    from app.state import as_utc
+    out = []
+    for role in db.execute(select(SensorRole)).scalars().all():
+        sensor = db.execute(select(Sensor).where(Sensor.terrarium_id == role.terrarium_id,
+                                                 Sensor.entity_id == role.entity_id)).scalar_one_or_none()
+        if sensor is None:
+            continue
+        rows = db.execute(select(Reading).where(Reading.sensor_id == sensor.id, Reading.ts >= start, Reading.ts < end)
+                          .order_by(Reading.ts)).scalars().all()
+        low, high = settings.target_bands[role.role.value]
+        total = inside = acc = 0.0
+        values = []
+        for r, nxt in zip(rows, rows[1:] + [None]):
+            d = ((as_utc(nxt.ts) if nxt else end) - as_utc(r.ts)).total_seconds()
+            total += d
+            acc += r.value * d
+            inside += d if low <= r.value <= high else 0.0
+            values.append(r.value)
+        out.append({"terrarium": db.get(Terrarium, role.terrarium_id).slug, "role": role.role.value,
+                    "mean": acc / total if total else None, "in_band": inside / total if total else None,
+                    "min": min(values, default=None), "max": max(values, default=None)})
+    return out
+
+
+def main() -> None:
+    args = _parse()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, root)
+    path = os.path.join(tempfile.mkdtemp(prefix="reptile-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("REPTILE_API_KEY", "bench")
+
+    from app.database import SessionLocal, init_db
+    from app.stats import window_stats
+
+    init_db()
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=args.days)
+    t0 = time.perf_counter()
+    rows = _seed(path, args.days, args.terrariums, args.interval, end)
+    seed_s = time.perf_counter() - t0
+
+    def run(fn):
+        best, res = float("inf"), None
+        for _ in range(args.repeat):
+            with SessionLocal() as db:
+                t = time.perf_counter()
+                res = fn(db, start, end)
+                best = min(best, time.perf_counter() - t)
+        return res, round(best * 1000, 1)
+
+    fast, fast_ms = run(window_stats)
+    slow, slow_ms = run(orm_loop_stats)
+    baseline = {(r["terrarium"], r["role"]): r for r in slow}
+    worst = max(abs(r["in_band"] - baseline[(r["terrarium_slug"], r["role"])]["in_band"]) for r in fast)
+    print(json.dumps({
+        "rows": rows, "days": args.days, "terrariums": args.terrariums, "seed_s": round(seed_s, 1),
+        "numpy_ms": fast_ms, "orm_loop_ms": slow_ms, "speedup": round(slow_ms / fast_ms, 1),
+        "max_in_band_diff": round(worst, 6),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
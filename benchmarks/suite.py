@@ -0,0 +1,363 @@
+"""
+Load test and benchmark suite: one JSON report per run, comparable across commits.
+
+Seeds a database with --terrariums terrariums of --sensors sensors each (the
+three mapped roles, then unmapped spares), one reading per sensor every
+--interval seconds for --days days, plus the minute and hour rollups ingest
+would have written. Then it starts a local uvicorn against it and measures:
+
+- ingest: throughput and p50/p99 latency of single-reading POSTs to
+  /api/v1/ingest, --concurrency at a time;
+- read latency of /api/v1/summary, /api/v1/summary/roles and /api/v1/readings
+  over 24 h and 720 h, raw and resolution=auto (no If-None-Match, so every
+  request does the work);
+- crud.role_summary, called in-process on the seeded database;
+- SSE fan-out: time from an ingest POST until each of --subscribers
+  /sse/summary/delta streams has the new value, and how many never got it.
+
+SQLite in a temporary directory by default; pass --database-url for Postgres
+(an empty database; the schema is created). Everything runs on 127.0.0.1.
+
+    python -m benchmarks.suite --out bench.json
+    python -m benchmarks.suite --days 365 --out year.json      # 50 x 4 x 1 year at 30 s: 210M rows
+    python -m benchmarks.suite --baseline bench.json           # adds p50/p99 ratios against an older report
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROLES = [("basking_temp", "temperature", "°C", 35.0, 4.0), ("env_temp", "temperature", "°C", 27.0, 3.0),
+         ("humidity", "humidity", "%", 55.0, 15.0)]
+SPARE = ("spare", "temperature", "°C", 25.0, 1.0)
+CHUNK = 50_000
+
+
+def _parse() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--database-url", help="seed and serve this database instead of a temporary SQLite file")
+    ap.add_argument("--terrariums", type=int, default=50)
+    ap.add_argument("--sensors", type=int, default=4, help="per terrarium; the first three are role-mapped")
+    ap.add_argument("--days", type=float, default=7, help="history to seed")
+    ap.add_argument("--interval", type=int, default=30, help="seconds between readings of a sensor")
+    ap.add_argument("--ingest", type=int, default=2000, help="POSTs for the ingest measurement")
+    ap.add_argument("--concurrency", type=int, default=8, help="ingest POSTs in flight")
+    ap.add_argument("--requests", type=int, default=50, help="GETs per read endpoint")
+    ap.add_argument("--subscribers", type=int, default=20, help="SSE streams for the fan-out measurement")
+    ap.add_argument("--sse-posts", type=int, default=30)
+    ap.add_argument("--out", help="also write the report to this file")
+    ap.add_argument("--baseline", help="earlier report to compare p50/p99 against")
+    return ap.parse_args()
+
+
+def _pct(xs: list[float], p: float) -> float:
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))]
+
+
+def _latency(seconds: list[float]) -> dict:
+    ms = [s * 1000 for s in seconds]
+    return {
+        "n": len(ms),
+        "p50_ms": round(_pct(ms, 50), 2),
+        "p99_ms": round(_pct(ms, 99), 2),
+        "mean_ms": round(statistics.fmean(ms), 2) if ms else 0.0,
+        "max_ms": round(max(ms, default=0.0), 2),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no", "app"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return out.stdout.strip() + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ---- seeding ----
+
+def _seed(args: argparse.Namespace, end: datetime) -> dict:
+    from sqlalchemy import insert, select, func
+    from app.database import engine
+    from app.models import Terrarium, Sensor, Reading, ReadingRollup, SensorRole
+
+    kinds = ROLES[:args.sensors] + [SPARE] * max(0, args.sensors - len(ROLES))
+    start = end - timedelta(days=args.days)
+    steps = int(args.days * 86400 // args.interval)
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        if conn.scalar(select(func.count()).select_from(Terrarium)):
+            raise SystemExit("the database already has terrariums; give an empty one")
+        conn.execute(insert(Terrarium), [{"slug": f"terr-{t}"} for t in range(1, args.terrariums + 1)])
+        terrs = dict(conn.execute(select(Terrarium.slug, Terrarium.id)).all())
+        sensors = []        # (terrarium_id, entity_id, sensor_type, unit, mid, amp)
+        for t in range(1, args.terrariums + 1):
+            for n, (role, st, unit, mid, amp) in enumerate(kinds):
+                sensors.append((terrs[f"terr-{t}"], f"sensor.t{t}_{role}{n if role == 'spare' else ''}", st, unit, mid, amp))
+        conn.execute(insert(Sensor), [
+            {"terrarium_id": tid, "entity_id": eid, "sensor_type": st, "unit": unit, "first_seen": start, "last_seen": end}
+            for tid, eid, st, unit, _m, _a in sensors
+        ])
+        conn.execute(insert(SensorRole), [
+            {"terrarium_id": tid, "role": role, "entity_id": eid}
+            for (tid, eid, *_), (role, *_r) in zip(sensors, kinds * args.terrariums) if role != "spare"
+        ])
+        ids = {(tid, eid): sid for sid, tid, eid in conn.execute(select(Sensor.id, Sensor.terrarium_id, Sensor.entity_id))}
+
+    readings = rollups = 0
+    with engine.begin() as conn:
+        for tid, eid, st, unit, mid, amp in sensors:
+            sid = ids[(tid, eid)]
+            phase = random.random() * 2 * math.pi
+            rows, minutes, hours = [], {}, {}
+            for i in range(steps):
+                ts = start + timedelta(seconds=i * args.interval)
+                # a daily cycle with a little noise, so the deadband and the bands see realistic data
+                value = round(mid + amp * math.sin(2 * math.pi * i * args.interval / 86400 + phase) + random.gauss(0, 0.05), 2)
+                rows.append({"sensor_id": sid, "value": value, "ts": ts})
+                for buckets, b in ((minutes, ts.replace(second=0, microsecond=0)),
+                                   (hours, ts.replace(minute=0, second=0, microsecond=0))):
+                    agg = buckets.get(b)
+                    buckets[b] = [1, value, value, value] if agg is None else \
+                        [agg[0] + 1, agg[1] + value, min(agg[2], value), max(agg[3], value)]
+                if len(rows) >= CHUNK:
+                    conn.execute(insert(Reading), rows)
+                    readings += len(rows)
+                    rows = []
+            if rows:
+                conn.execute(insert(Reading), rows)
+                readings += len(rows)
+            agg_rows = [
+                {"resolution": res, "terrarium_id": tid, "sensor_type": st, "entity_id": eid, "bucket": b, "unit": unit,
+                 "count": c, "sum": s, "min": lo, "max": hi}
+                for res, buckets in (("1m", minutes), ("1h", hours)) for b, (c, s, lo, hi) in buckets.items()
+            ]
+            for i in range(0, len(agg_rows), CHUNK):
+                conn.execute(insert(ReadingRollup), agg_rows[i:i + CHUNK])
+            rollups += len(agg_rows)
+        if engine.dialect.name == "sqlite":
+            conn.exec_driver_sql("ANALYZE")
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("ANALYZE")
+    return {"readings": readings, "rollups": rollups, "sensors": len(sensors), "seed_s": round(time.perf_counter() - t0, 1)}
+
+
+# ---- measurements ----
+
+async def _ingest(base: str, args: argparse.Namespace) -> dict:
+    import httpx
+    latencies: list[float] = []
+    errors = 0
+    todo = iter(range(args.ingest))
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal errors
+        for _ in todo:
+            t = random.randint(1, args.terrariums)
+            role, st, unit, mid, _a = ROLES[random.randrange(min(3, args.sensors))]
+            t0 = time.perf_counter()
+            r = await client.post(f"{base}/api/v1/ingest", json={
+                "terrarium_slug": f"terr-{t}", "sensor_type": st, "value": round(mid + random.uniform(-1, 1), 2),
+                "unit": unit, "entity_id": f"sensor.t{t}_{role}", "ts": datetime.now(timezone.utc).isoformat(),
+            })
+            latencies.append(time.perf_counter() - t0)
+            errors += r.status_code >= 400
+
+    async with httpx.AsyncClient(timeout=30, headers={"X-API-Key": os.environ["REPTILE_API_KEY"]},
+                                 limits=httpx.Limits(max_connections=args.concurrency)) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        wall = time.perf_counter() - t0
+    return {"concurrency": args.concurrency, "errors": errors, "per_s": round(len(latencies) / wall, 1),
+            **_latency(latencies)}
+
+
+async def _reads(base: str, args: argparse.Namespace) -> dict:
+    import httpx
+    paths = {
+        "summary": "/api/v1/summary",
+        "summary_roles": "/api/v1/summary/roles",
+        "readings_24h": "/api/v1/readings?terrarium=terr-1&hours=24",
+        "readings_720h": "/api/v1/readings?terrarium=terr-1&hours=720",
+        # what the charts ask for
+        "readings_24h_auto": "/api/v1/readings?terrarium=terr-1&hours=24&resolution=auto",
+        "readings_720h_auto": "/api/v1/readings?terrarium=terr-1&hours=720&resolution=auto",
+    }
+    out = {}
+    async with httpx.AsyncClient(timeout=120) as client:
+        for name, path in paths.items():
+            (await client.get(base + path)).raise_for_status()      # warm-up
+            latencies, size = [], 0
+            for _ in range(args.requests):
+                t0 = time.perf_counter()
+                r = await client.get(base + path)
+                latencies.append(time.perf_counter() - t0)
+                size = len(r.content)
+            out[name] = {"bytes": size, **_latency(latencies)}
+    return out
+
+
+def _role_summary(args: argparse.Namespace) -> dict:
+    from app import crud
+    from app.database import SessionLocal
+    latencies = []
+    for _ in range(args.requests):
+        with SessionLocal() as db:
+            t0 = time.perf_counter()
+            crud.role_summary(db)
+            latencies.append(time.perf_counter() - t0)
+    return _latency(latencies)
+
+
+async def _fan_out(base: str, args: argparse.Namespace) -> dict:
+    import httpx
+    seen: list[dict[str, float]] = [{} for _ in range(args.subscribers)]
+    ready = [asyncio.Event() for _ in range(args.subscribers)]
+
+    async def stream(i: int, client: httpx.AsyncClient) -> None:
+        async with client.stream("GET", f"{base}/sse/summary/delta") as r:
+            async for line in r.aiter_lines():
+                if line.startswith("event:"):
+                    ready[i].set()
+                if line.startswith("data:") and "°C" in line:
+                    seen[i][line.split("°C")[0].split()[-1]] = time.perf_counter()
+
+    latencies: list[float] = []
+    missing = 0
+    client = httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=args.subscribers + 4))
+    tasks = [asyncio.create_task(stream(i, client)) for i in range(args.subscribers)]
+    try:
+        await asyncio.wait_for(asyncio.gather(*(e.wait() for e in ready)), 30)
+        async with httpx.AsyncClient(timeout=30) as poster:
+            for n in range(args.sse_posts):
+                value = 1000 + n
+                key = f"{value:.1f}"
+                t0 = time.perf_counter()
+                r = await poster.post(f"{base}/api/v1/ingest", json={
+                    "terrarium_slug": "terr-1", "sensor_type": "temperature", "value": value, "unit": "°C",
+                    "entity_id": "sensor.t1_basking_temp", "ts": datetime.now(timezone.utc).isoformat(),
+                })
+                r.raise_for_status()
+                deadline = t0 + 2.0
+                while time.perf_counter() < deadline and not all(key in s for s in seen):
+                    await asyncio.sleep(0.002)
+                for s in seen:
+                    if key in s:
+                        latencies.append(s[key] - t0)
+                    else:
+                        missing += 1
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await client.aclose()
+    return {"subscribers": args.subscribers, "posts": args.sse_posts, "missing": missing, **_latency(latencies)}
+
+
+def _compare(report: dict, baseline: dict) -> dict:
+    """current / baseline for every p50_ms, p99_ms and per_s found in both reports (> 1 is slower, except per_s)."""
+    out = {}
+
+    def walk(cur, old, path):
+        for k, v in cur.items():
+            if isinstance(v, dict) and isinstance(old.get(k), dict):
+                walk(v, old[k], f"{path}{k}.")
+            elif k in ("p50_ms", "p99_ms", "per_s") and old.get(k):
+                out[path + k] = round(v / old[k], 3)
+
+    walk({k: report[k] for k in ("ingest", "reads", "role_summary", "sse")}, baseline, "")
+    return {"commit": baseline.get("meta", {}).get("commit"), "ratios": out}
+
+
+def main() -> None:
+    args = _parse()
+    sys.path.insert(0, ROOT)
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='reptile-bench-'), 'bench.db')}"
+    os.environ.setdefault("REPTILE_API_KEY", "bench")
+
+    from app.database import engine, init_db
+    init_db()
+    end = datetime.now(timezone.utc)
+    seed = _seed(args, end)
+
+    env = dict(os.environ, SSE_DEBOUNCE_MS="0")
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        import httpx
+        deadline = time.time() + 120        # startup warms the caches from the seeded data
+        while True:
+            try:
+                httpx.get(f"{base}/health", timeout=1)
+                break
+            except httpx.HTTPError:
+                if time.time() > deadline or proc.poll() is not None:
+                    raise
+                time.sleep(0.2)
+        reads = asyncio.run(_reads(base, args))
+        role_summary = _role_summary(args)
+        sse = asyncio.run(_fan_out(base, args))
+        ingest = asyncio.run(_ingest(base, args))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=15)
+
+    report = {
+        "meta": {
+            "commit": _commit(),
+            "at": end.isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "dialect": engine.dialect.name,
+            "params": {k: v for k, v in vars(args).items() if k not in ("out", "baseline", "database_url")},
+        },
+        "seed": seed,
+        "ingest": ingest,
+        "reads": reads,
+        "role_summary": role_summary,
+        "sse": sse,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["vs_baseline"] = _compare(report, json.load(f))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
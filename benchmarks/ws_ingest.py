@@ -0,0 +1,118 @@
+"""
+Ingest throughput: one POST /api/v1/ingest per reading against one WebSocket
+frame per reading on /api/v1/ingest/ws.
+
+Starts a local uvicorn on an empty SQLite file and pushes --readings readings
+each way: over HTTP from --clients concurrent clients (keep-alive, no TLS, so
+the HTTP side is flattered), and over one WebSocket connection that sends
+frames without waiting and reads the acks as they come. Reports readings per
+second and, for HTTP, p50/p99 request latency, as JSON.
+
+    python -m benchmarks.ws_ingest --readings 5000 --clients 8
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from .suite import ROOT, ROLES, _free_port, _latency
+
+
+def _parse() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--readings", type=int, default=5_000)
+    ap.add_argument("--clients", type=int, default=8, help="concurrent HTTP clients")
+    ap.add_argument("--terrariums", type=int, default=10)
+    return ap.parse_args()
+
+
+def _reading(i: int, terrariums: int) -> dict:
+    t = i % terrariums + 1
+    role, st, unit, mid, _a = ROLES[i % len(ROLES)]
+    return {"terrarium_slug": f"terr-{t}", "sensor_type": st, "unit": unit, "entity_id": f"sensor.t{t}_{role}",
+            "value": round(mid + (i % 7) / 10, 2), "ts": datetime.now(timezone.utc).isoformat()}
+
+
+async def _http(base: str, args: argparse.Namespace) -> dict:
+    import httpx
+    lat: list[float] = []
+    todo = iter(range(args.readings))
+
+    async def client(c: httpx.AsyncClient) -> None:
+        for i in todo:
+            t0 = time.perf_counter()
+            r = await c.post(f"{base}/api/v1/ingest", json=_reading(i, args.terrariums))
+            r.raise_for_status()
+            lat.append(time.perf_counter() - t0)
+
+    async with httpx.AsyncClient(timeout=60, headers={"X-API-Key": os.environ["REPTILE_API_KEY"]}) as c:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(client(c) for _ in range(args.clients)))
+        wall = time.perf_counter() - t0
+    return {"readings_per_s": round(args.readings / wall, 1), **_latency(lat)}
+
+
+async def _ws(base: str, args: argparse.Namespace) -> dict:
+    import websockets
+    url = base.replace("http://", "ws://") + "/api/v1/ingest/ws"
+    async with websockets.connect(url, additional_headers={"X-API-Key": os.environ["REPTILE_API_KEY"]}) as ws:
+        t0 = time.perf_counter()
+
+        async def send() -> None:
+            for i in range(args.readings):
+                await ws.send(json.dumps({"seq": i, **_reading(i, args.terrariums)}))
+
+        sender = asyncio.create_task(send())
+        acked = 0
+        while acked < args.readings:
+            msg = json.loads(await ws.recv())
+            if msg["type"] != "ack":
+                raise RuntimeError(msg)
+            acked += 1
+        await sender
+        wall = time.perf_counter() - t0
+    return {"readings_per_s": round(args.readings / wall, 1)}
+
+
+def main() -> None:
+    args = _parse()
+    import httpx
+    os.environ.setdefault("REPTILE_API_KEY", "bench")
+    tmp = tempfile.mkdtemp(prefix="reptile-bench-")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'ws.db')}")
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 120
+        while True:
+            try:
+                httpx.get(f"{base}/health", timeout=1)
+                break
+            except httpx.HTTPError:
+                if time.time() > deadline or proc.poll() is not None:
+                    raise
+                time.sleep(0.2)
+        report = {"params": vars(args), "cpus": os.cpu_count(),
+                  "http_post_per_reading": asyncio.run(_http(base, args)),
+                  "websocket_frame_per_reading": asyncio.run(_ws(base, args))}
+    finally:
+        proc.terminate()
+        proc.wait(timeout=15)
+    report["ws_speedup"] = round(report["websocket_frame_per_reading"]["readings_per_s"]
+                                 / report["http_post_per_reading"]["readings_per_s"], 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+# tests/conftest.py
+"""
+Tests run against a throwaway SQLite file, set up before `app` is imported
+(settings and engines are created at import time).
+"""
+import os
+import tempfile
+
+os.environ.setdefault("REPTILE_API_KEY", "test")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='reptile-test-'), 'test.db')}"
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def _schema():
+    from app.database import init_db
+    init_db()
+
+
+@pytest.fixture
+def db(_schema):
+    from app.database import SessionLocal
+    with SessionLocal() as s:
+        yield s
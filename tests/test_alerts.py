@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+
+from app import crud
+from app.alerts import alert_engine
+from app.schemas import AlertRuleIn, IngestPayload
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _ingest(db, slug: str, value: float, minute: int) -> list[str]:
+    return crud.ingest_batch(db, [IngestPayload(
+        terrarium_slug=slug, sensor_type="temperature", role="basking_temp", unit="°C",
+        entity_id=f"sensor.{slug}_basking", value=value, ts=T0 + timedelta(minutes=minute),
+    )])
+
+
+def _firing(rule_id: int) -> list[dict]:
+    return [a for a in alert_engine.active() if a["rule_id"] == rule_id]
+
+
+def test_rule_edited_while_firing(db):
+    slug = "alerts-edit"
+    _ingest(db, slug, 35.0, 0)
+    rule = crud.save_alert_rule(db, AlertRuleIn(terrarium_slug=slug, role="basking_temp",
+                                                min_value=30.0, max_value=40.0, hysteresis=1.0))
+    _ingest(db, slug, 25.0, 1)
+    assert [a["reason"] for a in _firing(rule["id"])] == ["below_min"]
+
+    # drop the lower limit of the firing rule
+    crud.save_alert_rule(db, AlertRuleIn(terrarium_slug=slug, role="basking_temp",
+                                         max_value=40.0, hysteresis=1.0), rule["id"])
+    assert _ingest(db, slug, 25.5, 2) == ["stored"]
+    assert _firing(rule["id"]) == []
+
+    _ingest(db, slug, 45.0, 3)
+    assert [a["reason"] for a in _firing(rule["id"])] == ["above_max"]
+
+
+def test_rule_keeps_firing_when_other_limit_edited(db):
+    slug = "alerts-keep"
+    _ingest(db, slug, 35.0, 0)
+    rule = crud.save_alert_rule(db, AlertRuleIn(terrarium_slug=slug, role="basking_temp",
+                                                min_value=30.0, max_value=40.0, hysteresis=1.0))
+    _ingest(db, slug, 25.0, 1)
+    crud.save_alert_rule(db, AlertRuleIn(terrarium_slug=slug, role="basking_temp",
+                                         min_value=30.0, hysteresis=1.0), rule["id"])
+    # still below min + hysteresis: the alert holds
+    assert _ingest(db, slug, 30.5, 2) == ["stored"]
+    assert [a["reason"] for a in _firing(rule["id"])] == ["below_min"]
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from app import crud
+from app.config import settings
+from app.models import Reading, Sensor, Terrarium
+from app.schemas import IngestPayload
+
+T0 = datetime(2026, 4, 1, tzinfo=timezone.utc)
+
+
+def _p(slug: str, second: int, value: float) -> IngestPayload:
+    return IngestPayload(terrarium_slug=slug, sensor_type="temperature", unit="°C", entity_id=f"sensor.{slug}",
+                         value=value, ts=T0 + timedelta(seconds=second))
+
+
+def _rows(db, slug: str) -> list[tuple]:
+    return [tuple(r) for r in db.execute(
+        select(Reading.ts, Reading.ts_end, Reading.value, Reading.repeats)
+        .join(Sensor, Sensor.id == Reading.sensor_id).join(Terrarium, Terrarium.id == Sensor.terrarium_id)
+        .where(Terrarium.slug == slug).order_by(Reading.ts)
+    )]
+
+
+def test_retries_of_folded_readings_are_duplicates(db, monkeypatch):
+    monkeypatch.setattr(settings, "deadband_enabled", True)
+    slug = "deadband-retry"
+    assert crud.ingest_batch(db, [_p(slug, s, 20.0) for s in (1, 2, 3, 4, 5)]) == ["stored"] * 5
+    # retries inside the current run
+    assert crud.ingest_batch(db, [_p(slug, 1, 20.0), _p(slug, 4, 20.02), _p(slug, 5, 20.0)]) == ["duplicate"] * 3
+    # a new run replaces it; retries for the closed one are still recognised
+    assert crud.ingest_batch(db, [_p(slug, 10, 25.0), _p(slug, 11, 25.0)]) == ["stored"] * 2
+    assert crud.ingest_batch(db, [_p(slug, 3, 20.0), _p(slug, 11, 25.0)]) == ["duplicate"] * 2
+    # a late reading outside the band is stored
+    assert crud.ingest_batch(db, [_p(slug, 4, 30.0)]) == ["stored"]
+    rows = _rows(db, slug)
+    assert [(r[2], r[3]) for r in rows] == [(20.0, 4), (30.0, 0), (25.0, 1)]
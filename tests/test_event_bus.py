@@ -0,0 +1,157 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+
+from app.bus_backends import UnixSocketBackend, _split
+from app.events import EventBus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _socket() -> str:
+    return os.path.join(tempfile.mkdtemp(prefix="reptile-bus-"), "events.sock")
+
+
+def _ping(n: int) -> dict:
+    return {"kind": "ping", "n": n}
+
+
+async def _connected(*buses: EventBus) -> None:
+    """Wait until every bus has a broker connection."""
+    for _ in range(100):
+        if all(b.backend._writer is not None for b in buses):
+            return
+        await asyncio.sleep(0.05)
+    raise AssertionError("bus never connected to a broker")
+
+
+async def _next(q: asyncio.Queue):
+    return (await asyncio.wait_for(q.get(), 5)).data
+
+
+def test_unix_backend_delivers_between_workers():
+    async def run() -> None:
+        path = _socket()
+        a, b = EventBus(backend=UnixSocketBackend(path)), EventBus(backend=UnixSocketBackend(path))
+        await a.start()
+        await b.start()
+        try:
+            await _connected(a, b)
+            assert a.backend.is_broker != b.backend.is_broker
+            qa, qb = await a.subscribe(), await b.subscribe()
+            await a.publish(_ping(1))
+            await b.publish(_ping(2))
+            # each side sees its own message once, then the other's
+            assert [await _next(qa), await _next(qa)] == [_ping(1), _ping(2)]
+            assert [await _next(qb), await _next(qb)] == [_ping(2), _ping(1)]
+            assert qa.empty() and qb.empty()
+        finally:
+            await a.stop()
+            await b.stop()
+
+    asyncio.run(run())
+
+
+def test_unix_backend_broker_takeover():
+    async def run() -> None:
+        path = _socket()
+        a, b = EventBus(backend=UnixSocketBackend(path)), EventBus(backend=UnixSocketBackend(path))
+        await a.start()
+        await _connected(a)
+        await b.start()
+        await _connected(b)
+        assert a.backend.is_broker and not b.backend.is_broker
+        await a.stop()
+        for _ in range(100):
+            if b.backend.is_broker:
+                break
+            await asyncio.sleep(0.05)
+        assert b.backend.is_broker
+
+        c = EventBus(backend=UnixSocketBackend(path))
+        await c.start()
+        try:
+            await _connected(b, c)
+            assert not c.backend.is_broker
+            qc = await c.subscribe()
+            await b.publish(_ping(3))
+            assert await _next(qc) == _ping(3)
+        finally:
+            await b.stop()
+            await c.stop()
+
+    asyncio.run(run())
+
+
+def test_unix_backend_crosses_processes():
+    """A worker in another process publishes; this one receives it."""
+    async def run() -> None:
+        path = _socket()
+        bus = EventBus(backend=UnixSocketBackend(path))
+        await bus.start()
+        try:
+            await _connected(bus)
+            q = await bus.subscribe()
+            child = textwrap.dedent(f"""
+                import asyncio
+                from app.bus_backends import UnixSocketBackend
+                from app.events import EventBus
+
+                async def main():
+                    bus = EventBus(backend=UnixSocketBackend({path!r}))
+                    await bus.start()
+                    while bus.backend._writer is None:
+                        await asyncio.sleep(0.05)
+                    await bus.publish({{"kind": "ping", "n": 4}})
+                    await asyncio.sleep(0.2)
+                    await bus.stop()
+
+                asyncio.run(main())
+            """)
+            proc = await asyncio.create_subprocess_exec(sys.executable, "-c", child, cwd=ROOT, env=os.environ.copy())
+            assert await _next(q) == _ping(4)
+            assert await asyncio.wait_for(proc.wait(), 30) == 0
+            assert bus.backend.is_broker
+        finally:
+            await bus.stop()
+
+    asyncio.run(run())
+
+
+def test_postgres_payloads_split_under_notify_limit():
+    latest = [{"terrarium": "t", "value": i, "pad": "x" * 200} for i in range(100)]
+    msg = {"origin": "o", "data": {"kind": "readings", "latest": latest}}
+    parts = list(_split(msg, 7000))
+    assert len(parts) > 1
+    assert all(len(p.encode()) <= 7000 for p in parts)
+    assert [r for p in parts for r in json.loads(p)["data"]["latest"]] == latest
+
+
+def test_cli_announce_reaches_workers():
+    from app.events import history_event
+    from app.versions import data_versions
+
+    async def run() -> None:
+        path = _socket()
+        msg = {"origin": "cli-test", "data": history_event(readings=False)}
+        assert not await UnixSocketBackend(path).send_once(msg)   # no app running
+        a, b = EventBus(backend=UnixSocketBackend(path)), EventBus(backend=UnixSocketBackend(path))
+        await a.start()
+        await b.start()
+        try:
+            await _connected(a, b)
+            qa, qb = await a.subscribe(), await b.subscribe()
+            etag, _at = data_versions.etag("any")
+            assert await UnixSocketBackend(path).send_once(msg)
+            # one job, one message to each worker (the broker's and the client's)
+            assert await _next(qa) == await _next(qb) == history_event(readings=False)
+            assert data_versions.etag("any")[0] != etag
+        finally:
+            await a.stop()
+            await b.stop()
+
+    asyncio.run(run())
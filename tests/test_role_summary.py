@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+
+from app import crud
+from app.database import SessionLocal
+from app.metrics import RequestStats, current_request
+from app.schemas import IngestPayload
+
+T0 = datetime(2026, 3, 1, tzinfo=timezone.utc)
+ROLES = (("basking_temp", "temperature"), ("env_temp", "temperature"), ("humidity", "humidity"))
+
+
+def _seed(db, first: int, count: int, readings: int = 3) -> None:
+    payloads = []
+    for t in range(first, first + count):
+        slug = f"summary-{t}"
+        for role, st in ROLES:
+            for i in range(readings):
+                payloads.append(IngestPayload(terrarium_slug=slug, sensor_type=st, role=role,
+                                              entity_id=f"sensor.{slug}_{role}", value=20.0 + i,
+                                              ts=T0 + timedelta(minutes=i)))
+        # a sensor that no role maps
+        payloads.append(IngestPayload(terrarium_slug=slug, sensor_type="temperature",
+                                      entity_id=f"sensor.{slug}_spare", value=21.0, ts=T0))
+    crud.ingest_batch(db, payloads)
+
+
+def _statements() -> tuple[int, list[dict]]:
+    stats = RequestStats()
+    token = current_request.set(stats)
+    try:
+        with SessionLocal() as db:
+            out = crud.role_summary(db)
+    finally:
+        current_request.reset(token)
+    return stats.statements, out
+
+
+def test_role_summary_query_count_is_constant(db):
+    _seed(db, 0, 1)
+    few, out = _statements()
+    assert next(i for i in out if i["terrarium_slug"] == "summary-0")["basking_temp"] == 22.0
+
+    _seed(db, 1, 20, readings=10)
+    many, out = _statements()
+    assert many == few == 1
+    summaries = [i for i in out if i["terrarium_slug"].startswith("summary-")]
+    assert len(summaries) == 21
+    assert all(i["humidity"] is not None for i in summaries)
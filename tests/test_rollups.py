@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, delete
+
+from app import crud, rollups
+from app.config import settings
+from app.models import Reading, ReadingRollup, Sensor, Terrarium
+from app.schemas import IngestPayload
+
+T0 = datetime(2026, 2, 1, tzinfo=timezone.utc)
+
+
+def _rollups(db, terrarium_id: int) -> dict:
+    return {
+        (r.resolution, r.bucket, r.count, r.sum)
+        for r in db.execute(select(ReadingRollup).where(ReadingRollup.terrarium_id == terrarium_id)).scalars()
+    }
+
+
+def test_backfill_keeps_purged_history_and_counts_folded_readings(db, monkeypatch):
+    monkeypatch.setattr(settings, "deadband_enabled", True)
+    slug = "rollups-backfill"
+    # one reading a minute for three hours: the deadband folds them into 15-minute rows
+    assert crud.ingest_batch(db, [
+        IngestPayload(terrarium_slug=slug, sensor_type="temperature", unit="°C", entity_id="sensor.rb",
+                      value=25.0, ts=T0 + timedelta(minutes=m))
+        for m in range(180)
+    ]) == ["stored"] * 180
+    tid = db.scalar(select(Terrarium.id).where(Terrarium.slug == slug))
+    before = _rollups(db, tid)
+    assert db.scalar(select(Reading.repeats).join(Sensor).where(Sensor.terrarium_id == tid).limit(1)) > 0
+
+    # retention purges the first 75 minutes
+    sensor_ids = select(Sensor.id).where(Sensor.terrarium_id == tid).scalar_subquery()
+    db.execute(delete(Reading).where(Reading.sensor_id.in_(sensor_ids), Reading.ts < T0 + timedelta(minutes=75)))
+    db.commit()
+
+    rollups.backfill(db)
+    assert _rollups(db, tid) == before
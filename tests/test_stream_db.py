@@ -0,0 +1,48 @@
+import asyncio
+import threading
+
+from sqlalchemy import text
+
+from app.database import stream_db
+
+
+def test_stream_db_closes_on_the_stepping_thread_when_abandoned():
+    seen: dict = {}
+
+    def rows(db):
+        try:
+            for i in range(100):
+                db.execute(text("SELECT 1"))
+                seen["step_thread"] = threading.get_ident()
+                yield i
+        finally:
+            seen["db"] = db
+            seen["close_thread"] = threading.get_ident()
+
+    async def run() -> list[int]:
+        out = []
+        agen = stream_db(rows)
+        async for i in agen:
+            out.append(i)
+            if i == 2:
+                break
+        await agen.aclose()
+        for _ in range(100):
+            if "db" in seen and not seen["db"].in_transaction():
+                break
+            await asyncio.sleep(0.01)
+        return out
+
+    assert asyncio.run(run()) == [0, 1, 2]
+    assert seen["close_thread"] != threading.get_ident()
+    assert not seen["db"].in_transaction()
+
+
+def test_stream_db_runs_to_the_end():
+    def rows(db):
+        yield from (r for (r,) in db.execute(text("SELECT 1 UNION ALL SELECT 2")))
+
+    async def run() -> list[int]:
+        return [i async for i in stream_db(rows)]
+
+    assert asyncio.run(run()) == [1, 2]